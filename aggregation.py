@@ -0,0 +1,166 @@
+import streamlit as st
+import pandas as pd
+import threading
+from collections import OrderedDict
+import utils
+from filters import FilterIndex, FILTER_DIMS
+
+# 1. КОНСТАНТИ
+CHART_CACHE_SIZE = 32                                         # Скільки останніх виборів тримаємо в пам'яті
+GROUP_COLS = ['year_str', 'plot_date', 'hover_date', 'month', 'day', 'decade']
+CUBE_KEYS = FILTER_DIMS + GROUP_COLS                          # Найдрібніше зерно куба: рік × Cluster × Block × Culture × день
+
+# 2. LRU-КЕШ ЗА КЛЮЧЕМ ВИБОРУ
+class SelectionCache:
+    """Обмежений LRU-кеш результатів за канонічним ключем вибору фільтрів."""
+
+    def __init__(self, maxsize=CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+@st.cache_resource(show_spinner=False)
+def get_chart_cache():
+    """Спільний для всіх сесій процесу кеш агрегацій графіків."""
+    return SelectionCache()
+
+# 3. КУБ ДОСТАТНІХ СТАТИСТИК
+class Cube:
+    """Суми та кількості метрик на зерні рік × Cluster × Block × Culture × день.
+
+    Для кожної метрики m зберігаються: m__sum (сума), m__n (кількість непорожніх
+    значень), m__wsum (сума, зважена на field_count) та m__w (сума ваг). Будь-який
+    вибір сайдбару розв'язується підсумовуванням кількох зрізів куба.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.index = FilterIndex(frame)
+
+    def slice(self, selection):
+        return self.frame.iloc[self.index.lookup(selection)]
+
+
+def build_cube(df, metrics):
+    """Офлайн-побудова куба з підготовлених даних (utils.read_store)."""
+    weights = df['field_count'].astype('int64')
+    stats = {}
+    for m in metrics:
+        # Метрики зберігаються як float32, суми накопичуємо у float64
+        values = df[m].astype('float64')
+        valid = values.notna()
+        stats[f"{m}__sum"] = values.fillna(0)
+        stats[f"{m}__n"] = valid.astype('int64')
+        stats[f"{m}__wsum"] = (values * weights).fillna(0)
+        stats[f"{m}__w"] = weights.where(valid, 0)
+    stats['field_count__sum'] = weights
+    stats['rows'] = 1
+
+    frame = pd.concat([df[CUBE_KEYS], pd.DataFrame(stats, index=df.index)], axis=1)
+    return frame.groupby(CUBE_KEYS, observed=True).sum().reset_index()
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_cube(version, metrics):
+    """Куб версії даних, зібраний з кубів окремих років.
+
+    Куб року кешується за хешем його партиції, тож після оновлення даних
+    перебудовуються лише роки, що змінились.
+    """
+    manifest = utils.read_manifest()
+    if manifest is None:
+        # Датасету немає (лише плоский файл) — один куб з sidecar-файлу
+        return Cube(_cube_part(None, version, metrics))
+    parts = [_cube_part(int(year), digest, metrics) for year, digest in sorted(manifest['years'].items())]
+    return Cube(utils.concat_compact(parts))
+
+
+def selection_cube(version, selection, metrics):
+    """Куб лише вибраних років і кластерів — фільтри йдуть у Parquet-читач (партиції та row groups).
+
+    Вибір усіх років без фільтра кластерів — спільний куб процесу (load_cube).
+    """
+    manifest = utils.read_manifest()
+    years, clusters = sorted(map(str, selection['year'])), selection.get('Cluster')
+    if manifest is None or (clusters is None and set(years) >= set(manifest['years'])):
+        return load_cube(version, metrics)
+    parts = [_year_cube(int(y), manifest['years'][y], metrics, clusters) for y in years if y in manifest['years']]
+    return Cube(utils.concat_compact(parts))
+
+
+def _year_cube(year, digest, metrics, clusters):
+    """Куб року лише для кластерів clusters: з sidecar-файлу або з відфільтрованої партиції."""
+    source = utils.partition_path(year, digest)
+    frame = utils.read_sidecar(source, 'cube', [('Cluster', 'in', list(clusters))] if clusters else None)
+    if frame is None or any(f"{m}__sum" not in frame.columns for m in metrics):
+        columns = CUBE_KEYS + list(metrics) + ['field_count']
+        frame = build_cube(utils.read_store(years=[year], clusters=clusters, columns=columns), list(metrics))
+    return frame
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _cube_part(year, digest, metrics):
+    """Куб одного року (year=None — усіх даних) з sidecar-файлу або побудова і збереження."""
+    source = utils.FILE_TO_LOAD if year is None else utils.partition_path(year, digest)
+    frame = utils.read_sidecar(source, 'cube')
+    if frame is None or any(f"{m}__sum" not in frame.columns for m in metrics):
+        # Лише з потрібних колонок — пам'ять не росте з кількістю метрик у файлі
+        columns = CUBE_KEYS + list(metrics) + ['field_count']
+        frame = build_cube(utils.read_store(years=None if year is None else [year], columns=columns), list(metrics))
+        utils.write_sidecar(frame, source, 'cube')
+    return frame
+
+# 4. АГРЕГАЦІЯ ДЛЯ ГРАФІКІВ ТА МАСШТАБ
+def build_chart(cube, selection, metrics, weighted=False):
+    """Середнє по днях, колонки норми (Avg_...) та цифри масштабу для статусної стрічки.
+
+    weighted=True рахує середнє, зважене на field_count, замість простого середнього по рядках.
+    """
+    cells = cube.slice(selection)
+    num, den = ('__wsum', '__w') if weighted else ('__sum', '__n')
+    sums = cells.groupby(GROUP_COLS, observed=True)[
+        [m + num for m in metrics] + [m + den for m in metrics] + ['field_count__sum', 'rows']
+    ].sum()
+
+    df_chart = pd.DataFrame(
+        {m: sums[m + num] / sums[m + den].where(sums[m + den] > 0) for m in metrics}, index=sums.index
+    )
+    df_chart['field_count'] = sums['field_count__sum'] / sums['rows']
+    df_chart = df_chart.reset_index().sort_values('plot_date')
+
+    # Автоматичне створення колонок Норми (Avg_...) для всіх метрик
+    avg = df_chart.groupby('plot_date', observed=True)[metrics].transform('mean')
+    df_chart[[f"Avg_{m}" for m in metrics]] = avg.to_numpy()
+
+    # Математика масштабу (Поле-Рік)
+    daily_sum = cells.groupby(['year', 'plot_date'], observed=True)['field_count__sum'].sum()
+    yearly_max = daily_sum.groupby('year', observed=True).max()
+    scale = {"total": int(yearly_max.sum()), "avg_fields": int(yearly_max.mean())}
+
+    return df_chart, scale
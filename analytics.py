@@ -0,0 +1,171 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+# 1. КОНСТАНТИ
+RAIN_HEAVY_MM = 3.0     # Поріг "сильного" дощового дня, мм
+RAIN_ANY_MM = 0.0       # Поріг дощового дня (опади строго більші), мм
+N_PERIODS = 36          # 12 місяців × 3 декади
+DTW_WINDOW = 10         # Ширина смуги DTW (± днів)
+SIMILARITY_METHODS = {
+    "Кінцеві значення (макс.)": "endpoint",
+    "Евклідова відстань кривих": "euclidean",
+    "Кореляція кривих": "correlation",
+    "DTW (зсув у часі)": "dtw",
+}
+
+def period_labels():
+    """Підписи декад у форматі 'MM-D' (індекс = (місяць - 1) * 3 + декада - 1)."""
+    return [f"{m:02d}-{d}" for m in range(1, 13) for d in range(1, 4)]
+
+# 2. ДОЩОВІ ПЕРІОДИ: ЧОТИРИ МАТРИЦІ РІК × ДЕКАДА ЗА ОДИН ПРОХІД
+@st.cache_data(show_spinner=False, max_entries=64)
+def rain_matrices(df_chart, heavy_mm=RAIN_HEAVY_MM, any_mm=RAIN_ANY_MM):
+    """Сума опадів, дні > heavy_mm, дощові дні (> any_mm) та макс. серія дощових днів підряд.
+
+    Рядки df_chart кодуються цілим індексом комірки рік × декада, усі суми
+    рахуються через np.bincount, а серії — run-length кодуванням без groupby.apply.
+    Повертає словник DataFrame (рік × 'MM-D') лише з декадами, що є у даних.
+    """
+    df = df_chart.sort_values(['year_str', 'plot_date'])
+    year_codes, years = pd.factorize(df['year_str'], sort=True)
+    period = (df['month'].to_numpy() - 1) * 3 + df['decade'].to_numpy() - 1
+    cell = year_codes * N_PERIODS + period
+    size = len(years) * N_PERIODS
+
+    rain = df['precipitation'].to_numpy(dtype=float)
+    rainy = rain > any_mm
+    sums = np.bincount(cell, weights=np.nan_to_num(rain), minlength=size)
+    heavy = np.bincount(cell, weights=rain > heavy_mm, minlength=size)
+    rainy_days = np.bincount(cell, weights=rainy, minlength=size)
+
+    # Серії: нова серія починається з дощового дня після сухого або на початку нової комірки
+    new_cell = np.r_[True, cell[1:] != cell[:-1]]
+    starts = rainy & (new_cell | ~np.r_[False, rainy[:-1]])
+    run_id = np.cumsum(starts) - 1
+    run_len = np.bincount(run_id[rainy], minlength=int(starts.sum()))
+    streak = np.zeros(size)
+    np.maximum.at(streak, cell[starts], run_len)
+
+    present = np.unique(period)
+    labels = np.array(period_labels())[present]
+
+    def to_frame(values):
+        return pd.DataFrame(values.reshape(len(years), N_PERIODS)[:, present],
+                            index=pd.Index(years, name='year_str'), columns=pd.Index(labels, name='Період'))
+
+    return {
+        'sum': to_frame(sums),
+        'heavy': to_frame(heavy),
+        'rainy': to_frame(rainy_days),
+        'streak': to_frame(streak),
+    }
+
+# 3. СХОЖІСТЬ РОКІВ: ПОВНА МАТРИЦЯ РІК × РІК
+@st.cache_data(show_spinner=False, max_entries=64)
+def similarity_matrix(df_chart, metrics, method='endpoint', window=DTW_WINDOW):
+    """Матриця схожості (%) рік × рік; стовпчик — еталонний рік.
+
+    endpoint    — як раніше: відносна різниця річних максимумів, обрізана до 1;
+    euclidean   — RMS-відстань стандартизованих щоденних кривих на спільних днях;
+    correlation — кореляція Пірсона щоденних кривих на спільних днях;
+    dtw         — DTW-відстань кривих зі смугою ± window днів.
+    Для кількох показників схожість усереднюється.
+    """
+    metrics = list(metrics)
+    if method == 'endpoint':
+        X = df_chart.groupby('year_str', observed=True)[metrics].max()
+        return pd.DataFrame(_endpoint_similarity(X.to_numpy(dtype=float)), index=X.index, columns=X.index)
+
+    years, Z, mask = _trajectories(df_chart, metrics)
+    if method == 'dtw':
+        sim = 100 / (1 + _dtw_distances(Z, mask, window))
+    else:
+        n, sx, sxx, sxy = _pair_moments(Z, mask)
+        if method == 'euclidean':
+            msd = (sxx + np.swapaxes(sxx, 0, 1) - 2 * sxy) / np.maximum(n, 1)
+            sim = 100 / (1 + np.sqrt(np.clip(msd, 0, None)))
+        else:
+            sy, syy = np.swapaxes(sx, 0, 1), np.swapaxes(sxx, 0, 1)
+            cov = n * sxy - sx * sy
+            var = np.clip(n * sxx - sx ** 2, 0, None) * np.clip(n * syy - sy ** 2, 0, None)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sim = 50 * (1 + cov / np.sqrt(var))
+        sim = np.where(n > 1, sim, np.nan)
+    sim = np.nanmean(sim, axis=-1) if sim.ndim == 3 else sim
+    return pd.DataFrame(np.nan_to_num(sim), index=pd.Index(years, name='year_str'), columns=years)
+
+
+def _endpoint_similarity(X):
+    """X: рік × показник. Результат [i, j] — схожість року i з еталоном j."""
+    val, target = X[:, None, :], X[None, :, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d = np.where(target != 0, np.abs(val - target) / np.abs(target), np.where(val == 0, 0.0, 1.0))
+    d = np.where(np.isnan(val) | np.isnan(target), np.nan, np.minimum(d, 1))
+    valid = ~np.isnan(d)
+    mean_d = np.nansum(d, axis=-1) / np.maximum(valid.sum(axis=-1), 1)
+    return np.where(valid.any(axis=-1), (1 - mean_d) * 100, 0)
+
+
+def _trajectories(df_chart, metrics):
+    """Масив рік × день × показник (стандартизований по кожному показнику) та маска наявних днів."""
+    year_codes, years = pd.factorize(df_chart['year_str'], sort=True)
+    day_codes, days = pd.factorize(df_chart['plot_date'], sort=True)
+    X = np.full((len(years), len(days), len(metrics)), np.nan)
+    X[year_codes, day_codes] = df_chart[metrics].to_numpy(dtype=float)
+
+    mean, std = np.nanmean(X, axis=(0, 1)), np.nanstd(X, axis=(0, 1))
+    Z = (X - mean) / np.where(std > 0, std, 1)
+    return years, Z, ~np.isnan(Z)
+
+
+def _pair_moments(Z, mask):
+    """Суми для всіх пар років лише по спільних днях: n, Σx, Σx², Σxy (форма рік × рік × показник)."""
+    m = mask.astype(float)
+    Z0 = np.where(mask, Z, 0)
+    n = np.einsum('itk,jtk->ijk', m, m)
+    sx = np.einsum('itk,jtk->ijk', Z0, m)
+    sxx = np.einsum('itk,jtk->ijk', Z0 ** 2, m)
+    sxy = np.einsum('itk,jtk->ijk', Z0, Z0)
+    return n, sx, sxx, sxy
+
+
+def _dtw_distances(Z, mask, window):
+    """Середня за шляхом DTW-відстань для всіх пар одночасно (смуга Сакое-Чиби ± window днів).
+
+    Порівнюються лише дні, наявні в усіх вибраних роках (напр., поточний рік до сьогодні).
+    """
+    common = mask.all(axis=(0, 2))
+    Z = Z[:, common] if common.sum() > 1 else np.nan_to_num(Z)
+    n_years, T, _ = Z.shape
+    i_idx, j_idx = np.triu_indices(n_years, k=1)
+    A, B = Z[i_idx], Z[j_idx]                          # пара × день × показник
+
+    prev = np.full((len(i_idx), T + 1, Z.shape[2]), np.inf)
+    prev[:, 0] = 0
+    for t in range(1, T + 1):
+        cur = np.full_like(prev, np.inf)
+        for u in range(max(1, t - window), min(T, t + window) + 1):
+            cost = np.abs(A[:, t - 1] - B[:, u - 1])
+            cur[:, u] = cost + np.minimum(np.minimum(prev[:, u - 1], prev[:, u]), cur[:, u - 1])
+        prev = cur
+
+    dist = np.zeros((n_years, n_years, Z.shape[2]))
+    dist[i_idx, j_idx] = dist[j_idx, i_idx] = prev[:, T] / T
+    return dist
+
+
+def cluster_order(sim):
+    """Порядок років для теплової карти: агломеративна кластеризація (середній зв'язок)."""
+    dist = 100 - (sim + sim.T) / 2
+    clusters = [[i] for i in range(len(dist))]
+    while len(clusters) > 1:
+        best, pair = np.inf, (0, 1)
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                d = dist[np.ix_(clusters[a], clusters[b])].mean()
+                if d < best:
+                    best, pair = d, (a, b)
+        a, b = pair
+        clusters[a] = clusters[a] + clusters.pop(b)
+    return clusters[0] if clusters else []
@@ -1,3 +1,4 @@
+import importlib
 import streamlit as st
 import pandas as pd
 
@@ -63,15 +64,68 @@ if not check_password():
 st.markdown("<style>section[data-testid='stSidebar'] { display: flex !important; }</style>", unsafe_allow_html=True)
 
 # --- 4. ЗАВАНТАЖЕННЯ МОДУЛІВ ТА ДАНИХ ---
-import utils
-import filters
-from pages import temp_page, precip_page, tables_page, constructor_page, analytics_page
-
-df_full = utils.load_data()
-color_map = utils.get_colors(df_full)
+# Профілер — першим: він міряє холодний старт (імпорти, файли, перші етапи) навіть без ?debug=1
+import profiler
+with profiler.startup_step("import_core"):
+    import utils
+    import filters
+    import aggregation
+    import climatology
+    import sql_backend
+    import result_cache
+
+# Сторінки (plotly.express, subplots, matplotlib для таблиць зі стилями) — лише при першому відкритті табу
+def page(name):
+    with profiler.startup_step(f"import_{name}"):
+        return importlib.import_module(f"pages.{name}")
+
+# Профілювання етапів (AGRO_PROFILE=1 або ?debug=1) — без нього stage() нічого не робить
+profiler.start_run()
+
+# Для сайдбару достатньо колонок вимірів — метрики читаються лише з потрібних партицій
+dims_cols = filters.FILTER_DIMS + ['year_str']
+metrics_dict = utils.get_metrics_dict()
+metrics = list(metrics_dict.values())
+with profiler.startup_step("sync_store"):
+    version = utils.get_data_version()
+
+# Одразу після входу: зведення по полях, куб і норма читаються у пулі потоків паралельно
+# з колонками вимірів (головний потік) — таби потім беруть готове з кешів
+if version is not None and st.session_state.get('_prefetched') != version:
+    pool = utils.get_loader_pool()
+    if utils.get_summary_version() is not None and not sql_backend.enabled():   # SQL читає зведення сам
+        pool.submit(profiler.startup_task("load_field_summary", utils.load_field_summary), utils.get_summary_version())
+    pool.submit(profiler.startup_task("load_cube", aggregation.load_cube), version, tuple(metrics))
+    pool.submit(profiler.startup_task("load_climatology", climatology.load_climatology), version, tuple(metrics))
+    st.session_state._prefetched = version
+
+# SQL-бекенд (AGRO_BACKEND=duckdb): лише унікальні комбінації вимірів; pandas — виміри всіх рядків
+with profiler.stage("load") as rec:
+    df_dims, dims_key = sql_backend.run(
+        lambda: (sql_backend.load_dims(version, tuple(dims_cols)).copy(deep=False), f"sql-{version}"),
+        lambda: (utils.load_dims(dims_cols), version))
+    color_map = utils.get_colors(df_dims)
+    rec['rows'] = len(df_dims)
+
+# Нові файли даних підхоплюються у фоні: ці кеші прогріваються до підміни версії
+watcher = utils.get_watcher()
+if sql_backend.enabled():
+    watcher.register_prewarm('filter_index', lambda v: filters.build_filter_index(
+        sql_backend.load_dims(v, tuple(dims_cols)), f"sql-{v}"))
+else:
+    watcher.register_prewarm('dims', lambda v: utils.load_shared_dims(v, tuple(dims_cols)))
+    watcher.register_prewarm('filter_index', lambda v: filters.build_filter_index(
+        utils.load_shared_dims(v, tuple(dims_cols)), v))
+if st.session_state.get('data_version') not in (None, watcher.version):
+    st.toast("🔄 Дані оновлено")
+st.session_state.data_version = watcher.version
 
 # --- 5. САЙДБАР (ФІЛЬТРИ) ---
-df_f, sel_years, sel_cluster, sel_block, sel_culture = filters.render_sidebar(df_full)
+with profiler.stage("sidebar") as rec:
+    filter_index = filters.build_filter_index(df_dims, dims_key)
+    df_f, sel_years, sel_cluster, sel_block, sel_culture = filters.render_sidebar(df_dims, filter_index)
+    filters.render_chart_settings()
+    rec['rows'] = len(df_f)
 
 if df_f.empty:
     st.title("🚜 Agro Analytics")
@@ -79,26 +133,42 @@ if df_f.empty:
     st.stop()
 
 # --- 6. ПІДГОТОВКА ДАНИХ ТА СИНХРОНІЗАЦІЯ МЕТРИК ---
-metrics_dict = utils.get_metrics_dict()
-metrics = list(metrics_dict.values())
-
-# Агрегація для графіків (Середнє по днях)
-group_cols = ['year_str', 'plot_date', 'hover_date', 'month', 'day', 'decade']
-df_chart = df_f.groupby(group_cols)[metrics + ['field_count']].mean().reset_index().sort_values('plot_date')
-
-# Автоматичне створення колонок Норми (Avg_...) для всіх метрик
-for m in metrics:
-    if m in df_chart.columns:
-        df_chart[f"Avg_{m}"] = df_chart.groupby('plot_date')[m].transform('mean')
+# Агрегація для графіків (Середнє по днях, Норма, Масштаб) з куба — кешується за вибором фільтрів
+sel_key = filters.selection_key(sel_years, sel_cluster, sel_block, sel_culture)
+watcher.register_prewarm('cube', lambda v: aggregation.load_cube(v, tuple(metrics)))
+watcher.register_prewarm('climate', lambda v: climatology.load_climatology(v, tuple(metrics)))
+
+selection = filters.as_selection(sel_years, sel_cluster, sel_block, sel_culture)
+
+def compute_chart():
+    return sql_backend.run(
+        lambda: sql_backend.build_chart(selection, metrics),
+        lambda: aggregation.build_chart(aggregation.selection_cube(utils.get_data_version(), selection, tuple(metrics)),
+                                        selection, metrics)
+    )
+
+# Ключ — версії лише вибраних років: оновлення інших років не скидає цей кеш.
+# Пам'ять процесу -> кеш на диску (спільний для реплік і перезапусків) -> розрахунок
+with profiler.stage("aggregation", cache=aggregation.get_chart_cache()) as rec:
+    df_chart, scale = aggregation.get_chart_cache().get_or_compute(
+        (utils.get_years_version(sel_years),) + sel_key,
+        lambda: result_cache.get_result_cache().get_or_compute(
+            ('chart', tuple(metrics)) + result_cache.dataset_key(selection), compute_chart)
+    )
+    rec['rows'] = len(df_chart)
+
+# Багаторічна норма (перцентилі по днях року) — передрахована для кожного кластера/культури
+with profiler.stage("climatology") as rec:
+    climate, climate_label = climatology.load_climatology(utils.get_data_version(), tuple(metrics)).for_selection(
+        sel_cluster, sel_culture)
+    rec['rows'] = 0 if climate is None else len(climate)
 
 # --- 7. КОНТРОЛЬНА ПАНЕЛЬ (STATUS RIBBON) ---
 st.title("🚜 Agro Analytics")
 
 # Математика масштабу (Поле-Рік)
-daily_sum = df_f.groupby(['year', 'plot_date'])['field_count'].sum().reset_index()
-yearly_max = daily_sum.groupby('year')['field_count'].max()
-total_scale = int(yearly_max.sum())
-avg_fields = int(yearly_max.mean())
+total_scale = scale["total"]
+avg_fields = scale["avg_fields"]
 num_years = len(sel_years)
 tt_text = f"Масштаб аналізу: ~{avg_fields} полів × {num_years} років моніторингу (період до 2026 р.)."
 
@@ -128,14 +198,26 @@ st.markdown(f"""
         </div>
     </div>
 """, unsafe_allow_html=True)
+if climate_label and utils.get_band_setting() in utils.CLIMATE_BANDS:
+    st.caption(f"📈 Коридор норми ({utils.get_band_setting()}): {climate_label}, роки без еталонного {utils.ETALON_YEAR}")
 
 # --- 8. ТАБИ (ОСНОВНИЙ ІНТЕРФЕЙС) ---
-tabs = st.tabs(["🌡️ Температури", "💧 Опади", "📋 Таблиці", "🛠️ Конструктор", "📊 Аналітика"])
-
-with tabs[0]: temp_page.show(df_chart, color_map)
-with tabs[1]: precip_page.show(df_chart, color_map)
-with tabs[2]: tables_page.show(df_chart, sel_years, sel_cluster, sel_block, sel_culture) 
-with tabs[3]: constructor_page.show(df_chart, color_map)
-
-with tabs[4]: analytics_page.show(df_chart, color_map)
-
+# Виконується лише відкритий таб; інші не рахуються, доки їх не відкриють (важке — у кешах сторінок).
+# Кожна сторінка — st.fragment: її власні віджети перезапускають лише її, без завантаження й фільтрів.
+tabs = st.tabs(["🌡️ Температури", "💧 Опади", "📋 Таблиці", "🛠️ Конструктор", "📊 Аналітика"],
+               key="main_tab", on_change="rerun")
+
+with tabs[0]:
+    if tabs[0].open: page("temp_page").show(df_chart, color_map, climate,
+                                              filters.as_selection(sel_years, sel_cluster, sel_block, sel_culture))
+with tabs[1]:
+    if tabs[1].open: page("precip_page").show(df_chart, color_map, climate)
+with tabs[2]:
+    if tabs[2].open: page("tables_page").show(df_chart, sel_years, sel_cluster, sel_block, sel_culture)
+with tabs[3]:
+    if tabs[3].open: page("constructor_page").show(df_chart, color_map)
+with tabs[4]:
+    if tabs[4].open: page("analytics_page").show(df_chart, color_map,
+                                                   filters.as_selection(sel_years, sel_cluster, sel_block, sel_culture))
+
+profiler.render_panel()
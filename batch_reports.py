@@ -0,0 +1,219 @@
+"""Пакетна генерація статичних звітів без Streamlit-сесії (напр., щотижня з cron).
+
+Для кожного кластера та кожної культури (за бажанням — і кожної пари кластер × культура)
+рахує ті самі дані, що й застосунок: df_chart з куба (aggregation.build_chart), криві
+температур і опадів (temp_page, precip_page), теплові карти дощових періодів і рейтинг
+схожості років (analytics_page). Звіти розподіляються між процесами; кожен процес один
+раз читає куб з sidecar-файлів, підготовлених головним процесом.
+
+Результат у теці out_dir: по підтеці на звіт (report.html — самодостатній HTML з
+графіками, chart.parquet, rain.parquet, similarity.parquet), index.html і reports.parquet.
+
+    python batch_reports.py reports --workers 8 --cross
+    python batch_reports.py reports --plotlyjs cdn        # менші HTML, потрібен інтернет
+"""
+import argparse
+import html
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from streamlit import config as st_config, logger as st_logger
+
+import utils
+import filters
+import aggregation
+import analytics
+import climatology
+from pages import temp_page, precip_page, analytics_page
+
+# 1. КОНСТАНТИ
+DEFAULT_OUT = 'reports'
+TEMP_METRIC = "GDD (Ефективні Т > 10)"                         # Типові значення віджетів сторінок
+TEMP_DAILY = 'mean'
+PRECIP_MONTHS = (9, 9)
+SIMILARITY_LABELS = ["GDD (Ефективні Т > 10)", "Накопичені опади"]
+SIMILARITY_METHOD = "Кінцеві значення (макс.)"
+ALL = ["Всі"]
+
+_worker = {}                # Стан процесу-виконавця: куб, кольори, параметри
+
+# 2. ЗАВДАННЯ
+def plan_reports(cube, cross=False, include_all=True):
+    """Список звітів (slug, назва, {вимір: [значення]}) за значеннями вимірів у кубі."""
+    clusters, cultures = cube.index.values('Cluster'), cube.index.values('Culture')
+    plan = [('all', "Усі кластери та культури", {})] if include_all else []
+    plan += [(f"cluster_{_slug(c)}", f"Кластер: {c}", {'Cluster': [c]}) for c in clusters]
+    plan += [(f"culture_{_slug(c)}", f"Культура: {c}", {'Culture': [c]}) for c in cultures]
+    if cross:
+        combos = cube.index.combos[['Cluster', 'Culture']].drop_duplicates().sort_values(['Cluster', 'Culture'])
+        plan += [(f"cluster_{_slug(cl)}__culture_{_slug(cu)}", f"{cl} · {cu}", {'Cluster': [cl], 'Culture': [cu]})
+                 for cl, cu in combos.itertuples(index=False)]
+    return plan
+
+
+def _slug(value):
+    return re.sub(r'[^\w\-]+', '_', str(value)).strip('_') or 'none'
+
+# 3. ВИКОНАВЕЦЬ (ОКРЕМИЙ ПРОЦЕС)
+def _init_worker(version, metrics, options):
+    """Один раз на процес: куб (з sidecar-файлів або успадкований через fork), кольори та параметри."""
+    _quiet_streamlit()
+    cube = aggregation.load_cube(version, metrics)
+    _worker.update(cube=cube, climate=climatology.load_climatology(version, metrics),
+                   metrics=list(metrics), options=options,
+                   colors=utils.get_colors(cube.frame), years=cube.index.values('year'))
+
+
+def render_report(slug, title, dims):
+    """Рахує і записує один звіт. Повертає рядок для reports.parquet."""
+    t0 = time.perf_counter()
+    cube, metrics, options = _worker['cube'], _worker['metrics'], _worker['options']
+    out_dir = os.path.join(options['out_dir'], slug)
+    sel = [dims.get(d, ALL) for d in filters.FILTER_DIMS[1:]]
+
+    df_chart, scale = aggregation.build_chart(cube, filters.as_selection(_worker['years'], *sel), metrics)
+    row = {'slug': slug, 'title': title, 'Cluster': ', '.join(sel[0]), 'Culture': ', '.join(sel[2]),
+           'rows': len(df_chart), 'fields_years': scale['total'] if len(df_chart) else 0}
+    if df_chart.empty:
+        return row | {'seconds': round(time.perf_counter() - t0, 3), 'path': None}
+
+    os.makedirs(out_dir, exist_ok=True)
+    df_chart = df_chart.sort_values(['year_str', 'plot_date'])
+    climate, _ = _worker['climate'].for_selection(sel[0], sel[2])
+    figures, tables = _figures(df_chart, climate, options)
+
+    df_chart.to_parquet(os.path.join(out_dir, 'chart.parquet'), index=False)
+    for name, table in tables.items():
+        table.to_parquet(os.path.join(out_dir, f'{name}.parquet'), index=False)
+    _write_html(os.path.join(out_dir, 'report.html'), title, scale, figures, tables.get('similarity'), options)
+    return row | {'seconds': round(time.perf_counter() - t0, 3), 'path': os.path.join(slug, 'report.html')}
+
+
+def _figures(df_chart, climate, options):
+    """Графіки сторінок з типовими значеннями віджетів та таблиці для Parquet."""
+    colors, fast, budget = _worker['colors'], not options['full_res'], options['point_budget']
+    figures = [
+        temp_page.accumulation_figure(df_chart, colors, TEMP_METRIC, fast, budget, climate),
+        temp_page.daily_figure(df_chart, colors, TEMP_DAILY, fast, budget, climate),
+        precip_page.accumulation_figure(df_chart, colors, fast, budget, climate),
+        precip_page.daily_figure(df_chart, colors, PRECIP_MONTHS),
+    ]
+
+    # Кеші st.cache_data поза сервером не потрібні — викликаємо самі функції
+    rain = analytics.rain_matrices.__wrapped__(df_chart)
+    figures += analytics_page.rain_figures(rain)
+    tables = {'rain': pd.concat({k: m.stack() for k, m in rain.items()}, names=['показник'])
+              .rename('значення').reset_index()}
+
+    m_dict = utils.get_metrics_dict()
+    sim_metrics = [m_dict[label] for label in SIMILARITY_LABELS]
+    method = analytics.SIMILARITY_METHODS[SIMILARITY_METHOD]
+    sim = analytics.similarity_matrix.__wrapped__(df_chart, tuple(sim_metrics), method)
+    # Колонки — невпорядкована категорія year_str: max() по ній недоступний, беремо максимум рядків
+    ref_year = utils.ETALON_YEAR if utils.ETALON_YEAR in sim.columns else max(sim.columns.astype(str))
+    tables['similarity'] = analytics_page.similarity_table(df_chart, sim, sim_metrics, ref_year)
+    figures += [analytics_page.similarity_bar(tables['similarity']),
+                analytics_page.similarity_matrix_figure(sim, SIMILARITY_METHOD)]
+    return [f for f in figures if f is not None], tables
+
+
+def _write_html(path, title, scale, figures, similarity, options):
+    """Самодостатній HTML: plotly.js вбудовується один раз (або посилання на CDN)."""
+    parts = [fig.to_html(full_html=False, include_plotlyjs=options['plotlyjs'] if i == 0 else False,
+                         default_width='100%')
+             for i, fig in enumerate(figures)]
+    table = similarity.to_html(index=False, float_format='{:.1f}'.format) if similarity is not None else ''
+    doc = f"""<!DOCTYPE html>
+<html lang="uk"><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>body{{font-family:sans-serif;margin:24px}} table{{border-collapse:collapse}}
+td,th{{border:1px solid #d1d5da;padding:2px 8px;text-align:right}}</style></head>
+<body><h1>🚜 {html.escape(title)}</h1>
+<p>📍 Локацій: {scale['total']:,} · ~{scale['avg_fields']} полів на рік · 📅 Еталон: {utils.ETALON_YEAR}
+· згенеровано {pd.Timestamp.now():%d.%m.%Y %H:%M}</p>
+{''.join(parts)}
+<h2>🧬 Схожість років ({html.escape(SIMILARITY_METHOD)})</h2>{table}
+</body></html>"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(doc)
+
+# 4. ЗАПУСК
+def _quiet_streamlit():
+    # Поза сервером Streamlit пише попередження на кожен виклик st.* — приглушуємо
+    # (рівень задаємо після читання конфігу, інакше він його перезапише)
+    st_config.get_option('logger.level')
+    st_logger.set_log_level('error')
+
+
+def _failed_row(slug, title, error):
+    """Рядок reports.parquet для звіту, що впав: решта пакета генерується далі."""
+    return {'slug': slug, 'title': title, 'rows': 0, 'fields_years': 0, 'path': None,
+            'error': f"{type(error).__name__}: {error}"}
+
+
+def _write_index(out_dir, rows):
+    index = pd.DataFrame(rows)
+    if 'error' not in index.columns:
+        index['error'] = None
+    index = index.sort_values('slug', ignore_index=True)
+    index.to_parquet(os.path.join(out_dir, 'reports.parquet'), index=False)
+    links = ''.join(f'<li><a href="{html.escape(r.path)}">{html.escape(r.title)}</a> — {r.fields_years:,} полів-років</li>'
+                    if pd.notna(r.path) else
+                    f'<li>{html.escape(r.title)} — помилка: {html.escape(r.error)}</li>'
+                    for r in index.itertuples() if pd.notna(r.path) or pd.notna(r.error))
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html><html lang="uk"><head><meta charset="utf-8"><title>Звіти</title></head>'
+                f'<body><h1>🚜 Звіти Agro Analytics</h1><ul>{links}</ul></body></html>')
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Статичні HTML/Parquet звіти по кластерах і культурах.")
+    parser.add_argument('out_dir', nargs='?', default=DEFAULT_OUT, help="Тека для звітів")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Кількість процесів")
+    parser.add_argument('--cross', action='store_true', help="Також кожна пара кластер × культура")
+    parser.add_argument('--no-all', action='store_true', help="Без зведеного звіту по всіх даних")
+    parser.add_argument('--plotlyjs', choices=['inline', 'cdn'], default='inline',
+                        help="inline — plotly.js у кожному файлі (працює офлайн), cdn — посилання")
+    parser.add_argument('--full-res', action='store_true', help="Без проріджування ліній (більші файли)")
+    parser.add_argument('--point-budget', type=int, default=utils.POINT_BUDGET)
+    args = parser.parse_args()
+    _quiet_streamlit()
+
+    t0 = time.perf_counter()
+    # Головний процес синхронізує датасет і готує sidecar-файли куба — виконавці їх лише читають
+    version = utils.manifest_version(utils.sync_store())
+    metrics = tuple(utils.get_metrics_dict().values())
+    cube = aggregation.load_cube(version, metrics)
+    climatology.load_climatology(version, metrics)
+    plan = plan_reports(cube, args.cross, not args.no_all)
+    options = {'out_dir': args.out_dir, 'plotlyjs': True if args.plotlyjs == 'inline' else 'cdn',
+               'full_res': args.full_res, 'point_budget': args.point_budget}
+    os.makedirs(args.out_dir, exist_ok=True)
+    print(f"Звітів: {len(plan)}, процесів: {args.workers} (куб: {time.perf_counter() - t0:.1f} с)")
+
+    rows = []
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(version, metrics, options)) as pool:
+        futures = {pool.submit(render_report, *task): task for task in plan}
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                # Один звіт не зупиняє пакет: помилка потрапляє в індекс
+                slug, title, _ = futures[future]
+                rows.append(_failed_row(slug, title, e))
+                print(f"  ПОМИЛКА {slug}: {e!r}")
+            if i % 20 == 0 or i == len(plan):
+                print(f"  {i}/{len(plan)} ({time.perf_counter() - t0:.1f} с)")
+
+    index = _write_index(args.out_dir, rows)
+    failed = index['error'].notna().sum()
+    empty = index['path'].isna().sum() - failed
+    print(f"Готово: {len(index) - empty - failed} звітів у {args.out_dir} за {time.perf_counter() - t0:.1f} с"
+          + (f" (без даних: {empty})" if empty else "") + (f" (з помилкою: {failed})" if failed else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Бенчмарки основних шляхів коду застосунку на синтетичних даних кількох розмірів.
+
+Для кожного розміру (поля × роки) генерується датасет (synthetic_data.py, з кешем на
+диску) і по черзі вимірюються етапи: завантаження, фільтри сайдбару, куб і агрегація
+графіків, аналітика та побудова кожної сторінки. Для етапу фіксується найкращий час з
+кількох запусків і пік пам'яті (tracemalloc, окремим запуском). Результати можна
+зберегти як базову лінію і порівнювати з нею наступні запуски.
+
+    python benchmark.py --sizes 50x5,200x10,800x15 --save-baseline
+    python benchmark.py --compare benchmark_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import config as st_config, logger as st_logger
+
+import utils
+import filters
+import aggregation
+import analytics
+import synthetic_data
+from pages import temp_page, precip_page, tables_page, constructor_page, analytics_page
+
+# 1. КОНСТАНТИ
+DEFAULT_SIZES = '50x5,200x10,800x15'                      # поля × роки
+BENCH_DIR = os.path.join(utils.PREPARED_DIR, 'bench')     # Згенеровані датасети (перевикористовуються)
+BASELINE_FILE = 'benchmark_baseline.json'
+REPEAT = 3
+TOLERANCE = 0.25            # Допустиме уповільнення відносно базової лінії (+25%)
+MIN_DELTA_S = 0.005         # Різниці, менші за 5 мс, не вважаються регресією
+
+# 2. ВИМІРЮВАННЯ
+def _clear_memory_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def measure(fn, setup=None, repeat=REPEAT):
+    """(найкращий час, с; пік пам'яті, МБ). setup виконується перед кожним запуском і не вимірюється."""
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2 ** 20
+
+# 3. ЕТАПИ
+def _stages():
+    """Список (назва, setup, функція). Стан між етапами — у словнику ctx."""
+    ctx = {}
+    metrics = list(utils.get_metrics_dict().values())
+    all_sel = ["Всі"]
+
+    def rebuild_disk():
+        _clear_memory_caches()
+        shutil.rmtree(utils.AGG_STORE_DIR, ignore_errors=True)
+        shutil.rmtree(utils.PREPARED_DIR, ignore_errors=True)
+
+    def drop_cube_sidecar():
+        _clear_memory_caches()
+        shutil.rmtree(utils.PREPARED_DIR, ignore_errors=True)
+
+    def load_dims():
+        ctx['df_dims'] = utils.load_dims(filters.FILTER_DIMS + ['year_str'])
+        ctx['years'] = filters.FilterIndex(ctx['df_dims']).values('year')
+        ctx['cluster'] = [ctx['df_dims']['Cluster'].iloc[0]]
+
+    def build_index():
+        ctx['index'] = filters.FilterIndex(ctx['df_dims'])
+
+    def sidebar():
+        # Вибір як у сесії: один кластер, решта — "Всі"
+        st.session_state.sel_year_state = ["Всі"]
+        st.session_state.sel_cluster_state = ctx['cluster']
+        st.session_state.sel_block_state = ["Всі"]
+        st.session_state.sel_culture_state = ["Всі"]
+        filters.render_sidebar(ctx['df_dims'], ctx['index'])
+
+    def load_cube():
+        ctx['cube'] = aggregation.load_cube(utils.get_data_version(), tuple(metrics))
+
+    def chart(cluster):
+        def run():
+            ctx['df_chart'], _ = aggregation.build_chart(
+                ctx['cube'], filters.as_selection(ctx['years'], cluster(), all_sel, all_sel), metrics)
+        return run
+
+    def page(module, args):
+        # Сторінки — st.fragment; викликаємо саму функцію (поза сервером фрагмент не виконується)
+        return lambda: module.show.__wrapped__(ctx['df_chart'], *args(ctx))
+
+    colors = lambda c: (utils.get_colors(c['df_dims']),)
+    stages = [
+        ('store_build', rebuild_disk, utils.sync_store),
+        ('load_data_dims', _clear_memory_caches, load_dims),
+        ('load_data_full', _clear_memory_caches, lambda: utils.load_data()),
+        ('filter_index', None, build_index),
+        ('sidebar_filter', None, sidebar),
+        ('cube_build', drop_cube_sidecar, load_cube),
+        ('cube_load', _clear_memory_caches, load_cube),
+        ('chart_subset', None, chart(lambda: ctx['cluster'])),
+        ('chart_all', None, chart(lambda: all_sel)),
+        ('rain_matrices', st.cache_data.clear, lambda: analytics.rain_matrices(ctx['df_chart'])),
+    ]
+    for label, method in analytics.SIMILARITY_METHODS.items():
+        stages.append((f'similarity_{method}', st.cache_data.clear,
+                       lambda method=method: analytics.similarity_matrix(ctx['df_chart'], tuple(metrics), method)))
+    stages += [
+        ('page_temp', st.cache_data.clear, page(temp_page, colors)),
+        ('page_precip', st.cache_data.clear, page(precip_page, colors)),
+        ('page_constructor', st.cache_data.clear, page(constructor_page, colors)),
+        ('page_analytics', st.cache_data.clear, page(analytics_page, colors)),
+        ('page_tables', st.cache_resource.clear, page(
+            tables_page, lambda c: (c['years'], all_sel, all_sel, all_sel))),
+    ]
+    return stages
+
+
+def run_size(fields, years, args):
+    """Генерує (або бере готовий) датасет і вимірює всі етапи на ньому."""
+    data_dir = os.path.abspath(os.path.join(args.data_dir, f"{fields}x{years}_s{args.seed}"))
+    if not os.path.exists(os.path.join(data_dir, utils.FIELD_SUMMARY_FILE)):
+        synthetic_data.write_dataset(data_dir, fields, years, args.clusters, args.blocks, args.cultures, args.seed)
+
+    cwd = os.getcwd()
+    os.chdir(data_dir)        # Шляхи utils відносні — працюємо в теці датасету
+    try:
+        _clear_memory_caches()
+        results = {'rows': len(pd.read_parquet(utils.FILE_TO_LOAD, columns=['year'])), 'stages': {}}
+        for name, setup, fn in _stages():
+            t, mem = measure(fn, setup, 1 if name in ('store_build', 'cube_build') else args.repeat)
+            results['stages'][name] = {'time_s': round(t, 5), 'peak_mb': round(mem, 2)}
+            print(f"  {name:<24}{t * 1000:>10.1f} мс{mem:>10.1f} МБ")
+
+        # Обсяг завантаженого датафрейму (компактна схема проти широкої)
+        total = utils.memory_report(utils.load_data()).iloc[-1]
+        results['memory_mb'] = {'compact': float(total['МБ']), 'wide': float(total['МБ (широка схема)']),
+                                'all_in_schema': bool(total['у схемі'])}
+        print(f"  {'dataframe_memory':<24}{total['МБ']:>10.1f} МБ (широка схема: {total['МБ (широка схема)']:.1f} МБ)")
+        if not total['у схемі']:
+            print("  УВАГА: є колонки поза utils.schema_types()")
+    finally:
+        os.chdir(cwd)
+    return results
+
+# 4. БАЗОВА ЛІНІЯ ТА ПОРІВНЯННЯ
+def compare(results, baseline, tolerance):
+    """Список регресій (розмір, етап, було, стало) — час або пам'ять датафрейму зросли більше ніж на tolerance."""
+    regressions = []
+    for size, res in results.items():
+        base = baseline.get('results', {}).get(size)
+        if not base:
+            continue
+        for stage, cur in res['stages'].items():
+            old = base['stages'].get(stage)
+            if old and cur['time_s'] > old['time_s'] * (1 + tolerance) and cur['time_s'] - old['time_s'] > MIN_DELTA_S:
+                regressions.append((size, stage, old['time_s'], cur['time_s']))
+        old_mem, new_mem = base.get('memory_mb', {}).get('compact'), res['memory_mb']['compact']
+        if old_mem and new_mem > old_mem * (1 + tolerance):
+            regressions.append((size, 'dataframe_memory', old_mem, new_mem))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки застосунку на синтетичних даних.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Розміри через кому: ПОЛЯxРОКИ")
+    parser.add_argument('--clusters', type=int, default=6)
+    parser.add_argument('--blocks', type=int, default=3)
+    parser.add_argument('--cultures', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--data-dir', default=BENCH_DIR, help="Тека для згенерованих датасетів")
+    parser.add_argument('--out', help="Зберегти результати цього запуску у JSON")
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_FILE, help="Записати результати як базову лінію")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_FILE, help="Порівняти з базовою лінією")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    # Поза сервером Streamlit пише попередження на кожен виклик st.* — приглушуємо
+    # (рівень задаємо після читання конфігу, інакше він його перезапише)
+    st_config.get_option('logger.level')
+    st_logger.set_log_level('error')
+
+    results = {}
+    for size in args.sizes.split(','):
+        fields, years = map(int, size.lower().split('x'))
+        print(f"=== {fields} полів × {years} років ===")
+        results[size] = run_size(fields, years, args)
+
+    report = {
+        'meta': {'date': pd.Timestamp.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'pandas': pd.__version__, 'numpy': np.__version__, 'machine': platform.machine(),
+                 'clusters': args.clusters, 'blocks': args.blocks, 'cultures': args.cultures, 'seed': args.seed},
+        'results': results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Збережено: {path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for size, stage, old, new in regressions:
+            unit, k = ('МБ', 1) if stage == 'dataframe_memory' else ('мс', 1000)
+            print(f"РЕГРЕСІЯ {size} {stage}: {old * k:.1f} → {new * k:.1f} {unit} (×{new / old:.2f})")
+        if regressions:
+            sys.exit(1)
+        print("Регресій відносно базової лінії немає.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import warnings
+import streamlit as st
+import numpy as np
+import pandas as pd
+import utils
+import aggregation
+
+# 1. КОНСТАНТИ
+ALL = "Всі"
+LEVELS = [['Cluster', 'Culture'], ['Cluster'], ['Culture'], []]   # Рівні норми ("Всі" для відсутніх вимірів)
+QUANTILES = {'p10': 0.1, 'p50': 0.5, 'p90': 0.9}
+STATS = ['min', 'p10', 'p50', 'p90', 'max', 'mean', 'std', 'n']
+
+# 2. РОЗРАХУНОК НОРМИ: ПЕРЦЕНТИЛІ ПО ДНЯХ РОКУ
+def base_years(years):
+    """Роки, з яких рахується норма: усі, крім еталонного (поточного), якщо є інші."""
+    years = sorted(map(str, years))
+    return [y for y in years if y != utils.ETALON_YEAR] or years
+
+
+def build_climatology(cube_frame, metrics):
+    """Багаторічна норма кожного показника по днях року (plot_date) для рівнів LEVELS.
+
+    Значення року — середнє по рядках куба, як у aggregation.build_chart, тож норма
+    узгоджена з кривими на графіках. Для кожної комірки (рівень × день) роки
+    розкладаються в рядок масиву, сортуються одним np.sort (NaN — у кінці), а
+    перцентилі беруться лінійною інтерполяцією за кількістю наявних років.
+    Результат — довга таблиця Cluster × Culture × metric × plot_date зі STATS (float32).
+    """
+    frame = cube_frame[cube_frame['year_str'].isin(base_years(cube_frame['year_str'].unique()))]
+    cols = [f"{m}__sum" for m in metrics] + [f"{m}__n" for m in metrics]
+    parts = []
+    for level in LEVELS:
+        sums = frame.groupby(level + ['plot_date', 'year_str'], observed=True)[cols].sum()
+        values = pd.DataFrame({m: sums[f"{m}__sum"] / sums[f"{m}__n"].where(sums[f"{m}__n"] > 0)
+                               for m in metrics}, index=sums.index)
+        parts.append(_quantiles(values, level, metrics))
+    return utils.concat_compact(parts)
+
+
+def _quantiles(values, level, metrics):
+    """values: (рівень, plot_date, year_str) × показник -> STATS по (рівень, plot_date) × показник."""
+    keys = values.index.droplevel('year_str')
+    cell_codes, cells = pd.factorize(keys)
+    cells = cells.set_names(keys.names)                           # factorize губить імена рівнів
+    year_codes, years = pd.factorize(values.index.get_level_values('year_str'))
+    X = np.full((len(cells), len(metrics), len(years)), np.nan)
+    X[cell_codes, :, year_codes] = values.to_numpy(dtype=float)
+
+    X = np.sort(X, axis=-1)                                       # NaN — у кінці рядка
+    n = (~np.isnan(X)).sum(axis=-1)
+    last = np.maximum(n - 1, 0)
+
+    def at(pos):
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, last)
+        a = np.take_along_axis(X, lo[..., None], -1)[..., 0]
+        b = np.take_along_axis(X, hi[..., None], -1)[..., 0]
+        return a + (b - a) * (pos - lo)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)            # Комірки без жодного року
+        stats = {'min': X[..., 0], 'max': at(last.astype(float))}
+        stats |= {name: at(q * last) for name, q in QUANTILES.items()}
+        stats |= {'mean': np.nanmean(X, axis=-1), 'std': np.nanstd(X, axis=-1)}
+    stats = {k: np.where(n > 0, v, np.nan).astype('float32') for k, v in stats.items()}
+
+    # Рядок на (комірка, показник)
+    cell_frame = cells.to_frame(index=False) if isinstance(cells, pd.MultiIndex) \
+        else pd.DataFrame({'plot_date': cells})
+    out = cell_frame.loc[np.repeat(np.arange(len(cells)), len(metrics))].reset_index(drop=True)
+    for dim in ['Cluster', 'Culture']:
+        if dim not in level:
+            out[dim] = ALL
+    out['metric'] = np.tile(metrics, len(cells))
+    out = out.assign(**{k: v.ravel() for k, v in stats.items()}, n=n.ravel().astype('int16'))
+    out = out.astype({'Cluster': 'category', 'Culture': 'category', 'metric': 'category'})
+    return out[['Cluster', 'Culture', 'metric', 'plot_date'] + STATS]
+
+
+class Climatology:
+    """Таблиця норми з індексом (Cluster, Culture) -> рядки для швидкого вибору смуги."""
+
+    def __init__(self, frame):
+        self.frame = frame.sort_values(['Cluster', 'Culture', 'metric', 'plot_date'], ignore_index=True)
+        self.groups = self.frame.groupby(['Cluster', 'Culture'], observed=True).indices
+
+    def for_selection(self, sel_cluster, sel_culture):
+        """Норма для вибору сайдбару та підпис. Кілька значень виміру -> рівень "Всі" цього виміру."""
+        key = tuple(sel[0] if len(sel) == 1 else ALL for sel in (sel_cluster, sel_culture))
+        rows = self.groups.get(key)
+        if rows is None:
+            return None, None
+        label = " · ".join(v for v in key if v != ALL) or "усі кластери та культури"
+        if any(len(sel) > 1 and ALL not in sel for sel in (sel_cluster, sel_culture)):
+            label += " (кілька значень у фільтрі — норма ширшого рівня)"
+        return self.frame.iloc[rows], label
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_climatology(version, metrics):
+    """Норма версії даних: з sidecar-файлу поруч із маніфестом або побудова з куба."""
+    source = utils.store_source()
+    frame = utils.read_sidecar(source, 'climate')
+    if frame is None or not set(metrics) <= set(frame['metric'].unique()):
+        frame = build_climatology(aggregation.load_cube(version, metrics).frame, list(metrics))
+        utils.write_sidecar(frame, source, 'climate')
+    return Climatology(frame)
+
+# 3. СМУГИ ТА АНОМАЛІЇ ДЛЯ СТОРІНОК
+def band(climate, metric, df=None):
+    """Норма одного показника по днях (plot_date + STATS) або None; з df — лише на його датах."""
+    if climate is None:
+        return None
+    part = climate[climate['metric'] == metric]
+    if df is not None and len(df):
+        part = part[part['plot_date'].between(df['plot_date'].min(), df['plot_date'].max())]
+    return part if len(part) else None
+
+
+def anomalies(df_chart, band_df, metric):
+    """Для кожного року — останній день з даними, значення, z-оцінка та положення відносно P10–P90."""
+    if band_df is None or df_chart.empty:
+        return pd.DataFrame()
+    last = df_chart[df_chart[metric].notna()].groupby('year_str', observed=True).tail(1)
+    # Показник може називатися так само, як статистика (min/max/mean) — перейменовуємо
+    last = last[['year_str', 'hover_date', 'plot_date', metric]].rename(columns={metric: 'value'})
+    df = last.merge(band_df[['plot_date'] + STATS], on='plot_date', how='inner')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df['z'] = (df['value'] - df['mean']) / df['std'].where(df['std'] > 0)
+    df['положення'] = np.select([df['value'] > df['p90'], df['value'] < df['p10']],
+                                ["вище P90", "нижче P10"], "у межах P10–P90")
+    return df.set_index('year_str')
+
+
+def anomaly_text(df_chart, climate, metric, fmt="{:.0f}"):
+    """Підпис під графіком: еталонний (або останній) рік на останню дату проти норми."""
+    table = anomalies(df_chart, band(climate, metric), metric)
+    if table.empty:
+        return None
+    # year_str — невпорядкована категорія: max() по ній недоступний, тож беремо максимум рядків
+    year = utils.ETALON_YEAR if utils.ETALON_YEAR in table.index else max(table.index.astype(str))
+    row = table.loc[year]
+    z = f", z = {row['z']:+.1f}" if pd.notna(row['z']) else ""
+    return (f"Аномалія {year} на {row['hover_date']}: {fmt.format(row['value'])} при нормі "
+            f"{fmt.format(row['p50'])} (P10–P90: {fmt.format(row['p10'])}–{fmt.format(row['p90'])}) — "
+            f"{row['положення']}{z}")
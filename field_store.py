@@ -0,0 +1,145 @@
+"""Сховище щоденних рядів по полях для деталізації поля (Arrow IPC з індексом зсувів, mmap).
+
+Один файл FIELD_STORE_FILE: рядки відсортовані за полем і датою, тож усі роки поля
+лежать суцільним блоком, а індекс зсувів (поле-рік -> перший рядок, кількість рядків,
+Cluster · Block · Culture) записаний у метадані схеми. Файл відкривається через mmap:
+ряд поля — зріз таблиці без копіювання, і з диска читаються лише сторінки цього поля.
+
+Будується precompute_summary.py (з файлів стану — усі щоденні метрики), synthetic_data.py
+або окремо з FIELD_DAILY_FILE (лише min/max):
+
+    python field_store.py [WEB_FIELD_DAILY.parquet] [--out WEB_FIELD_STORE.arrow]
+"""
+import argparse
+import glob
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+import utils
+
+# 1. КОНСТАНТИ
+FIELD_KEYS = ['Поле', 'Cluster', 'Block', 'Culture']
+INDEX_KEY = b'field_index'              # Метадані схеми: індекс зсувів (Arrow IPC stream)
+BATCH_ROWS = 64 * 1024                  # Рядків у record batch файлу
+
+# 2. ЗАПИС
+def build(parts, path=utils.FIELD_STORE_FILE):
+    """Записує сховище з частин parts; кожна частина містить усі роки своїх полів.
+
+    Перший прохід пише рядки у тимчасовий файл і збирає індекс зсувів, другий — переписує
+    ті самі батчі (через mmap) у файл, у схемі якого вже є індекс; підміна — os.replace.
+    Повертає кількість полів-років.
+    """
+    rows_tmp, offset, writer, schema, index = path + '.rows.tmp', 0, None, None, []
+    for part in parts:
+        if part.empty:
+            continue
+        part = part.sort_values(['Поле', 'date'], kind='stable', ignore_index=True)
+        if schema is None:
+            metrics = [c for c in part.columns if c not in FIELD_KEYS + ['date', 'Рік']]
+            schema = pa.schema([('date', pa.timestamp('ms'))] + [(m, pa.float32()) for m in metrics])
+            writer = pa.ipc.new_file(rows_tmp, schema)
+        table = pa.Table.from_pandas(part[schema.names], preserve_index=False).cast(schema)
+        writer.write_table(table, max_chunksize=BATCH_ROWS)
+
+        # Межі полів-років у цій частині -> рядки індексу зі зсувом від початку файлу
+        field = pd.factorize(part['Поле'])[0]
+        year = part['date'].dt.year.to_numpy()
+        starts = np.flatnonzero(np.r_[True, (field[1:] != field[:-1]) | (year[1:] != year[:-1])])
+        entry = part.loc[starts, FIELD_KEYS].astype(str).reset_index(drop=True)
+        entry['Рік'] = year[starts].astype('int16')
+        entry['start'] = offset + starts
+        entry['rows'] = np.diff(np.r_[starts, len(part)])
+        index.append(entry)
+        offset += len(part)
+    if writer is None:
+        raise ValueError("немає щоденних даних для сховища полів")
+    writer.close()
+
+    index = pd.concat(index, ignore_index=True)
+    source = pa.ipc.open_file(pa.memory_map(rows_tmp))
+    with pa.ipc.new_file(path + '.tmp', schema.with_metadata({INDEX_KEY: _pack(index)})) as out:
+        for i in range(source.num_record_batches):
+            out.write_batch(source.get_batch(i))
+    del source
+    os.replace(path + '.tmp', path)
+    os.remove(rows_tmp)
+    return len(index)
+
+
+def _pack(index):
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(index, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def parts_from_state(state_dir):
+    """Частини з файлів стану precompute: кошик поля однаковий у всіх роках, тож кошик = цілі поля."""
+    buckets = defaultdict(list)
+    for file in glob.glob(os.path.join(state_dir, 'fields', 'year=*', 'bucket=*.parquet')):
+        buckets[os.path.basename(file)].append(file)
+    for name in sorted(buckets):
+        yield pd.concat([pd.read_parquet(f) for f in sorted(buckets[name])], ignore_index=True)
+
+
+def parts_from_daily(path=utils.FIELD_DAILY_FILE):
+    """FIELD_DAILY_FILE однією частиною (лише min/max)."""
+    yield pd.read_parquet(path)
+
+# 3. ЧИТАННЯ
+class FieldStore:
+    """Відкрите сховище: таблиця рядів (mmap) та індекс полів-років."""
+
+    def __init__(self, path):
+        self.table = pa.ipc.open_file(pa.memory_map(path)).read_all()   # Лише метадані — дані не читаються
+        self.metrics = [c for c in self.table.column_names if c != 'date']
+        index = pa.ipc.open_stream(pa.py_buffer(self.table.schema.metadata[INDEX_KEY])).read_all().to_pandas()
+        self.index = index.astype({c: 'category' for c in FIELD_KEYS})
+        self._rows = self.index.groupby('Поле', observed=True, sort=False).indices
+
+    def fields(self, selection=None):
+        """Відсортовані назви полів, у яких є поля-роки з вибору {Рік/Cluster/Block/Culture: [значення]}."""
+        mask = np.ones(len(self.index), dtype=bool)
+        for dim, values in (selection or {}).items():
+            mask &= self.index[dim].isin(values).to_numpy()
+        return sorted(self.index.loc[mask, 'Поле'].unique().tolist())
+
+    def series(self, field):
+        """Усі роки поля: дата, рік, виміри року та метрики; plot_date — на вісь PLOT_YEAR_START."""
+        meta = self.index.iloc[self._rows[field]]
+        start, rows = int(meta['start'].iloc[0]), int(meta['rows'].sum())
+        df = self.table.slice(start, rows).to_pandas()
+        rows = meta['rows'].to_numpy()
+        for col in ['Рік', 'Cluster', 'Block', 'Culture']:
+            df[col] = np.repeat(meta[col].to_numpy(), rows)
+        df['year_str'] = np.repeat(meta['Рік'].astype(str).to_numpy(), rows)
+        df['plot_date'] = utils.to_plot_date(df['date'])
+        return df
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_field_store(version):
+    """Сховище версії файлу (None, якщо FIELD_STORE_FILE немає)."""
+    if version is None:
+        return None
+    return FieldStore(utils.FIELD_STORE_FILE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сховище щоденних рядів по полях з WEB_FIELD_DAILY.")
+    parser.add_argument('daily', nargs='?', default=utils.FIELD_DAILY_FILE)
+    parser.add_argument('--out', default=utils.FIELD_STORE_FILE)
+    args = parser.parse_args()
+    n = build(parts_from_daily(args.daily), args.out)
+    print(f"Готово: {args.out} — {n} полів-років")
+
+
+if __name__ == '__main__':
+    main()
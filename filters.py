@@ -1,6 +1,92 @@
 import streamlit as st
+import numpy as np
+import pandas as pd
+import utils
+
+# Виміри каскадних фільтрів сайдбару (у порядку каскаду)
+FILTER_DIMS = ['year', 'Cluster', 'Block', 'Culture']
+# Ті самі виміри у зведенні по полях (рік там зберігається як 'Рік')
+SUMMARY_DIMS = ['Рік', 'Cluster', 'Block', 'Culture']
+
+
+class FilterIndex:
+    """Інвертований індекс фільтрів: значення виміру -> відсортовані номери рядків.
+
+    Будується один раз при завантаженні даних. Вибір фільтрів розв'язується
+    перетином списків рядків, а опції каскаду беруться з таблиці спільної
+    появи значень (унікальні комбінації вимірів), без проходу по всьому датафрейму.
+    """
+
+    def __init__(self, df, dims=FILTER_DIMS):
+        self.n_rows = len(df)
+        self.rows = {}
+        for dim in dims:
+            codes, uniques = pd.factorize(df[dim], sort=True)
+            # Рядки з NaN (код -1) потрапляють у нульовий кошик, який відкидаємо
+            order = np.argsort(codes, kind='stable')
+            bounds = np.cumsum(np.bincount(codes + 1, minlength=len(uniques) + 1))[:-1]
+            self.rows[dim] = dict(zip(uniques.tolist(), np.split(order, bounds)[1:]))
+
+        # Таблиця спільної появи значень для каскадних опцій
+        self.combos = df[dims].drop_duplicates().reset_index(drop=True)
+
+    def values(self, dim):
+        return sorted(self.rows[dim])
+
+    def options(self, dim, selection):
+        """Доступні значення виміру з урахуванням вибору попередніх фільтрів."""
+        mask = np.ones(len(self.combos), dtype=bool)
+        for d, vals in selection.items():
+            mask &= self.combos[d].isin(vals).to_numpy()
+        return sorted(self.combos.loc[mask, dim].dropna().unique().tolist())
+
+    def lookup(self, selection):
+        """Номери рядків (відсортовані) для вибору {вимір: [значення]}."""
+        result = None
+        for dim, vals in selection.items():
+            parts = [self.rows[dim].get(v, np.empty(0, dtype=np.intp)) for v in vals]
+            ids = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+        return np.arange(self.n_rows) if result is None else result
+
+
+def selection_key(sel_years, sel_cluster, sel_block, sel_culture):
+    """Канонічний (незалежний від порядку кліків) ключ вибору фільтрів для кешів."""
+    return tuple(tuple(sorted(map(str, sel))) for sel in (sel_years, sel_cluster, sel_block, sel_culture))
+
+
+def as_selection(sel_years, sel_cluster, sel_block, sel_culture):
+    """Вибір у форматі FilterIndex.lookup: лише виміри, що обмежують вибірку."""
+    selection = {'year': sel_years}
+    for dim, sel in zip(FILTER_DIMS[1:], (sel_cluster, sel_block, sel_culture)):
+        if "Всі" not in sel:
+            selection[dim] = sel
+    return selection
+
+
+def as_summary_selection(sel_years, sel_cluster, sel_block, sel_culture):
+    """Вибір сайдбару у вимірах зведення по полях (SUMMARY_DIMS)."""
+    selection = as_selection(sel_years, sel_cluster, sel_block, sel_culture)
+    selection['Рік'] = [int(y) for y in selection.pop('year')]
+    return selection
+
+
+@st.cache_resource(show_spinner=False)
+def build_filter_index(_df, version):
+    """Один індекс на версію даних для всіх сесій процесу."""
+    return FilterIndex(_df)
+
+
+@st.cache_resource(show_spinner=False)
+def build_summary_index(_df, version):
+    """Індекс зведення по полях на версію файлу зведення."""
+    return FilterIndex(_df, dims=SUMMARY_DIMS)
+
+
+def render_sidebar(df, index=None):
+    if index is None:
+        index = FilterIndex(df)
 
-def render_sidebar(df):
     st.sidebar.header("🔍 Налаштування")
 
     # --- 1. КНОПКА СКИНУТИ ВСІ ФІЛЬТРИ ---
@@ -28,7 +114,7 @@ def render_sidebar(df):
                     st.session_state[key] = [x for x in current if x != "Всі"]
 
     # --- 3. РОКИ (Тепер теж "Розумний") ---
-    all_years_opts = sorted(df['year'].unique().tolist(), reverse=True)
+    all_years_opts = index.values('year')[::-1]
     if "sel_year_state" not in st.session_state:
         st.session_state.sel_year_state = ["Всі"]
 
@@ -45,11 +131,12 @@ def render_sidebar(df):
         sel_years = all_years_opts
     else:
         sel_years = st.session_state.sel_year_state
-        
-    df_f = df[df['year'].isin(sel_years)]
+
+    # Поточний вибір для індексу (виміри з "Всі" не обмежують вибірку)
+    selection = {} if "Всі" in st.session_state.sel_year_state else {'year': sel_years}
 
     # --- 4. КЛАСТЕР ---
-    cluster_opts = sorted(df_f['Cluster'].unique().tolist())
+    cluster_opts = index.options('Cluster', selection)
     if "sel_cluster_state" not in st.session_state:
         st.session_state.sel_cluster_state = ["Всі"]
         
@@ -59,10 +146,10 @@ def render_sidebar(df):
     )
     sel_cluster = st.session_state.sel_cluster_state
     if "Всі" not in sel_cluster:
-        df_f = df_f[df_f['Cluster'].isin(sel_cluster)]
+        selection['Cluster'] = sel_cluster
 
     # --- 5. БЛОК ---
-    block_opts = sorted(df_f['Block'].unique().tolist())
+    block_opts = index.options('Block', selection)
     if "sel_block_state" not in st.session_state:
         st.session_state.sel_block_state = ["Всі"]
         
@@ -72,10 +159,10 @@ def render_sidebar(df):
     )
     sel_block = st.session_state.sel_block_state
     if "Всі" not in sel_block:
-        df_f = df_f[df_f['Block'].isin(sel_block)]
+        selection['Block'] = sel_block
 
     # --- 6. КУЛЬТУРА ---
-    culture_opts = sorted(df_f['Culture'].unique().tolist())
+    culture_opts = index.options('Culture', selection)
     if "sel_culture_state" not in st.session_state:
         st.session_state.sel_culture_state = ["Всі"]
         
@@ -85,6 +172,20 @@ def render_sidebar(df):
     )
     sel_culture = st.session_state.sel_culture_state
     if "Всі" not in sel_culture:
-        df_f = df_f[df_f['Culture'].isin(sel_culture)]
+        selection['Culture'] = sel_culture
+
+    df_f = df.iloc[index.lookup(selection)]
+
+    return df_f, sel_years, sel_cluster, sel_block, sel_culture
+
 
-    return df_f, sel_years, sel_cluster, sel_block, sel_culture
\ No newline at end of file
+def render_chart_settings():
+    """Налаштування швидкого режиму графіків (проріджування на сервері + WebGL) та коридору норми."""
+    with st.sidebar.expander("⚡ Рендеринг графіків"):
+        st.checkbox("Швидкий режим (проріджування + WebGL)", key="fast_render",
+                    help="Корисно при 10+ роках: менше даних у браузер, лінії малюються через WebGL")
+        st.number_input("Точок на лінію:", min_value=50, max_value=2000, step=50,
+                        value=utils.POINT_BUDGET, key="point_budget", disabled=not st.session_state.get("fast_render"))
+    with st.sidebar.expander("📈 Норма (багаторічна)"):
+        st.selectbox("Коридор норми на графіках:", list(utils.CLIMATE_BANDS) + ["Немає"], key="climate_band",
+                     help="Перцентилі по днях року за всі роки, крім еталонного, для вибраного кластера/культури")
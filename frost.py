@@ -0,0 +1,141 @@
+import os
+import streamlit as st
+import numpy as np
+import pandas as pd
+import utils
+
+# 1. КОНСТАНТИ
+DEFAULT_THRESHOLD = utils.FROST_THRESHOLD     # -1 °C, як у колонці "Перший мороз" зведення
+AUTUMN_FROM_MONTH = utils.FROST_FROM_MONTH    # До 1 липня — весняні заморозки, з 1 липня — осінні
+FIELD_KEYS = ['Поле', 'Cluster', 'Block', 'Culture']
+EVENT_COLS = ['Останній весняний мороз', 'Перший осінній мороз', 'Безморозний період, днів',
+              'Днів з морозом', 'Подій морозу', 'Найдовша серія, днів', 'Градусо-години нижче порогу']
+
+# 2. ДЖЕРЕЛО: ЩОДЕННІ МІНІМУМИ ПО ПОЛЯХ
+class FrostSource:
+    """Щоденні min/max, упорядковані за полем-роком і датою, у вигляді numpy-масивів.
+
+    Сортування та коди полів-років не залежать від порогу — готуються один раз на версію
+    даних, а розрахунок для кожного порогу — це кілька векторних проходів (events).
+    """
+
+    def __init__(self, df, unit):
+        self.unit = unit
+        year = df['date'].dt.year.to_numpy()
+        codes, _ = pd.factorize(df['Поле'])
+        order = np.lexsort((df['date'].to_numpy(), year, codes))
+        codes, year_s = codes[order], year[order]
+        new_key = np.r_[True, (codes[1:] != codes[:-1]) | (year_s[1:] != year_s[:-1])]
+        self.key = np.cumsum(new_key) - 1                            # Код поля-року
+        self.n = int(new_key.sum())
+
+        dates = df['date'].to_numpy()[order]
+        self.days = dates.astype('datetime64[D]').astype('int64')
+        self.month = df['date'].dt.month.to_numpy()[order]
+        self.tmin = df['min'].to_numpy(dtype='float64')[order]
+        self.tmax = df['max'].to_numpy(dtype='float64')[order]
+        # Наступний рядок — той самий поле-рік і наступний календарний день
+        self.consecutive = np.r_[False, (self.key[1:] == self.key[:-1]) & (np.diff(self.days) == 1)]
+
+        first = order[new_key]
+        self.fields = df[FIELD_KEYS].iloc[first].reset_index(drop=True)
+        self.fields.insert(1, 'Рік', year[first].astype('int16'))
+
+    def events(self, threshold):
+        """Один рядок на поле-рік: межі морозного сезону, події (серії днів ≤ порогу) та градусо-години."""
+        n, key = self.n, self.key
+        frost = self.tmin <= threshold                              # NaN -> False
+
+        # Run-length: серія починається з морозного дня, якщо попередній день не морозний
+        # або не є попереднім днем того самого поля-року
+        starts = frost & ~(self.consecutive & np.r_[False, frost[:-1]])
+        run_id = np.cumsum(starts) - 1
+        run_len = np.bincount(run_id[frost], minlength=int(starts.sum()))
+        run_key = key[starts]
+        longest = np.zeros(n, dtype='int64')
+        np.maximum.at(longest, run_key, run_len)
+
+        # Градусо-години: добовий хід — трикутник від min до max, частка доби нижче порогу
+        # (threshold - min) / (max - min); без max вважаємо, що нижче порогу вся доба
+        depth = np.where(frost, threshold - self.tmin, 0)
+        span = self.tmax - self.tmin
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(span > 0, np.clip(depth / span, 0, 1), 1.0)
+        degree_hours = np.bincount(key, weights=np.nan_to_num(0.5 * depth * 24 * share), minlength=n)
+
+        autumn = self.month >= AUTUMN_FROM_MONTH
+        last_spring = _extreme(np.maximum, key, self.days, frost & ~autumn, n, np.iinfo('int64').min)
+        first_autumn = _extreme(np.minimum, key, self.days, frost & autumn, n, np.iinfo('int64').max)
+
+        out = self.fields.copy()
+        out['Останній весняний мороз'] = _to_dates(last_spring)
+        out['Перший осінній мороз'] = _to_dates(first_autumn)
+        out['Безморозний період, днів'] = (out['Перший осінній мороз'] - out['Останній весняний мороз']).dt.days
+        out['Днів з морозом'] = np.bincount(key, weights=frost, minlength=n).astype('int16')
+        out['Подій морозу'] = np.bincount(run_key, minlength=n).astype('int16')
+        out['Найдовша серія, днів'] = longest.astype('int16')
+        out['Градусо-години нижче порогу'] = degree_hours.astype('float32')
+        return out
+
+
+def _extreme(ufunc, key, days, mask, n, fill):
+    out = np.full(n, fill, dtype='int64')
+    ufunc.at(out, key[mask], days[mask])
+    return np.where(out == fill, np.iinfo('int64').min, out)        # iinfo.min -> NaT
+
+
+def _to_dates(days):
+    return pd.Series(days.astype('datetime64[D]')).astype('datetime64[s]')
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_frost_source(version):
+    """Щоденні дані по полях з FIELD_DAILY_FILE; без нього — по локаціях (Cluster · Block · Culture) зі сховища."""
+    if os.path.exists(utils.FIELD_DAILY_FILE):
+        return FrostSource(pd.read_parquet(utils.FIELD_DAILY_FILE, memory_map=True), 'поле')
+    df = utils.read_store(columns=['Cluster', 'Block', 'Culture', 'year', 'month', 'day', 'min', 'max'])
+    df['date'] = pd.to_datetime(df[['year', 'month', 'day']])
+    df['Поле'] = df['Cluster'].astype(str) + " · " + df['Block'].astype(str) + " · " + df['Culture'].astype(str)
+    return FrostSource(df, 'локація')
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def frost_events(version, threshold):
+    """Події морозу по полях-роках для порогу (кешується окремо для кожного порогу)."""
+    return load_frost_source(version).events(threshold)
+
+# 3. ЗВЕДЕННЯ ДЛЯ СТОРІНКИ
+def filter_events(events, selection):
+    """Рядки подій для вибору сайдбару у форматі filters.as_selection."""
+    mask = np.ones(len(events), dtype=bool)
+    for dim, values in (selection or {}).items():
+        col = 'Рік' if dim == 'year' else dim
+        mask &= events[col].astype(str).isin([str(v) for v in values]).to_numpy()
+    return events[mask]
+
+
+def yearly_summary(events):
+    """По роках: частка полів з морозом, медіани дат меж сезону, середні події та градусо-години."""
+    if events.empty:
+        return pd.DataFrame()
+    # День на високосній осі PLOT_YEAR_START: у невисокосні роки після лютого вже зсунутий на +1
+    doy = lambda col: pd.Series(utils.plot_doy(events[col]), index=events.index)
+    g = events.assign(spring=doy('Останній весняний мороз'), autumn=doy('Перший осінній мороз'),
+                      any_frost=events['Днів з морозом'] > 0).groupby('Рік', observed=True)
+    out = pd.DataFrame({
+        'Полів': g.size(),
+        'З морозом, %': g['any_frost'].mean() * 100,
+        'Ост. весняний (медіана)': g['spring'].median().map(_doy_label),
+        'Перший осінній (медіана)': g['autumn'].median().map(_doy_label),
+        'Безморозний період (медіана), днів': g['Безморозний період, днів'].median(),
+        'Подій (сер.)': g['Подій морозу'].mean(),
+        'Найдовша серія, днів': g['Найдовша серія, днів'].max(),
+        'Градусо-години (сер.)': g['Градусо-години нижче порогу'].mean().astype(float),
+    })
+    return out.round(1).sort_index(ascending=False)
+
+
+def _doy_label(doy):
+    if pd.isna(doy):
+        return None
+    return (utils.PLOT_YEAR_START + pd.Timedelta(days=int(round(doy)))).strftime('%d.%m')
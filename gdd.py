@@ -0,0 +1,89 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import utils
+import aggregation
+
+# 1. КОНСТАНТИ
+GDD_COL = 'GDD_custom'
+METHODS = {
+    "Середня t (або (мін + макс) / 2)": 'mean',
+    "Мін–макс з обмеженнями (база/стеля)": 'minmax',
+}
+DEFAULT_BASE = 10.0
+DEFAULT_CAP = 30.0
+DEFAULT_START = (5, 14)         # 14 травня, як у графіку накопичення
+
+# 2. ЩОДЕННИЙ ВНЕСОК ТА НАКОПИЧЕННЯ ПО ГРУПАХ
+def daily_degrees(tmean, tmin, tmax, base, cap=None, method='mean'):
+    """Внесок дня в суму (°C·день) для бази base і стелі cap (None — без стелі).
+
+    mean   — clip(T_сер - base, 0, cap - base); T_сер = (min + max) / 2, якщо середньої немає;
+    minmax — max обмежується стелею, min — базою, далі середнє мінус база (метод «averaging» з обмеженнями).
+    """
+    upper = np.inf if cap is None else cap
+    if method == 'minmax':
+        hi = np.minimum(tmax, upper)
+        lo = np.clip(tmin, base, hi)
+        return np.clip((hi + lo) / 2 - base, 0, None)
+    t = np.where(np.isnan(tmean), (tmin + tmax) / 2, tmean)
+    return np.clip(t - base, 0, upper - base)
+
+
+def grouped_cumsum(values, group_start):
+    """Накопичена сума в межах груп, що йдуть суцільними блоками (group_start — перший рядок блоку)."""
+    total = np.cumsum(values)
+    block = np.cumsum(group_start) - 1
+    offset = (total - values)[group_start]
+    return total - offset[block]
+
+
+def heat_frame(cube_frame, base, cap=None, start=DEFAULT_START, method='mean'):
+    """Сума температур на зерні куба (рік × Cluster × Block × Culture × день) з дати start (місяць, день).
+
+    Щоденні mean/min/max локації відновлюються з сум куба (sum / n), рядки впорядковуються
+    за локацією-роком і датою, а накопичення — один grouped_cumsum на всі локації та роки.
+    """
+    keys = aggregation.CUBE_KEYS
+    location_year = ['year', 'Cluster', 'Block', 'Culture']
+    codes = {c: _codes(cube_frame[c]) for c in location_year + ['plot_date']}
+    order = np.lexsort([codes[c] for c in reversed(location_year + ['plot_date'])])
+    frame = cube_frame[keys + ['field_count__sum', 'rows']].iloc[order].reset_index(drop=True)
+    daily = {m: (cube_frame[f"{m}__sum"] / cube_frame[f"{m}__n"].where(cube_frame[f"{m}__n"] > 0))
+             .to_numpy(dtype=float)[order] for m in ['mean', 'min', 'max']}
+
+    month, day = frame['month'].to_numpy(), frame['day'].to_numpy()
+    active = (month > start[0]) | ((month == start[0]) & (day >= start[1]))
+    degrees = daily_degrees(daily['mean'], daily['min'], daily['max'], base, cap, method)
+    degrees = np.where(active, np.nan_to_num(degrees), 0.0)
+    group = np.column_stack([codes[c][order] for c in location_year])
+    group_start = np.r_[True, (group[1:] != group[:-1]).any(axis=1)]
+
+    out = frame[keys].copy()
+    out[GDD_COL] = np.where(active, grouped_cumsum(degrees, group_start), np.nan)
+    out['field_count'] = frame['field_count__sum'] / frame['rows']
+    return out
+
+
+def _codes(series):
+    return series.cat.codes.to_numpy() if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_heat_cube(version, base, cap, start, method):
+    """Куб суми температур для набору параметрів (кешується окремо для кожного набору)."""
+    metrics = tuple(utils.get_metrics_dict().values())
+    frame = heat_frame(aggregation.load_cube(version, metrics).frame, base, cap, start, method)
+    return aggregation.Cube(aggregation.build_cube(frame, [GDD_COL]))
+
+
+def add_to_chart(df_chart, heat_cube, selection):
+    """Додає GDD_custom та Avg_GDD_custom до df_chart для вибору фільтрів."""
+    heat, _ = aggregation.build_chart(heat_cube, selection, [GDD_COL])
+    cols = ['year_str', 'plot_date', GDD_COL, f"Avg_{GDD_COL}"]
+    return df_chart.drop(columns=cols[2:], errors='ignore').merge(heat[cols], on=cols[:2], how='left')
+
+
+def label(base, cap):
+    cap_text = f", стеля {cap:g}°C" if cap is not None else ""
+    return f"Сума t (база {base:g}°C{cap_text})"
@@ -1,112 +1,180 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
+import utils
 from utils import get_metrics_dict
+import analytics
+import frost
+import profiler
+import sql_backend
+import result_cache
 
-def show(df_chart, color_map):
+FROST_TABLE_ROWS = 500      # Полів-років у таблиці заморозків (найсильніші за градусо-годинами)
+
+@st.fragment
+@profiler.profiled("page_analytics")
+def show(df_chart, color_map, selection=None):
     st.markdown("### 📊 Аналітичний модуль")
-    
-    tab_rain, tab_similarity = st.tabs(["🌧️ Аналіз дощових періодів", "🧬 Конструктор схожості років"])
-
-    # Формування періодів (декад)
-    if 'month' in df_chart.columns and 'decade' in df_chart.columns:
-        df_chart['Період'] = df_chart['month'].astype(str).str.zfill(2) + "-" + df_chart['decade'].astype(str)
-        df_chart = df_chart.sort_values(['year_str', 'plot_date'])
-    
+
+    tab_rain, tab_similarity, tab_frost = st.tabs(
+        ["🌧️ Аналіз дощових періодів", "🧬 Конструктор схожості років", "❄️ Заморозки"])
+
     # --- ВКЛАДКА 1: АНАЛІЗ ДОЩОВИХ ПЕРІОДІВ ---
     with tab_rain:
-        if 'precipitation' in df_chart.columns and 'Період' in df_chart.columns:
-            df_chart_risk = df_chart.copy()
-            df_chart_risk['is_rainy_3mm'] = (df_chart_risk['precipitation'] > 3).astype(int)
-            df_chart_risk['is_rainy_any'] = (df_chart_risk['precipitation'] > 0).astype(bool)
-            
-            all_periods = sorted(df_chart_risk['Період'].unique())
-            
-            # Оновлена функція з легендою
-            def create_heatmap(df_pivot, title, colors, z_label):
-                fig = px.imshow(
-                    df_pivot, 
-                    text_auto=".0f", 
-                    aspect="auto", 
-                    color_continuous_scale=colors,
-                    labels=dict(x="Декада", y="Рік", color=z_label)
-                )
-                fig.update_layout(
-                    title=title,
-                    height=400, # Трохи збільшили висоту для кращого вигляду з легендою
-                    margin=dict(t=50, b=10, l=0, r=50), # Додали відступ справа для шкали
-                    coloraxis_showscale=True, # ПОВЕРНУЛИ ЛЕГЕНДУ
-                    xaxis=dict(type='category', tickangle=-45)
-                )
-                return fig
-
-            # 1. Сума опадів
-            rain_sum_agg = df_chart_risk.groupby(['year_str', 'Період'])['precipitation'].sum().reset_index()
-            rain_sum_pivot = rain_sum_agg.pivot(index='year_str', columns='Період', values='precipitation').fillna(0)[all_periods]
-            st.plotly_chart(create_heatmap(rain_sum_pivot, "🌧️ Сума опадів по декадах (мм)", "Blues", "мм"), use_container_width=True)
-            
-            st.divider()
-            
-            # 2. Дні > 3 мм
-            risk_3mm_agg = df_chart_risk.groupby(['year_str', 'Період'])['is_rainy_3mm'].sum().reset_index()
-            risk_3mm_pivot = risk_3mm_agg.pivot(index='year_str', columns='Період', values='is_rainy_3mm').fillna(0)[all_periods]
-            st.plotly_chart(create_heatmap(risk_3mm_pivot, "🚜 Дні з опадами понад 3 мм", "RdYlGn_r", "днів"), use_container_width=True)
-            
-            st.divider()
-            
-            # 3. Дощові дні всього
-            total_rain_agg = df_chart_risk.groupby(['year_str', 'Період'])['is_rainy_any'].sum().reset_index()
-            total_rain_pivot = total_rain_agg.pivot(index='year_str', columns='Період', values='is_rainy_any').fillna(0)[all_periods]
-            st.plotly_chart(create_heatmap(total_rain_pivot, "☔ Загальна кількість дощових днів (>0)", "PuBu", "днів"), use_container_width=True)
-            
-            st.divider()
-            
-            # 4. Дні підряд
-            def get_max_streak(s):
-                return int(s.groupby((~s).cumsum()).sum().max()) if s.any() else 0
-            streak_agg = df_chart_risk.groupby(['year_str', 'Період'])['is_rainy_any'].apply(get_max_streak).reset_index(name='streak')
-            streak_pivot = streak_agg.pivot(index='year_str', columns='Період', values='streak').fillna(0)[all_periods]
-            st.plotly_chart(create_heatmap(streak_pivot, "⛈️ Затяжні дощі (Макс. днів підряд)", "Oranges", "днів"), use_container_width=True)
+        if {'precipitation', 'month', 'decade'} <= set(df_chart.columns):
+            c1, c2 = st.columns(2)
+            with c1:
+                heavy_mm = st.number_input("Поріг сильного дощу, мм", 0.0, 50.0, analytics.RAIN_HEAVY_MM, 0.5)
+            with c2:
+                any_mm = st.number_input("Поріг дощового дня, мм", 0.0, 10.0, analytics.RAIN_ANY_MM, 0.1)
+
+            # Усі чотири матриці рік × декада за один прохід (кешується за вибором і порогами);
+            # з SQL-бекендом — одним запитом над партиціями замість df_chart
+            rain = _disk_cached(('rain', heavy_mm, any_mm), selection, lambda: sql_backend.run(
+                lambda: sql_backend.rain_matrices(utils.get_data_version(), selection or {}, heavy_mm, any_mm),
+                lambda: analytics.rain_matrices(df_chart, heavy_mm, any_mm)))
+
+            # 1. Сума опадів, 2. дні > порогу сильного дощу, 3. дощові дні всього, 4. дні підряд
+            for i, fig in enumerate(rain_figures(rain, heavy_mm, any_mm)):
+                if i:
+                    st.divider()
+                st.plotly_chart(fig, use_container_width=True)
 
         else:
             st.warning("Дані для аналізу опадів відсутні.")
 
-    # --- ВКЛАДКА 2: КОНСТРУКТОР СХОЖОСТІ (БЕЗ ЗМІН) ---
+    # --- ВКЛАДКА 2: КОНСТРУКТОР СХОЖОСТІ ---
     with tab_similarity:
         st.subheader("🧬 Пошук кліматично подібних років")
         m_dict = get_metrics_dict()
-        inv_m_dict = {v: k for k, v in m_dict.items()}
 
-        c1, c2 = st.columns([2, 1])
+        c1, c2, c3 = st.columns([2, 1, 1])
         with c1:
             selected_labels = st.multiselect("1. Показники:", options=list(m_dict.keys()), default=["GDD (Ефективні Т > 10)", "Накопичені опади"])
             sim_params_keys = [m_dict[label] for label in selected_labels]
         with c2:
             years_list = sorted(df_chart['year_str'].dropna().unique(), reverse=True)
             ref_year = st.selectbox("2. Еталон:", years_list, index=years_list.index('2025') if '2025' in years_list else 0)
+        with c3:
+            method_label = st.selectbox("3. Метод:", list(analytics.SIMILARITY_METHODS.keys()))
+            method = analytics.SIMILARITY_METHODS[method_label]
+            window = st.slider("Вікно DTW, ± днів", 1, 30, analytics.DTW_WINDOW) if method == 'dtw' else analytics.DTW_WINDOW
 
         if selected_labels and not df_chart.empty:
-            df_years = df_chart.groupby('year_str')[sim_params_keys].max()
-            if ref_year in df_years.index:
-                ref_vals = df_years.loc[ref_year]
-                def calc_sim(row):
-                    diffs = []
-                    for col in sim_params_keys:
-                        val, target = row[col], ref_vals[col]
-                        if pd.isna(val) or pd.isna(target): continue
-                        d = abs(val - target) / abs(target) if target != 0 else (0 if val == 0 else 1)
-                        diffs.append(min(d, 1))
-                    return (1 - np.mean(diffs)) * 100 if diffs else 0
-
-                df_years['Схожість %'] = df_years.apply(calc_sim, axis=1)
-                df_disp = df_years.rename(columns=inv_m_dict).reset_index().sort_values('Схожість %', ascending=False)
-                
+            # Повна матриця рік × рік за один розрахунок (кешується за вибором і методом)
+            sim = _disk_cached(('similarity', tuple(sim_params_keys), method, window), selection,
+                               lambda: analytics.similarity_matrix(df_chart, tuple(sim_params_keys), method, window))
+            if ref_year in sim.columns:
+                df_disp = similarity_table(df_chart, sim, sim_params_keys, ref_year)
+
                 col_t, col_c = st.columns([1, 1])
                 with col_t:
                     st.dataframe(df_disp.style.background_gradient(subset=['Схожість %'], cmap="Greens").format({"Схожість %": "{:.2f}%"} | {l: "{:.1f}" for l in selected_labels}), use_container_width=True, height=450)
                 with col_c:
-                    fig_sim = px.bar(df_disp, x='year_str', y='Схожість %', color='Схожість %', color_continuous_scale='Greens')
-                    fig_sim.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                    fig_sim.update_layout(yaxis=dict(range=[0, 115]), xaxis=dict(type='category'), height=450)
-                    st.plotly_chart(fig_sim, use_container_width=True)
\ No newline at end of file
+                    st.plotly_chart(similarity_bar(df_disp), use_container_width=True)
+
+                # Кластеризована матриця схожості всіх років
+                st.plotly_chart(similarity_matrix_figure(sim, method_label), use_container_width=True)
+
+    # --- ВКЛАДКА 3: ЗАМОРОЗКИ ПО ПОЛЯХ ---
+    with tab_frost:
+        st.subheader("❄️ Заморозки по полях")
+        threshold = st.number_input("Поріг заморозку (мін. t), °C", -10.0, 5.0, frost.DEFAULT_THRESHOLD, 0.5,
+                                    key="frost_threshold")
+        # Події рахуються для всіх полів один раз на поріг; вибір сайдбару — лише фільтр рядків
+        events = frost.filter_events(frost.frost_events(utils.get_field_daily_version(), threshold), selection)
+        if events.empty:
+            st.warning("Немає даних для вибраних фільтрів.")
+        else:
+            unit = frost.load_frost_source(utils.get_field_daily_version()).unit
+            if unit != 'поле':
+                st.info(f"Немає {utils.FIELD_DAILY_FILE} — події рахуються по локаціях (кластер · блок · культура), "
+                        "а не по окремих полях. Файл створює precompute_summary.py.")
+            st.caption(f"Подія — серія днів поспіль з мін. t ≤ {threshold:g}°C; весна — до 1 липня, осінь — з 1 липня. "
+                       "Градусо-години — оцінка за трикутним добовим ходом між min і max.")
+            st.dataframe(frost.yearly_summary(events), use_container_width=True)
+            st.plotly_chart(frost_dates_figure(events), use_container_width=True)
+            with st.expander(f"По полях-роках ({len(events):,})"):
+                worst = events.sort_values('Градусо-години нижче порогу', ascending=False).head(FROST_TABLE_ROWS)
+                st.dataframe(worst, hide_index=True, use_container_width=True,
+                             column_config={c: st.column_config.DateColumn(c, format="DD.MM.YYYY")
+                                            for c in ['Останній весняний мороз', 'Перший осінній мороз']})
+
+def _disk_cached(key, selection, compute):
+    """Результат з кешу на диску (спільного для реплік) за вибором сайдбару; без вибору — compute()."""
+    if selection is None:
+        return compute()
+    return result_cache.get_result_cache().get_or_compute(key + result_cache.dataset_key(selection), compute)
+
+# 2. ПОБУДОВА ТАБЛИЦЬ І ГРАФІКІВ (БЕЗ ВІДЖЕТІВ — ТАКОЖ ДЛЯ batch_reports.py)
+def heatmap_figure(df_pivot, title, colors, z_label):
+    """Теплова карта рік × декада з легендою."""
+    fig = px.imshow(
+        df_pivot,
+        text_auto=".0f",
+        aspect="auto",
+        color_continuous_scale=colors,
+        labels=dict(x="Декада", y="Рік", color=z_label)
+    )
+    fig.update_layout(
+        title=title,
+        height=400, # Трохи збільшили висоту для кращого вигляду з легендою
+        margin=dict(t=50, b=10, l=0, r=50), # Додали відступ справа для шкали
+        coloraxis_showscale=True, # ПОВЕРНУЛИ ЛЕГЕНДУ
+        xaxis=dict(type='category', tickangle=-45)
+    )
+    return fig
+
+
+def rain_figures(rain, heavy_mm=analytics.RAIN_HEAVY_MM, any_mm=analytics.RAIN_ANY_MM):
+    """Чотири теплові карти з результату analytics.rain_matrices."""
+    return [
+        heatmap_figure(rain['sum'], "🌧️ Сума опадів по декадах (мм)", "Blues", "мм"),
+        heatmap_figure(rain['heavy'], f"🚜 Дні з опадами понад {heavy_mm:g} мм", "RdYlGn_r", "днів"),
+        heatmap_figure(rain['rainy'], f"☔ Загальна кількість дощових днів (>{any_mm:g})", "PuBu", "днів"),
+        heatmap_figure(rain['streak'], "⛈️ Затяжні дощі (Макс. днів підряд)", "Oranges", "днів"),
+    ]
+
+
+def similarity_table(df_chart, sim, metrics, ref_year):
+    """Максимуми показників по роках і схожість з еталоном, від найсхожішого року."""
+    inv_m_dict = {v: k for k, v in get_metrics_dict().items()}
+    df_years = df_chart.groupby('year_str', observed=True)[list(metrics)].max()
+    df_years['Схожість %'] = sim[ref_year]
+    return df_years.rename(columns=inv_m_dict).reset_index().sort_values('Схожість %', ascending=False)
+
+
+def similarity_bar(df_disp):
+    fig_sim = px.bar(df_disp, x='year_str', y='Схожість %', color='Схожість %', color_continuous_scale='Greens')
+    fig_sim.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
+    fig_sim.update_layout(yaxis=dict(range=[0, 115]), xaxis=dict(type='category'), height=450)
+    return fig_sim
+
+
+def similarity_matrix_figure(sim, method_label):
+    """Матриця схожості всіх років, упорядкована кластеризацією (analytics.cluster_order)."""
+    order = [sim.index[i] for i in analytics.cluster_order(sim.to_numpy())]
+    fig_matrix = px.imshow(
+        sim.loc[order, order], text_auto=".0f", aspect="auto", color_continuous_scale="Greens",
+        labels=dict(x="Еталон", y="Рік", color="%")
+    )
+    fig_matrix.update_layout(
+        title=f"🧩 Матриця схожості років ({method_label})", height=450,
+        xaxis=dict(type='category'), yaxis=dict(type='category')
+    )
+    return fig_matrix
+
+
+def frost_dates_figure(events):
+    """Розподіл по полях дат останнього весняного та першого осіннього морозу по роках."""
+    dates = events.melt(id_vars='Рік', value_vars=['Останній весняний мороз', 'Перший осінній мороз'],
+                        var_name='Межа сезону', value_name='Дата').dropna(subset=['Дата'])
+    # Дати різних років — на одну вісь (як plot_date у графіках)
+    dates['Дата'] = utils.to_plot_date(dates['Дата'])
+    dates['Рік'] = dates['Рік'].astype(str)
+    fig = px.box(dates, x='Рік', y='Дата', color='Межа сезону', points=False,
+                 color_discrete_sequence=['#4C9BE8', '#1F3A93'],
+                 title="📅 Межі морозного сезону по полях")
+    fig.update_yaxes(tickformat="%d-%b", title=None)
+    fig.update_layout(height=450, xaxis=dict(type='category'), legend=dict(title_text=""))
+    return fig
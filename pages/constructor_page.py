@@ -1,9 +1,12 @@
 import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from utils import get_metrics_dict
+from utils import get_metrics_dict, get_render_settings, downsample, downsample_method, WEBGL_THRESHOLD
 import numpy as np
+import profiler
 
+@st.fragment
+@profiler.profiled("page_constructor")
 def show(df_chart, color_map, etalon='2025'):
     st.subheader("🛠️ Конструктор порівнянь")
     
@@ -58,16 +61,23 @@ def show(df_chart, color_map, etalon='2025'):
 
     # --- 4. ПОБУДОВА ГРАФІКА ---
     fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Роки розкладаємо одним проходом groupby замість фільтра по кожному року
+    by_year = dict(tuple(df_sel.groupby('year_str', sort=False, observed=True)))
+    fast_render, point_budget = get_render_settings()
+    Line = go.Scattergl if fast_render and 2 * len(df_sel) > WEBGL_THRESHOLD else go.Scatter
     
     for y in sel_years:
-        df_y = df_chart[df_chart['year_str'] == y]
-        if df_y.empty: continue
+        df_y = by_year.get(y)
+        if df_y is None: continue
+        df_l1 = downsample(df_y, 'plot_date', m1_col, point_budget, downsample_method(m1_col)) if fast_render else df_y
+        df_l2 = downsample(df_y, 'plot_date', m2_col, point_budget, downsample_method(m2_col)) if fast_render else df_y
         
         # ЛІВА ВІСЬ
-        fig.add_trace(go.Scatter(
-            x=df_y['plot_date'], y=df_y[m1_col], name=f"{y} {m1_lab}",
+        fig.add_trace(Line(
+            x=df_l1['plot_date'], y=df_l1[m1_col], name=f"{y} {m1_lab}",
             line=dict(color=color_map.get(y, '#1f77b4'), width=3.5 if y == etalon else 2),
-            customdata=df_y['hover_date'], hovertemplate="%{y:.1f}"
+            customdata=df_l1['hover_date'], hovertemplate="%{y:.1f}"
         ), secondary_y=False)
         
         # ПРАВА ВІСЬ
@@ -78,10 +88,10 @@ def show(df_chart, color_map, etalon='2025'):
                 customdata=df_y['hover_date'], hovertemplate="%{y:.1f}"
             ), secondary_y=True)
         else:
-            fig.add_trace(go.Scatter(
-                x=df_y['plot_date'], y=df_y[m2_col], name=f"{y} {m2_lab}",
+            fig.add_trace(Line(
+                x=df_l2['plot_date'], y=df_l2[m2_col], name=f"{y} {m2_lab}",
                 line=dict(color=color_map.get(y, '#ff7f0e'), dash='dash', width=2),
-                customdata=df_y['hover_date'], hovertemplate="%{y:.1f}"
+                customdata=df_l2['hover_date'], hovertemplate="%{y:.1f}"
             ), secondary_y=True)
 
     # --- 5. ДИЗАЙН ---
@@ -1,29 +1,67 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import apply_style, get_metrics_dict
+from utils import (apply_style, add_band, get_metrics_dict, get_render_settings, get_band_setting, line_figure,
+                   downsample_method, POINT_BUDGET)
+import climatology
+import profiler
 
-def show(df_chart, color_map):
+@st.fragment
+@profiler.profiled("page_precip")
+def show(df_chart, color_map, climate=None):
     st.subheader("💧 Вологозабезпечення")
 
-    m_dict = get_metrics_dict()
-    acc_col = m_dict.get('Накопичені опади', 'Sum_Precipitation')
-    daily_col = m_dict.get('Щоденні опади', 'precipitation')
-    avg_acc_col = f"Avg_{acc_col}"
-
     # 1. СОРТУВАННЯ ДАНИХ
     df_chart = df_chart.sort_values(['year_str', 'plot_date'])
-    years_ordered = sorted(df_chart['year_str'].unique())
 
     # --- ГРАФІК 1: НАКОПИЧЕНІ ОПАДИ ---
-    fig_acc = px.line(
-        df_chart, x='plot_date', y=acc_col, color='year_str',
-        color_discrete_map=color_map,
-        category_orders={"year_str": years_ordered}, 
-        title="Накопичена сума опадів (мм)",
-        labels={acc_col: 'Опади, мм', 'plot_date': 'Дата', 'year_str': 'Рік'}
+    fast_render, point_budget = get_render_settings()
+    fig_acc = accumulation_figure(df_chart, color_map, fast_render, point_budget, climate, get_band_setting())
+    st.plotly_chart(fig_acc, use_container_width=True)
+    anomaly = climatology.anomaly_text(df_chart, climate, get_metrics_dict().get('Накопичені опади', 'Sum_Precipitation'),
+                                       "{:.0f} мм")
+    if anomaly:
+        st.caption(f"📈 {anomaly}")
+
+    st.divider()
+
+    # --- ГРАФІК 2: ІНТЕНСИВНІСТЬ ОПАДІВ ---
+    st.subheader("🌧️ Інтенсивність щоденних опадів")
+
+    # ПОВЕРНУТО ДЕФОЛТНИЙ ПЕРІОД (9, 9)
+    month_range = st.slider(
+        "Оберіть діапазон місяців для аналізу інтенсивності:",
+        1, 12, (9, 9),
+        help="Перетягніть повзунки, щоб змінити період на графіку нижче"
     )
 
+    fig_daily = daily_figure(df_chart, color_map, month_range)
+    if fig_daily is not None:
+        st.plotly_chart(fig_daily, use_container_width=True)
+    else:
+        st.warning("Немає даних за вибраний період місяців.")
+
+# 2. ПОБУДОВА ГРАФІКІВ (БЕЗ ВІДЖЕТІВ — ТАКОЖ ДЛЯ batch_reports.py)
+def accumulation_figure(df_chart, color_map, fast_render=False, point_budget=POINT_BUDGET,
+                        climate=None, band_kind="P10–P90"):
+    """Накопичена сума опадів з лінією середнього та коридором норми. df_chart відсортований за роком і датою."""
+    acc_col = get_metrics_dict().get('Накопичені опади', 'Sum_Precipitation')
+    avg_acc_col = f"Avg_{acc_col}"
+    years_ordered = sorted(df_chart['year_str'].unique())
+
+    if fast_render:
+        fig_acc = line_figure(df_chart, 'plot_date', acc_col, color_map, years_ordered, point_budget,
+                              downsample_method(acc_col), title="Накопичена сума опадів (мм)", y_title='Опади, мм')
+        fig_acc.update_xaxes(title='Дата')
+    else:
+        fig_acc = px.line(
+            df_chart, x='plot_date', y=acc_col, color='year_str',
+            color_discrete_map=color_map,
+            category_orders={"year_str": years_ordered},
+            title="Накопичена сума опадів (мм)",
+            labels={acc_col: 'Опади, мм', 'plot_date': 'Дата', 'year_str': 'Рік'}
+        )
+
     if avg_acc_col in df_chart.columns:
         first_year = df_chart['year_str'].unique()[0]
         df_avg_line = df_chart[df_chart['year_str'] == first_year]
@@ -34,36 +72,28 @@ def show(df_chart, color_map):
             hovertemplate="Середнє: %{y:.1f} мм"
         ))
 
-    fig_acc = apply_style(fig_acc)
+    fig_acc = add_band(apply_style(fig_acc), climatology.band(climate, acc_col, df_chart), band_kind)
     fig_acc.update_xaxes(tickformat="%d-%b")
-    st.plotly_chart(fig_acc, use_container_width=True)
+    return fig_acc
 
-    st.divider()
 
-    # --- ГРАФІК 2: ІНТЕНСИВНІСТЬ ОПАДІВ ---
-    st.subheader("🌧️ Інтенсивність щоденних опадів")
-    
-    # ПОВЕРНУТО ДЕФОЛТНИЙ ПЕРІОД (9, 9)
-    month_range = st.slider(
-        "Оберіть діапазон місяців для аналізу інтенсивності:", 
-        1, 12, (9, 9), 
-        help="Перетягніть повзунки, щоб змінити період на графіку нижче"
-    )
-    
+def daily_figure(df_chart, color_map, month_range=(9, 9)):
+    """Стовпчики щоденних опадів за діапазон місяців; None, якщо даних за період немає."""
+    daily_col = get_metrics_dict().get('Щоденні опади', 'precipitation')
+    years_ordered = sorted(df_chart['year_str'].unique())
     df_daily = df_chart[df_chart['month'].between(month_range[0], month_range[1])]
-    
-    if not df_daily.empty:
-        fig_daily = px.bar(
-            df_daily, x='plot_date', y=daily_col, color='year_str',
-            color_discrete_map=color_map,
-            category_orders={"year_str": years_ordered},
-            barmode='group',
-            title=f"Щоденні опади (Місяці: {month_range[0]} - {month_range[1]})",
-            labels={daily_col: 'мм', 'plot_date': 'Дата', 'year_str': 'Рік'}
-        )
-        
-        fig_daily = apply_style(fig_daily)
-        fig_daily.update_xaxes(tickformat="%d-%b")
-        st.plotly_chart(fig_daily, use_container_width=True)
-    else:
-        st.warning("Немає даних за вибраний період місяців.")
\ No newline at end of file
+    if df_daily.empty:
+        return None
+
+    fig_daily = px.bar(
+        df_daily, x='plot_date', y=daily_col, color='year_str',
+        color_discrete_map=color_map,
+        category_orders={"year_str": years_ordered},
+        barmode='group',
+        title=f"Щоденні опади (Місяці: {month_range[0]} - {month_range[1]})",
+        labels={daily_col: 'мм', 'plot_date': 'Дата', 'year_str': 'Рік'}
+    )
+
+    fig_daily = apply_style(fig_daily)
+    fig_daily.update_xaxes(tickformat="%d-%b")
+    return fig_daily
@@ -1,7 +1,17 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 import utils
-
+import filters
+import profiler
+import aggregation
+import field_store
+import result_cache
+import sql_backend
+
+@st.fragment
+@profiler.profiled("page_tables")
 def show(df_chart, sel_years, sel_cluster, sel_block, sel_culture):
     st.subheader("📋 Таблиці даних")
 
@@ -9,6 +19,7 @@ def show(df_chart, sel_years, sel_cluster, sel_block, sel_culture):
         st.info("Немає даних для формування таблиць.")
         return
 
+    sel_key = filters.selection_key(sel_years, sel_cluster, sel_block, sel_culture)
     valid_metrics = list(utils.get_metrics_dict().values())
     avg_cols = [f"Avg_{m}" for m in valid_metrics if f"Avg_{m}" in df_chart.columns]
 
@@ -27,75 +38,209 @@ def show(df_chart, sel_years, sel_cluster, sel_block, sel_culture):
     rename_dict = {f"Avg_{m}": f"Сер. {m}" for m in valid_metrics}
     df_show = df_show.rename(columns={'year_str': 'Рік', 'hover_date': 'Дата'} | rename_dict)
 
+    # Формат чисел задається на боці клієнта — без Styler, що рендерить кожну клітинку на сервері
     st.dataframe(
-        df_show.style.format(
-            "{:.1f}",
-            subset=[c for c in df_show.columns if c not in ['Рік', 'Дата', 'Кластер', 'Блок', 'Культура']]
-        ),
+        df_show,
+        column_config=_number_config(df_show, exclude=['Рік', 'Дата', 'Кластер', 'Блок', 'Культура']),
         use_container_width=True
     )
-    st.download_button(
-        "📥 Скачати агреговані дані (CSV)",
-        df_show.to_csv(index=False).encode('utf-8'),
-        "agro_report_agg.csv", "text/csv"
-    )
+    _export_controls(lambda: df_show, "агреговані дані", "agro_report_agg", ('agg',) + sel_key, 'utf-8')
 
     st.divider()
 
     # ── 2. ЗВЕДЕНІ ДАНІ ПО ПОЛЯХ ─────────────────────────────────────────────
     st.markdown("#### 2. Зведені дані по полях (Поле + Рік)")
+    selection = filters.as_summary_selection(sel_years, sel_cluster, sel_block, sel_culture)
+    _summary_section(selection, sel_key)
 
-    # Миттєво завантажуємо вже готовий легкий файл
-    df_summary = utils.load_field_summary()
+    st.divider()
 
-    if df_summary.empty:
-        return
-
-    # ── ФІЛЬТРАЦІЯ ──
-    # У підготовленому файлі ми перейменували 'year' на 'Рік'
-    if 'Рік' in df_summary.columns and sel_years:
-        # Безпечне порівняння, незалежно від того чи це числа, чи рядки
-        df_summary = df_summary[df_summary['Рік'].astype(str).isin([str(y) for y in sel_years])]
-        
-    if "Всі" not in sel_cluster and sel_cluster and 'Cluster' in df_summary.columns:
-        df_summary = df_summary[df_summary['Cluster'].isin(sel_cluster)]
-        
-    if "Всі" not in sel_block and sel_block and 'Block' in df_summary.columns:
-        df_summary = df_summary[df_summary['Block'].isin(sel_block)]
-        
-    if "Всі" not in sel_culture and sel_culture and 'Culture' in df_summary.columns:
-        df_summary = df_summary[df_summary['Culture'].isin(sel_culture)]
-
-    if df_summary.empty:
-        st.warning("За обраними фільтрами нічого не знайдено.")
-    else:
-        _render_summary(df_summary)
+    # ── 3. ПОЛЕ ДЕТАЛЬНО ─────────────────────────────────────────────────────
+    st.markdown("#### 3. Поле детально (щоденні дані)")
+    _field_section(selection)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # ВНУТРІШНІ ФУНКЦІЇ
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _render_summary(df_summary):
-    """Відображає готову зведену таблицю та кнопку завантаження."""
-    frost_cols   = [c for c in df_summary.columns if 'мороз' in c.lower()]
-    priority     = ['Поле', 'Cluster', 'Block', 'Culture', 'Рік']
-    
-    exist_pri    = [c for c in priority if c in df_summary.columns]
-    other        = [c for c in df_summary.columns if c not in exist_pri and c not in frost_cols]
-    final_order  = exist_pri + other + frost_cols
-
-    # Вибудовуємо правильний порядок колонок
-    df_display = df_summary[[c for c in final_order if c in df_summary.columns]]
-
-    st.success(f"Знайдено {len(df_display)} записів по полях.")
-    st.dataframe(df_display, use_container_width=True, height=500)
-
-    # Кнопка завантаження
-    csv = df_display.to_csv(index=False).encode('utf-8-sig')
-    st.download_button(
-        "📥 Скачати зведені дані по полях (CSV)",
-        csv,
-        "fields_summary.csv",
-        "text/csv"
+def _summary_section(selection, sel_key):
+    """Таблиця зведення по полях: запити SQL-бекенду або вибірка індексом у пам'яті."""
+    version = utils.get_summary_version()
+    # SQL-бекенд: фільтр, пошук, сортування й сторінка — запитами до файлу, у пам'яті лише сторінка
+    source = sql_backend.run(lambda: sql_backend.SummaryQuery(version, selection), lambda: None) \
+        if version is not None else None
+    if source is None:
+        # Миттєво завантажуємо вже готовий легкий файл (спільний для всіх сесій)
+        df_summary = utils.load_field_summary(version)
+        if df_summary.empty:
+            return
+        # ── ФІЛЬТРАЦІЯ ──
+        # Перетин списків рядків індексу замість повних масок по кожному фільтру
+        index = filters.build_summary_index(df_summary, version)
+        source = _FrameSummary(df_summary, index.lookup(selection))
+
+    if source.total == 0:
+        st.warning("За обраними фільтрами нічого не знайдено.")
+    else:
+        _render_summary(source, sel_key)
+
+
+def _field_section(selection):
+    """Щоденні ряди одного поля (сховище field_store, mmap) поруч із середнім по його кластеру."""
+    store = field_store.load_field_store(utils.get_field_store_version())
+    if store is None:
+        st.info(f"Немає {utils.FIELD_STORE_FILE}: побудуйте його precompute_summary.py або "
+                f"`python field_store.py {utils.FIELD_DAILY_FILE}`.")
+        return
+    fields = store.fields(selection)
+    if not fields:
+        st.warning("За обраними фільтрами полів немає.")
+        return
+
+    labels = {label: col for label, col in utils.get_metrics_dict().items() if col in store.metrics}
+    col_field, col_metric = st.columns([2, 1])
+    field = col_field.selectbox(f"Поле (з {len(fields)}):", fields, key="drill_field")
+    label = col_metric.selectbox("Показник:", list(labels), key="drill_metric")
+
+    series = store.series(field)
+    series = series[series['Рік'].isin(selection['Рік'])]
+    clusters = sorted(series['Cluster'].unique().tolist())
+    cluster_chart = _cluster_chart(sorted(series['Рік'].unique().tolist()), clusters)
+
+    st.plotly_chart(field_figure(series, cluster_chart, labels[label], label), use_container_width=True)
+    years = series.drop_duplicates('Рік').sort_values('Рік', ascending=False)
+    st.caption(" · ".join(f"{r['Рік']}: {r['Cluster']} / {r['Block']} / {r['Culture']}" for _, r in years.iterrows()))
+
+
+def _cluster_chart(years, clusters):
+    """Середнє по кластеру за роки поля — той самий розрахунок і ключ кешу на диску, що й основний графік."""
+    metrics = list(utils.get_metrics_dict().values())
+    selection = {'year': [int(y) for y in years], 'Cluster': clusters}
+    compute = lambda: sql_backend.run(
+        lambda: sql_backend.build_chart(selection, metrics),
+        lambda: aggregation.build_chart(aggregation.selection_cube(utils.get_data_version(), selection, tuple(metrics)),
+                                        selection, metrics)
+    )
+    df_chart, _ = result_cache.get_result_cache().get_or_compute(
+        ('chart', tuple(metrics)) + result_cache.dataset_key(selection), compute)
+    return df_chart
+
+
+def field_figure(series, cluster_chart, metric, label):
+    """Лінії поля по роках (суцільні) та середнє по кластеру за ті самі роки (пунктир того ж кольору)."""
+    color_map = utils.get_colors(series)
+    fig = go.Figure()
+    for year, g in series.groupby('year_str', sort=True):
+        fig.add_trace(go.Scatter(x=g['plot_date'], y=g[metric], name=year, mode='lines', legendgroup=year,
+                                 line=dict(color=color_map[year])))
+        avg = cluster_chart[cluster_chart['year_str'].astype(str) == year]
+        if not avg.empty:
+            fig.add_trace(go.Scatter(x=avg['plot_date'], y=avg[metric], name=f"{year} (кластер)", mode='lines',
+                                     legendgroup=year, line=dict(color=color_map[year], dash='dash'), opacity=0.6))
+    fig.update_traces(hovertemplate='<b>%{x|%d-%b}</b><br>' + label + ': %{y:.1f}')
+    fig.update_xaxes(tickformat="%d-%b", title=None)
+    fig.update_yaxes(title=label)
+    return utils.apply_style(fig)
+
+
+class _FrameSummary:
+    """Зведення в пам'яті: рядки вибору — номери з FilterIndex, пошук і сортування — над ними.
+
+    Інтерфейс спільний із sql_backend.SummaryQuery: columns, total, count(query), page(...).
+    """
+
+    def __init__(self, df_summary, ids):
+        self.df = df_summary
+        self.ids = ids
+        self.columns = list(df_summary.columns)
+        self.total = len(ids)
+
+    def _rows(self, query, sort_col=None, descending=False):
+        ids = self.ids
+        if query:
+            ids = ids[_match_fields(self.df['Поле'], ids, query)]
+        if sort_col is not None:
+            ids = ids[_sort_order(self.df[sort_col].iloc[ids], descending)]
+        return ids
+
+    def count(self, query):
+        return len(self._rows(query))
+
+    def page(self, query, sort_col=None, descending=False, start=0, stop=None):
+        return self.df.iloc[self._rows(query, sort_col, descending)[start:stop]]
+
+
+def _render_summary(source, sel_key):
+    """Пошук, сортування та пагінація на сервері: у браузер іде лише видима сторінка."""
+    col_search, col_sort, col_dir, col_size = st.columns([3, 3, 1, 1], vertical_alignment="bottom")
+    query = col_search.text_input("🔎 Пошук поля:", key="summary_search").strip()
+    sort_col = col_sort.selectbox("Сортувати за:", ["—"] + source.columns, key="summary_sort")
+    descending = col_dir.toggle("Спадання", key="summary_desc")
+    page_size = col_size.selectbox("Рядків:", utils.SUMMARY_PAGE_SIZES, key="summary_page_size")
+    sort_col = None if sort_col == "—" else sort_col
+
+    n_rows = source.count(query)
+    if n_rows == 0:
+        st.warning(f"Полів, що містять «{query}», не знайдено.")
+        return
+
+    n_pages = -(-n_rows // page_size)
+    if st.session_state.get("summary_page", 1) > n_pages:
+        st.session_state.summary_page = n_pages
+    page = st.number_input(f"Сторінка (з {n_pages}):", min_value=1, max_value=n_pages, step=1, key="summary_page")
+    start = (page - 1) * page_size
+
+    st.success(f"Знайдено {n_rows} записів по полях.")
+    st.dataframe(source.page(query, sort_col, descending, start, start + page_size),
+                 use_container_width=True, hide_index=True)
+    st.caption(f"Рядки {start + 1}–{min(start + page_size, n_rows)} з {n_rows}")
+
+    # Експорт — уся відфільтрована та відсортована вибірка, а не лише сторінка
+    _export_controls(lambda: source.page(query, sort_col, descending), "зведені дані по полях", "fields_summary",
+                     ('fields', utils.get_summary_version()) + sel_key + (query, sort_col, descending), 'utf-8-sig')
+
+
+def _match_fields(fields, ids, query):
+    """Маска рядків ids, у яких назва поля містить query (без урахування регістру).
+
+    Рядок шукається лише серед унікальних назв (категорій), далі — вибірка за кодами.
+    """
+    hit = fields.cat.categories.astype(str).str.contains(query, case=False, regex=False)
+    # Код -1 (порожнє поле) потрапляє на додатковий False у кінці
+    return np.append(hit, False)[fields.cat.codes.to_numpy()[ids]]
+
+
+def _sort_order(values, descending):
+    """Позиції для стабільного сортування; порожні значення — в кінці."""
+    if 'мороз' in values.name.lower():
+        values = pd.to_datetime(values, format='%d.%m.%Y', errors='coerce')
+    ordered = values.reset_index(drop=True).sort_values(ascending=not descending, kind='stable', na_position='last')
+    return ordered.index.to_numpy()
+
+
+def _number_config(df, exclude):
+    """Формат '%.1f' для числових колонок (крім exclude)."""
+    return {
+        c: st.column_config.NumberColumn(format="%.1f")
+        for c in df.select_dtypes('number').columns if c not in exclude
+    }
+
+
+def _export_controls(make_df, label, file_stem, key, encoding):
+    """Вибір формату та кнопка завантаження.
+
+    Файл (і сама таблиця make_df()) формується лише після натискання кнопки і
+    кешується на диску за ключем вибору, тож повторне завантаження не перераховує експорт.
+    """
+    col_fmt, col_btn = st.columns([1, 3], vertical_alignment="bottom")
+    fmt = col_fmt.selectbox("Формат", utils.export_formats(), key=f"export_fmt_{file_stem}")
+    ext, mime = utils.EXPORT_FORMATS[fmt]
+    col_btn.download_button(
+        f"📥 Скачати {label} ({fmt})",
+        data=lambda: utils.export_file(make_df(), key, fmt, encoding),
+        file_name=f"{file_stem}.{ext}",
+        mime=mime,
+        on_click="ignore",
+        key=f"export_btn_{file_stem}",
     )
@@ -1,40 +1,120 @@
+import datetime
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import apply_style, get_metrics_dict
+import utils
+from utils import (apply_style, add_band, get_metrics_dict, get_render_settings, get_band_setting, line_figure,
+                   downsample_method, POINT_BUDGET)
+import climatology
+import frost
+import gdd
+import profiler
 
-def show(df_chart, color_map):
+CUSTOM_SUM = "⚙️ Власна сума (база, стеля, старт)"
+
+@st.fragment
+@profiler.profiled("page_temp")
+def show(df_chart, color_map, climate=None, selection=None):
     st.subheader("🌡️ Аналіз температур вегетації")
-    
+
     # 1. ПРАВИЛЬНА ТЕРМІНОЛОГІЯ
-    m_dict = get_metrics_dict()
     m_name = st.radio(
-        "Оберіть показник для аналізу:", 
-        ["GDD (Ефективні Т > 10)", "Сума Т (якщо Т > 0)", "Сума Т (якщо Т > 10)"], 
+        "Оберіть показник для аналізу:",
+        ["GDD (Ефективні Т > 10)", "Сума Т (якщо Т > 0)", "Сума Т (якщо Т > 10)", CUSTOM_SUM],
         horizontal=True
     )
-    
+
     # Сортування легенди
     df_chart = df_chart.sort_values(['year_str', 'plot_date'])
-    years_ordered = sorted(df_chart['year_str'].unique())
-    
-    # Фільтр для накопичення (з 14/05)
-    df_acc = df_chart[(df_chart['month'] > 5) | ((df_chart['month'] == 5) & (df_chart['day'] >= 14))].copy()
+    fast_render, point_budget = get_render_settings()
+    band_kind = get_band_setting()
 
     # --- ГРАФІК 1: НАКОПИЧЕННЯ (GDD або Суми) ---
-    fig_acc = px.line(
-        df_acc, 
-        x='plot_date', 
-        y=m_dict[m_name], 
-        color='year_str', 
-        color_discrete_map=color_map,
-        category_orders={"year_str": years_ordered},
-        custom_data=['hover_date'],
-        title=f"Накопичення: {m_name} (з 14/05)"
+    if m_name == CUSTOM_SUM:
+        # Сума з довільними базою, стелею і стартом — рахується з щоденних t, кешується за параметрами
+        base, cap, start, method = _heat_controls()
+        heat_cube = gdd.load_heat_cube(utils.get_data_version(), base, cap, start, method)
+        df_chart = gdd.add_to_chart(df_chart, heat_cube, selection or {}).sort_values(['year_str', 'plot_date'])
+        m_name, metric_col = gdd.label(base, cap), gdd.GDD_COL
+    else:
+        metric_col, start = get_metrics_dict()[m_name], gdd.DEFAULT_START
+
+    fig_acc = accumulation_figure(df_chart, color_map, m_name, fast_render, point_budget, climate, band_kind,
+                                  metric_col, start)
+    st.plotly_chart(fig_acc, use_container_width=True)
+    anomaly = climatology.anomaly_text(df_chart, climate, metric_col)
+    if anomaly:
+        st.caption(f"📈 {anomaly}")
+
+    st.divider()
+
+    # --- ГРАФІК 2: ЩОДЕННА ДИНАМІКА (ВЕСЬ РІК) ---
+    st.subheader("❄️ Щоденна динаміка температур (Весь рік)")
+
+    temp_mode = st.radio(
+        "Показник дня:",
+        ["Середня Т", "Максимальна Т", "Мінімальна Т"],
+        horizontal=True
     )
 
+    mode_map = {"Середня Т": "mean", "Максимальна Т": "max", "Мінімальна Т": "min"}
+    # Поріг заморозку — той самий, що у вкладці "Заморозки" аналітики
+    threshold = st.session_state.get('frost_threshold', frost.DEFAULT_THRESHOLD)
+    fig_daily = daily_figure(df_chart, color_map, mode_map[temp_mode], fast_render, point_budget, climate, band_kind,
+                             threshold)
+    st.plotly_chart(fig_daily, use_container_width=True)
+
+
+def _heat_controls():
+    """Віджети параметрів власної суми температур: (база, стеля або None, (місяць, день), метод)."""
+    c1, c2, c3, c4 = st.columns([1, 1, 1, 2])
+    with c1:
+        base = st.number_input("База, °C", -5.0, 25.0, gdd.DEFAULT_BASE, 0.5, key="gdd_base")
+    with c2:
+        no_cap = st.checkbox("Без стелі", key="gdd_no_cap")
+        cap = st.number_input("Стеля, °C", base + 1, 45.0, max(gdd.DEFAULT_CAP, base + 1), 0.5,
+                              key="gdd_cap", disabled=no_cap)
+    with c3:
+        year = utils.PLOT_YEAR_START.year
+        start = st.date_input("Старт накопичення", datetime.date(year, *gdd.DEFAULT_START),
+                              datetime.date(year, 1, 1), datetime.date(year, 12, 31), format="DD.MM.YYYY",
+                              key="gdd_start")
+    with c4:
+        method = gdd.METHODS[st.selectbox("Метод", list(gdd.METHODS), key="gdd_method")]
+    return base, None if no_cap else cap, (start.month, start.day), method
+
+# 2. ПОБУДОВА ГРАФІКІВ (БЕЗ ВІДЖЕТІВ — ТАКОЖ ДЛЯ batch_reports.py)
+def accumulation_figure(df_chart, color_map, m_name, fast_render=False, point_budget=POINT_BUDGET,
+                        climate=None, band_kind="P10–P90", metric_col=None, start=gdd.DEFAULT_START):
+    """Накопичення показника m_name з дати start (місяць, день) з лінією середнього та коридором норми.
+
+    df_chart відсортований за роком і датою; climate — норма вибору (Climatology.for_selection);
+    metric_col — колонка, якщо показника немає в get_metrics_dict (напр., gdd.GDD_COL).
+    """
+    metric_col = metric_col or get_metrics_dict()[m_name]
+    years_ordered = sorted(df_chart['year_str'].unique())
+    since = f"{start[1]:02d}/{start[0]:02d}"
+
+    # Фільтр для накопичення (з дати старту)
+    df_acc = df_chart[(df_chart['month'] > start[0]) |
+                      ((df_chart['month'] == start[0]) & (df_chart['day'] >= start[1]))].copy()
+
+    if fast_render:
+        fig_acc = line_figure(df_acc, 'plot_date', metric_col, color_map, years_ordered, point_budget,
+                              downsample_method(metric_col), title=f"Накопичення: {m_name} (з {since})")
+    else:
+        fig_acc = px.line(
+            df_acc,
+            x='plot_date',
+            y=metric_col,
+            color='year_str',
+            color_discrete_map=color_map,
+            category_orders={"year_str": years_ordered},
+            custom_data=['hover_date'],
+            title=f"Накопичення: {m_name} (з {since})"
+        )
+
     # Додаємо лінію середнього (Норма)
-    metric_col = m_dict[m_name]
     avg_col = f"Avg_{metric_col}"
     if avg_col in df_acc.columns:
         df_avg_acc = df_acc[df_acc['year_str'] == df_acc['year_str'].unique()[0]]
@@ -49,33 +129,30 @@ def show(df_chart, color_map):
     fig_acc.update_traces(hovertemplate='<b>%{customdata[0]}</b><br>Накопичено: %{y:.0f}')
     fig_acc.update_layout(hovermode="x unified")
     fig_acc.update_xaxes(tickformat="%d-%b", title=None)
-    st.plotly_chart(apply_style(fig_acc), use_container_width=True)
-    
-    st.divider()
+    return add_band(apply_style(fig_acc), climatology.band(climate, metric_col, df_acc), band_kind)
 
-    # --- ГРАФІК 2: ЩОДЕННА ДИНАМІКА (ВЕСЬ РІК) ---
-    st.subheader("❄️ Щоденна динаміка температур (Весь рік)")
-    
-    temp_mode = st.radio(
-        "Показник дня:", 
-        ["Середня Т", "Максимальна Т", "Мінімальна Т"], 
-        horizontal=True
-    )
-    
-    mode_map = {"Середня Т": "mean", "Максимальна Т": "max", "Мінімальна Т": "min"}
-    target_col = mode_map[temp_mode]
-
-    fig_daily = px.line(
-        df_chart, 
-        x='plot_date', 
-        y=target_col, 
-        color='year_str', 
-        color_discrete_map=color_map,
-        category_orders={"year_str": years_ordered},
-        custom_data=['hover_date']
-    )
-    
-    fig_daily.add_hline(y=-1, line_dash="dash", line_color="red", annotation_text="-1°C (Заморозок)")
+
+def daily_figure(df_chart, color_map, target_col, fast_render=False, point_budget=POINT_BUDGET,
+                 climate=None, band_kind="P10–P90", frost_threshold=frost.DEFAULT_THRESHOLD):
+    """Щоденна температура (mean/max/min) за весь рік з лінією середнього, коридором норми та порогом заморозку."""
+    years_ordered = sorted(df_chart['year_str'].unique())
+
+    if fast_render:
+        fig_daily = line_figure(df_chart, 'plot_date', target_col, color_map, years_ordered, point_budget,
+                                downsample_method(target_col))
+    else:
+        fig_daily = px.line(
+            df_chart,
+            x='plot_date',
+            y=target_col,
+            color='year_str',
+            color_discrete_map=color_map,
+            category_orders={"year_str": years_ordered},
+            custom_data=['hover_date']
+        )
+
+    fig_daily.add_hline(y=frost_threshold, line_dash="dash", line_color="red",
+                        annotation_text=f"{frost_threshold:g}°C (Заморозок)")
     fig_daily.add_hline(y=0, line_color="gray", opacity=0.5)
 
     # Додаємо лінію середнього дня
@@ -93,4 +170,4 @@ def show(df_chart, color_map):
 
     fig_daily.update_traces(hovertemplate='<b>%{customdata[0]}</b><br>Темп: %{y:.1f}°C')
     fig_daily.update_xaxes(tickformat="%d-%b", title=None)
-    st.plotly_chart(apply_style(fig_daily), use_container_width=True)
\ No newline at end of file
+    return add_band(apply_style(fig_daily), climatology.band(climate, target_col, df_chart), band_kind)
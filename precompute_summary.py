@@ -0,0 +1,298 @@
+"""Побудова WEB_AGG_DATA, WEB_FIELD_SUMMARY, WEB_FIELD_DAILY (.parquet) та WEB_FIELD_STORE (.arrow)
+з сирих щоденних даних по полях.
+
+Вхід — Parquet/CSV (файл або тека) з колонками: Поле, Cluster, Block, Culture, date,
+min, max, precipitation та (необов'язково) mean. Дані читаються потоково частинами,
+поля-роки розкладаються по кошиках і рахуються в пулі процесів. Стан попереднього
+запуску (відбитки полів-років) дозволяє перераховувати лише змінені поля-роки.
+
+    python precompute_summary.py raw_daily.parquet --workers 8
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import utils
+import field_store
+
+# 1. КОНСТАНТИ
+RAW_COLS = ['Поле', 'Cluster', 'Block', 'Culture', 'date', 'min', 'max', 'mean', 'precipitation']
+KEY_COLS = ['Поле', 'Рік']
+AGG_DIMS = ['Cluster', 'Block', 'Culture', 'date']
+DAILY_METRICS = ['min', 'max', 'mean', 'precipitation',
+                 'Sum_T_active', 'Sum_T_eff_0', 'Sum_T_eff_10', 'Sum_Precipitation']
+FIELD_DAILY_SCHEMA = pa.schema([('Поле', pa.string()), ('Cluster', pa.string()), ('Block', pa.string()),
+                                ('Culture', pa.string()), ('date', pa.timestamp('ms')),
+                                ('min', pa.float32()), ('max', pa.float32())])
+DEFAULT_STATE_DIR = os.path.join(utils.PREPARED_DIR, 'precompute')
+
+# 2. РОЗРАХУНОК МЕТРИК (векторно для багатьох полів-років одразу)
+def compute_cumulative(df, start='01-01'):
+    """Накопичувальні суми по кожному полю-року, починаючи з дати start (MM-DD)."""
+    df = df.sort_values(['Поле', 'date'], kind='stable').reset_index(drop=True)
+    if df['mean'].isna().all():
+        df['mean'] = (df['min'] + df['max']) / 2
+    else:
+        df['mean'] = df['mean'].fillna((df['min'] + df['max']) / 2)
+
+    month, day = map(int, start.split('-'))
+    active = ((df['date'].dt.month > month) | ((df['date'].dt.month == month) & (df['date'].dt.day >= day)))
+    t = df['mean'].where(active, 0)
+
+    contrib = pd.DataFrame({
+        'Sum_T_active': (t - 10).clip(lower=0),
+        'Sum_T_eff_0': t.where(t > 0, 0),
+        'Sum_T_eff_10': t.where(t > 10, 0),
+        'Sum_Precipitation': df['precipitation'].fillna(0).where(active, 0),
+    })
+    df[contrib.columns] = contrib.groupby([df['Поле'], df['Рік']]).cumsum()
+    return df
+
+
+def summarize_fields(daily):
+    """Один рядок на поле-рік у форматі WEB_FIELD_SUMMARY."""
+    g = daily.groupby(KEY_COLS, sort=True, observed=True)
+    summary = g[['Cluster', 'Block', 'Culture']].last()
+    summary['Абсолютний мін. t, °C'] = g['min'].min()
+    summary['Абсолютний макс. t, °C'] = g['max'].max()
+    summary['∑ Опади (з щоденних), мм'] = g['precipitation'].sum()
+    summary['∑ Акт. t (>10°C)'] = g['Sum_T_active'].last()
+    summary['∑ Ефект. t (>0°C)'] = g['Sum_T_eff_0'].last()
+    summary['∑ Ефект. t (>10°C)'] = g['Sum_T_eff_10'].last()
+    summary['∑ Опади (накопичені), мм'] = g['Sum_Precipitation'].last()
+    summary['Середня t за період, °C'] = g['mean'].mean().round(1)
+
+    # Перший осінній мороз: найраніша дата після 1 липня з мінімумом ≤ порогу
+    frost = daily[(daily['date'].dt.month >= utils.FROST_FROM_MONTH) & (daily['min'] <= utils.FROST_THRESHOLD)]
+    first = frost.groupby(KEY_COLS, observed=True)['date'].min().dt.strftime('%d.%m.%Y')
+    summary[f'Перший мороз (≤ {utils.FROST_THRESHOLD:.0f}°C)'] = first.reindex(summary.index)
+    return summary.reset_index()
+
+
+def aggregate_days(daily):
+    """Середнє по полях на кожен день локації + кількість полів (формат WEB_AGG_DATA)."""
+    agg = daily.groupby(AGG_DIMS, observed=True)[DAILY_METRICS].mean()
+    agg['field_count'] = daily.groupby(AGG_DIMS, observed=True)['Поле'].nunique()
+    agg = agg.reset_index()
+    agg['year'] = agg['date'].dt.year
+    agg['month'] = agg['date'].dt.month
+    agg['day'] = agg['date'].dt.day
+    return agg
+
+# 3. ПОТОКОВЕ ЧИТАННЯ ТА ВІДБИТКИ ПОЛІВ-РОКІВ
+def _open_raw(path):
+    fmt = 'csv' if path.lower().endswith('.csv') else 'parquet'
+    return ds.dataset(path, format=fmt)
+
+
+def _normalize(chunk):
+    chunk = chunk.reindex(columns=RAW_COLS)
+    chunk['date'] = pd.to_datetime(chunk['date'])
+    chunk['Рік'] = chunk['date'].dt.year
+    return chunk
+
+
+def _iter_chunks(path, chunk_size, filter=None):
+    dataset = _open_raw(path)
+    columns = [c for c in RAW_COLS if c in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, filter=filter, batch_size=chunk_size):
+        yield _normalize(batch.to_pandas())
+
+
+def scan_fingerprints(path, chunk_size):
+    """Один потоковий прохід: сума хешів рядків і кількість рядків на поле-рік."""
+    parts = []
+    for chunk in _iter_chunks(path, chunk_size):
+        h = pd.util.hash_pandas_object(chunk[RAW_COLS], index=False)
+        parts.append(pd.DataFrame({'Поле': chunk['Поле'].astype(str), 'Рік': chunk['Рік'],
+                                   'hash': h.to_numpy(), 'rows': 1}))
+    if not parts:
+        return pd.DataFrame(columns=KEY_COLS + ['hash', 'rows'])
+    # Сума (за модулем 2^64) не залежить від порядку рядків і меж частин
+    return pd.concat(parts).groupby(KEY_COLS, sort=True).agg(hash=('hash', 'sum'), rows=('rows', 'sum')).reset_index()
+
+
+def _years_filter(path, years):
+    """Фільтр діапазону років для читача (лише якщо дата збережена як дата, а не рядок)."""
+    if not years:
+        return None
+    date_type = _open_raw(path).schema.field('date').type
+    if not (pa.types.is_timestamp(date_type) or pa.types.is_date(date_type)):
+        return None
+    lo = pa.scalar(pd.Timestamp(f"{years[0]}-01-01").to_pydatetime()).cast(date_type)
+    hi = pa.scalar(pd.Timestamp(f"{years[-1] + 1}-01-01").to_pydatetime()).cast(date_type)
+    return (ds.field('date') >= lo) & (ds.field('date') < hi)
+
+
+def _bucket_of(fields, n_buckets):
+    return (pd.util.hash_array(np.asarray(fields, dtype=object)) % n_buckets).astype(int)
+
+# 4. ОБРОБКА КОШИКА (виконується у процесі пулу)
+def _process_bucket(task):
+    spool_dir, state_path, drop_keys, start = task
+    fresh = compute_cumulative(pd.read_parquet(spool_dir), start) if os.path.isdir(spool_dir) else None
+
+    # Зберігаємо щоденні ряди полів-років кошика, замінюючи лише змінені поля-роки
+    daily = fresh
+    if os.path.exists(state_path):
+        old = pd.read_parquet(state_path)
+        old = old[~pd.MultiIndex.from_frame(old[KEY_COLS]).isin(drop_keys)]
+        daily = old if fresh is None else pd.concat([old, fresh], ignore_index=True)
+    if daily is not None:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        daily.to_parquet(state_path, index=False)
+
+    return summarize_fields(fresh) if fresh is not None else None
+
+# 5. ОСНОВНИЙ ПАЙПЛАЙН
+def run(raw, agg_out=utils.FILE_TO_LOAD, summary_out=utils.FIELD_SUMMARY_FILE, state_dir=DEFAULT_STATE_DIR,
+        workers=None, chunk_size=500_000, n_buckets=64, start='01-01', full=False,
+        field_daily_out=utils.FIELD_DAILY_FILE, field_store_out=utils.FIELD_STORE_FILE):
+    t0 = time.time()
+    fp_path = os.path.join(state_dir, 'fingerprints.parquet')
+    summary_state = os.path.join(state_dir, 'summary.parquet')
+    if full and os.path.isdir(state_dir):
+        shutil.rmtree(state_dir)
+    os.makedirs(state_dir, exist_ok=True)
+
+    # --- 1. Які поля-роки змінились ---
+    fp_new = scan_fingerprints(raw, chunk_size)
+    # Без збереженого зведення відбитки нічого не варті — усі поля-роки вважаються зміненими
+    fp_old = pd.read_parquet(fp_path) if os.path.exists(fp_path) and os.path.exists(summary_state) \
+        else fp_new.iloc[:0]
+    cmp = fp_new.merge(fp_old, on=KEY_COLS, how='outer', suffixes=('', '_old'), indicator=True)
+    changed = cmp[(cmp['_merge'] == 'left_only') | ((cmp['_merge'] == 'both') &
+                  ((cmp['hash'] != cmp['hash_old']) | (cmp['rows'] != cmp['rows_old'])))][KEY_COLS]
+    removed = cmp[cmp['_merge'] == 'right_only'][KEY_COLS]
+    print(f"Полів-років: {len(fp_new)}, змінених: {len(changed)}, видалених: {len(removed)}")
+    if changed.empty and removed.empty:
+        print("Нічого перераховувати.")
+        return
+
+    # --- 2. Розкладаємо сирі рядки змінених полів-років по кошиках (рік × хеш поля) ---
+    spool = os.path.join(state_dir, 'spool')
+    shutil.rmtree(spool, ignore_errors=True)
+    changed_idx = pd.MultiIndex.from_frame(changed)
+    years = sorted(changed['Рік'].unique().tolist())
+    # Лише видалення — сирі дані читати не потрібно
+    chunks = _iter_chunks(raw, chunk_size, _years_filter(raw, years)) if years else []
+    for i, chunk in enumerate(chunks):
+        chunk = chunk[pd.MultiIndex.from_arrays([chunk['Поле'].astype(str), chunk['Рік']]).isin(changed_idx)]
+        chunk['bucket'] = _bucket_of(chunk['Поле'].astype(str), n_buckets)
+        for (year, bucket), part in chunk.groupby(['Рік', 'bucket']):
+            out = os.path.join(spool, f"year={year}", f"bucket={bucket}")
+            os.makedirs(out, exist_ok=True)
+            part.drop(columns='bucket').to_parquet(os.path.join(out, f"part-{i}.parquet"), index=False)
+
+    # --- 3. Паралельний розрахунок кошиків ---
+    touched = pd.concat([changed, removed])
+    touched['bucket'] = _bucket_of(touched['Поле'], n_buckets)
+    tasks = []
+    for (year, bucket), keys in touched.groupby(['Рік', 'bucket']):
+        tasks.append((os.path.join(spool, f"year={year}", f"bucket={bucket}"),
+                      os.path.join(state_dir, 'fields', f"year={year}", f"bucket={bucket}.parquet"),
+                      pd.MultiIndex.from_frame(keys[KEY_COLS]), start))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        new_summary = [s for s in pool.map(_process_bucket, tasks) if s is not None]
+    shutil.rmtree(spool, ignore_errors=True)
+
+    # --- 4. Зведена таблиця по полях: старі рядки незмінених полів-років + нові ---
+    summary = pd.read_parquet(summary_state) if os.path.exists(summary_state) else None
+    if summary is not None:
+        keep = ~pd.MultiIndex.from_arrays([summary['Поле'].astype(str), summary['Рік']]).isin(
+            pd.MultiIndex.from_frame(touched[KEY_COLS]))
+        new_summary.insert(0, summary[keep])
+    if not new_summary:
+        raise RuntimeError("немає жодного поля-року для зведення")     # Без стану зведення fp_old порожній
+    summary = pd.concat(new_summary, ignore_index=True).sort_values(KEY_COLS, ignore_index=True)
+    summary.to_parquet(summary_state, index=False)
+    _write_summary(summary, summary_out)
+
+    # --- 5. Агрегати по локаціях: перераховуємо лише роки, яких торкнулись зміни ---
+    agg_dir = os.path.join(state_dir, 'agg')
+    os.makedirs(agg_dir, exist_ok=True)
+    for year in sorted(touched['Рік'].unique().tolist()):
+        fields_dir = os.path.join(state_dir, 'fields', f"year={year}")
+        daily = pd.read_parquet(fields_dir) if os.path.isdir(fields_dir) else pd.DataFrame()
+        out = os.path.join(agg_dir, f"year={year}.parquet")
+        if daily.empty:
+            if os.path.exists(out):
+                os.remove(out)
+            continue
+        aggregate_days(daily).to_parquet(out, index=False)
+    agg = pd.read_parquet(agg_dir).sort_values(['date'] + AGG_DIMS[:-1], ignore_index=True)
+    agg.to_parquet(agg_out + '.tmp', index=False)
+    os.replace(agg_out + '.tmp', agg_out)
+
+    # --- 6. Щоденні min/max по полях (аналіз заморозків, frost.py) ---
+    if field_daily_out:
+        _write_field_daily(sorted(glob.glob(os.path.join(state_dir, 'fields', 'year=*', 'bucket=*.parquet'))),
+                           field_daily_out)
+
+    # --- 7. Усі щоденні метрики, згруповані по полях (деталізація поля, field_store.py) ---
+    if field_store_out:
+        field_store.build(field_store.parts_from_state(state_dir), field_store_out)
+
+    fp_new.to_parquet(fp_path, index=False)
+    print(f"Готово за {time.time() - t0:.1f} с: {agg_out} ({len(agg)} рядків), {summary_out} ({len(summary)} рядків)")
+
+
+def _write_summary(summary, path):
+    """Типи як у WEB_FIELD_SUMMARY: категорії для вимірів, int32 для року, float32 для сум."""
+    out = summary.copy()
+    for c in ['Поле', 'Cluster', 'Block', 'Culture']:
+        out[c] = out[c].astype('category')
+    out['Рік'] = out['Рік'].astype('int32')
+    float32_cols = ['Абсолютний мін. t, °C', '∑ Опади (з щоденних), мм', '∑ Акт. t (>10°C)',
+                    '∑ Ефект. t (>0°C)', '∑ Ефект. t (>10°C)', '∑ Опади (накопичені), мм']
+    out[float32_cols] = out[float32_cols].astype('float32')
+    out.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def field_daily_table(daily):
+    """Рядки WEB_FIELD_DAILY (FIELD_DAILY_SCHEMA), відсортовані за полем і датою."""
+    part = daily[FIELD_DAILY_SCHEMA.names].sort_values(['Поле', 'date'], kind='stable')
+    part = part.astype({c: str for c in ['Поле', 'Cluster', 'Block', 'Culture']})
+    return pa.Table.from_pandas(part, preserve_index=False).cast(FIELD_DAILY_SCHEMA)
+
+
+def _write_field_daily(files, path):
+    """Потоково, по файлу стану (кошик полів одного року) — поле-рік ніколи не розривається."""
+    with pq.ParquetWriter(path + '.tmp', FIELD_DAILY_SCHEMA) as writer:
+        for file in files:
+            writer.write_table(field_daily_table(pd.read_parquet(file, columns=FIELD_DAILY_SCHEMA.names)))
+    os.replace(path + '.tmp', path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Побудова WEB_AGG_DATA та WEB_FIELD_SUMMARY з щоденних даних по полях.")
+    parser.add_argument('raw', help="Parquet/CSV файл або тека з сирими щоденними даними по полях")
+    parser.add_argument('--agg-out', default=utils.FILE_TO_LOAD)
+    parser.add_argument('--summary-out', default=utils.FIELD_SUMMARY_FILE)
+    parser.add_argument('--field-daily-out', default=utils.FIELD_DAILY_FILE,
+                        help="Щоденні min/max по полях (порожній рядок — не записувати)")
+    parser.add_argument('--field-store-out', default=utils.FIELD_STORE_FILE,
+                        help="Сховище щоденних рядів по полях (порожній рядок — не записувати)")
+    parser.add_argument('--state', default=DEFAULT_STATE_DIR, help="Тека стану для інкрементальних запусків")
+    parser.add_argument('--workers', type=int, default=None, help="Кількість процесів (за замовчуванням — усі ядра)")
+    parser.add_argument('--chunk-size', type=int, default=500_000, help="Рядків на частину при потоковому читанні")
+    parser.add_argument('--buckets', type=int, default=64, help="Кількість кошиків полів на рік")
+    parser.add_argument('--start', default='01-01', help="Початок накопичення сум (MM-DD)")
+    parser.add_argument('--full', action='store_true', help="Ігнорувати стан і перерахувати все")
+    args = parser.parse_args()
+    run(args.raw, args.agg_out, args.summary_out, args.state, args.workers, args.chunk_size,
+        args.buckets, args.start, args.full, args.field_daily_out, args.field_store_out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""Профілювання етапів перезапуску застосунку (вмикається за бажанням).
+
+Вмикання: змінна середовища AGRO_PROFILE=1 (для всіх сесій) або параметр ?debug=1 в
+адресі сторінки (для однієї сесії). Для кожного етапу — секцій app.py та show() сторінок —
+фіксуються час, кількість рядків і влучання/промахи кешу. Пік пам'яті (tracemalloc) — лише
+з AGRO_PROFILE=1: трасування сповільнює весь процес, тож одна сесія з ?debug=1 його не вмикає.
+Записи показуються у прихованій панелі сайдбару та дописуються в ротований JSONL-лог.
+
+Холодний старт процесу (startup_step) міряється завжди: перше виконання кожного кроку —
+імпорти, завантаження у пулі потоків, перші етапи й сторінки — із зсувом від імпорту
+профілера. Звіт показує та сама панель; з AGRO_PROFILE=1 кроки йдуть і в лог (startup:*).
+
+    python profiler.py [.cache/profile.jsonl]    # p50/p95 по етапах з логу
+"""
+import functools
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+import streamlit as st
+
+# 1. КОНСТАНТИ
+PROFILE_ENV = 'AGRO_PROFILE'
+PROFILE_LOG = os.path.join('.cache', 'profile.jsonl')   # utils.PREPARED_DIR — без імпорту utils: профілер міряє і його
+PROFILE_LOG_BYTES = 5 * 2 ** 20       # Розмір одного файлу логу до ротації
+PROFILE_LOG_BACKUPS = 5               # Скільки старих файлів (profile.jsonl.1 ...) зберігати
+_STARTUP_T0 = time.perf_counter()     # Відлік холодного старту — імпорт профілера (перший у розділі 4 app.py)
+_startup = {}                         # Крок -> перше виконання в процесі
+_startup_lock = threading.Lock()
+_memory_lock = threading.Lock()
+_memory_active = 0                    # Етапів, що зараз міряють пам'ять (у всіх сесіях процесу)
+
+# 2. УВІМКНЕННЯ ТА ЗАПУСК
+def start_run():
+    """Початок повного перезапуску скрипта: визначає, чи профілюємо, і відкриває новий запуск."""
+    enabled = _traces_memory() or st.query_params.get('debug') == '1'
+    st.session_state._profile_enabled = enabled
+    if enabled:
+        st.session_state.setdefault('_profile_session', uuid.uuid4().hex[:8])
+        st.session_state._profile_run = uuid.uuid4().hex[:8]
+        st.session_state._profile_records = []
+    if _traces_memory() and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _traces_memory():
+    """Пік пам'яті міряється лише для всього процесу (AGRO_PROFILE=1), не для окремої сесії."""
+    return os.environ.get(PROFILE_ENV) == '1'
+
+
+def is_enabled():
+    return st.session_state.get('_profile_enabled', False)
+
+
+@functools.lru_cache(maxsize=1)
+def _log():
+    """Логер з ротацією файлів (один на процес, потокобезпечний)."""
+    os.makedirs(os.path.dirname(PROFILE_LOG), exist_ok=True)
+    handler = RotatingFileHandler(PROFILE_LOG, maxBytes=PROFILE_LOG_BYTES,
+                                  backupCount=PROFILE_LOG_BACKUPS, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger('agro.profile')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger
+
+# 3. ЕТАПИ
+@contextmanager
+def stage(name, cache=None):
+    """Вимірює блок коду. Повертає словник запису — у нього можна дописати rows.
+
+    cache — об'єкт зі stats() (hits/misses), напр. aggregation.SelectionCache.
+    Пік пам'яті (лише з AGRO_PROFILE=1) — від першого з етапів, що перекриваються в часі:
+    tracemalloc один на процес, тож паралельні етапи ділять пік, а не скидають його один одному.
+    Перше виконання етапу в процесі потрапляє і у звіт холодного старту.
+    """
+    if not is_enabled():
+        with startup_step(name):
+            yield {}
+        return
+
+    record = {'stage': name, 'rows': None}
+    before = cache.stats() if cache is not None else None
+    base = _memory_begin()
+    t0 = time.perf_counter()
+    try:
+        with startup_step(name):
+            yield record
+    finally:
+        record['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+        if base is not None:
+            record['peak_mb'] = round(_memory_end(base) / 2 ** 20, 2)
+        if before is not None:
+            after = cache.stats()
+            record['cache_hits'] = after['hits'] - before['hits']
+            record['cache_misses'] = after['misses'] - before['misses']
+        _save(record)
+
+
+def _memory_begin():
+    """Поточний обсяг для відліку піку; пік скидає лише перший з паралельних етапів."""
+    global _memory_active
+    if not tracemalloc.is_tracing():
+        return None
+    with _memory_lock:
+        if _memory_active == 0:
+            tracemalloc.reset_peak()
+        _memory_active += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _memory_end(base):
+    global _memory_active
+    with _memory_lock:
+        _memory_active -= 1
+        return max(tracemalloc.get_traced_memory()[1] - base, 0)
+
+
+def profiled(name):
+    """Декоратор для show() сторінок; rows — довжина першого аргументу (df_chart)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                if args and hasattr(args[0], '__len__'):
+                    record['rows'] = len(args[0])
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _save(record):
+    record = {'ts': pd.Timestamp.now().isoformat(timespec='milliseconds'),
+              'session': st.session_state.get('_profile_session'),
+              'run': st.session_state.get('_profile_run')} | record
+    st.session_state.setdefault('_profile_records', []).append(record)
+    _log().info(json.dumps(record, ensure_ascii=False))
+
+# 4. ХОЛОДНИЙ СТАРТ ПРОЦЕСУ
+@contextmanager
+def startup_step(name):
+    """Перше виконання кроку в процесі: зсув від старту, тривалість і потік. Повторні — без запису.
+
+    Працює без сесії Streamlit, тож годиться і для потоків пулу завантаження.
+    """
+    if name in _startup:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record = {'stage': f"startup:{name}", 'start_s': round(t0 - _STARTUP_T0, 3),
+                  'ms': round((time.perf_counter() - t0) * 1000, 2), 'thread': threading.current_thread().name}
+        with _startup_lock:
+            first = _startup.setdefault(name, record) is record
+        if first and os.environ.get(PROFILE_ENV) == '1':
+            _log().info(json.dumps({'ts': pd.Timestamp.now().isoformat(timespec='milliseconds')} | record,
+                                   ensure_ascii=False))
+
+
+def startup_task(name, fn):
+    """fn, обгорнута в startup_step(name), — для executor.submit."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with startup_step(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def startup_report():
+    """Кроки холодного старту за часом початку: зсув, тривалість, кінець і потік (с)."""
+    with _startup_lock:
+        rows = list(_startup.values())
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows).sort_values('start_s', ignore_index=True)
+    df['крок'] = df['stage'].str.removeprefix('startup:')
+    df['тривалість, с'] = df['ms'] / 1000
+    df['кінець, с'] = df['start_s'] + df['тривалість, с']
+    df = df.rename(columns={'start_s': 'початок, с', 'thread': 'потік'})
+    return df[['крок', 'початок, с', 'тривалість, с', 'кінець, с', 'потік']].round(3)
+
+# 5. ЗВЕДЕННЯ ТА ПАНЕЛЬ
+def read_log(path=PROFILE_LOG):
+    """Усі записи з логу та його ротованих копій."""
+    rows = []
+    for file in sorted(glob.glob(path + '*')):
+        with open(file, encoding='utf-8') as f:
+            rows += [json.loads(line) for line in f if line.strip()]
+    return pd.DataFrame(rows)
+
+
+def summarize(records):
+    """p50/p95 часу та пам'яті по етапах."""
+    if records.empty:
+        return pd.DataFrame()
+    if 'peak_mb' not in records.columns:
+        records = records.assign(peak_mb=float('nan'))          # У логу лише кроки холодного старту
+    g = records.groupby('stage', sort=False)
+    out = pd.DataFrame({
+        'запусків': g.size(),
+        'p50, мс': g['ms'].quantile(0.5),
+        'p95, мс': g['ms'].quantile(0.95),
+        'p95 пам., МБ': g['peak_mb'].quantile(0.95),
+    })
+    if 'cache_hits' in records.columns:
+        out['влучань кешу'] = g['cache_hits'].sum(min_count=1)
+        out['промахів кешу'] = g['cache_misses'].sum(min_count=1)
+    return out.round(1).sort_values('p95, мс', ascending=False)
+
+
+def render_panel():
+    """Прихована панель налагодження в сайдбарі (лише коли профілювання увімкнено)."""
+    if not is_enabled():
+        return
+    with st.sidebar.expander("🐞 Профілювання"):
+        current = pd.DataFrame(st.session_state.get('_profile_records', []))
+        current = current[current['run'] == st.session_state._profile_run] if not current.empty else current
+        st.caption(f"Запуск {st.session_state._profile_run}: {current['ms'].sum() if not current.empty else 0:.0f} мс")
+        cols = [c for c in ['stage', 'ms', 'rows', 'peak_mb', 'cache_hits', 'cache_misses'] if c in current.columns]
+        st.dataframe(current[cols], hide_index=True)
+        startup = startup_report()
+        if not startup.empty:
+            st.caption(f"Холодний старт процесу: {startup['кінець, с'].max():.2f} с від імпорту модулів "
+                       "(паралельні кроки — в окремих потоках):")
+            st.dataframe(startup, hide_index=True)
+        if os.path.exists(PROFILE_LOG):
+            st.caption("Усі запуски з логу:")
+            st.dataframe(summarize(read_log()))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else PROFILE_LOG
+    print(summarize(read_log(path)).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Кеш похідних результатів на диску, спільний для реплік застосунку і перезапусків.
+
+Адреса результату — sha256 від виду результату, версії даних і канонічного вибору фільтрів
+(разом із параметрами розрахунку), тож репліки з тими самими даними отримують ті самі
+файли. Результат зберігається як Arrow IPC без стиснення і читається назад через mmap.
+Розмір каталогу обмежений: після запису найстаріші за часом доступу файли видаляються (LRU).
+
+Каталог задає AGRO_RESULT_CACHE (спільний том для всіх реплік), ліміт — AGRO_RESULT_CACHE_MB.
+Запис атомарний (тимчасовий файл + os.replace), тож репліки можуть писати одночасно;
+каталог лише для читання чи пошкоджений файл — просто промах кешу.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+import utils
+
+# 1. КОНСТАНТИ
+RESULT_CACHE_ENV = 'AGRO_RESULT_CACHE'
+RESULT_CACHE_MB_ENV = 'AGRO_RESULT_CACHE_MB'
+RESULT_CACHE_DIR = os.path.join(utils.PREPARED_DIR, 'results')    # Без AGRO_RESULT_CACHE — локально
+RESULT_CACHE_MB = 512
+RESULT_FORMAT = 1                      # Змінити при зміні розрахунків — старі файли стануть недосяжними
+TMP_MAX_AGE_S = 3600                   # Тимчасові файли реплік, що впали під час запису
+META_KEY = b'agro_result'
+PART_LEVEL = '__part'                  # Рівень індексу, під яким зберігаються частини словника таблиць
+
+# 2. КЛЮЧІ
+def selection_token(selection):
+    """Канонічний (незалежний від порядку кліків) вигляд вибору {вимір: [значення]}."""
+    return tuple((dim, tuple(sorted(map(str, values)))) for dim, values in sorted(selection.items()))
+
+
+def dataset_key(selection):
+    """Версії лише вибраних років + канонічний вибір: однаковий ключ у всіх реплік з тими самими даними."""
+    years = selection.get('year')
+    version = utils.get_data_version()
+    if utils.get_watcher().manifest is None:
+        # Лише плоский файл: версія даних — це локальний mtime, тож ключуємо за вмістом файлу
+        version = utils.content_version(utils.FILE_TO_LOAD)
+    elif years is not None:
+        version = utils.get_years_version(years)
+    return (version,) + selection_token(selection)
+
+# 3. КЕШ
+class ResultCache:
+    """Результати за ключем у каталозі на диску: get_or_compute(key, compute).
+
+    compute() повертає DataFrame, (DataFrame, meta) з JSON-сумісним meta або словник
+    DataFrame з однаковими колонками — значення повертається в тому самому вигляді.
+    """
+
+    def __init__(self, directory=None, max_mb=None):
+        self.directory = directory or os.environ.get(RESULT_CACHE_ENV) or RESULT_CACHE_DIR
+        self.max_bytes = int(float(max_mb or os.environ.get(RESULT_CACHE_MB_ENV) or RESULT_CACHE_MB) * 2 ** 20)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        digest = hashlib.sha256(json.dumps([RESULT_FORMAT, *key], default=str).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key[0]}-{digest}.arrow")
+
+    def get_or_compute(self, key, compute):
+        """key — кортеж (вид результату, ...частини ключа); перший елемент — префікс імені файлу."""
+        path = self.path(key)
+        value = self._read(path)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = compute()
+        self._write(path, key, value)
+        return value
+
+    def stats(self):
+        files = self._files()
+        return {"hits": self.hits, "misses": self.misses, "files": len(files),
+                "mb": round(sum(size for _, _, size in files) / 2 ** 20, 1), "max_mb": self.max_bytes / 2 ** 20}
+
+    def clear(self):
+        for path, _, _ in self._files():
+            _remove(path)
+
+    def _read(self, path):
+        try:
+            # mmap: сторінки файлу читаються з кешу ОС, без копії у буфер процесу
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            info = json.loads(table.schema.metadata[META_KEY])
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            _remove(path)                                    # Обірваний або чужий файл
+            return None
+        try:
+            df = table.to_pandas()
+        except (TypeError, ValueError, pa.ArrowException):
+            _remove(path)                                    # Записано старішою версією pandas/pyarrow
+            return None
+        try:
+            os.utime(path)                                   # Час доступу для LRU (atime часто вимкнено)
+        except OSError:
+            pass
+        if info['kind'] == 'parts':
+            return {part: df.xs(part, level=PART_LEVEL) for part in info['parts']}
+        return (df, info['meta']) if info['kind'] == 'tuple' else df
+
+    def _write(self, path, key, value):
+        if isinstance(value, dict):
+            info = {'kind': 'parts', 'parts': list(value)}
+            df = pd.concat(value, names=[PART_LEVEL])
+        elif isinstance(value, tuple):
+            info, df = {'kind': 'tuple', 'meta': value[1]}, value[0]
+        else:
+            info, df = {'kind': 'frame'}, value
+        if not isinstance(df, pd.DataFrame):
+            return                                           # Лише таблиці мають подання в Arrow
+        info['key'] = [str(k) for k in key]
+        if isinstance(df.columns, pd.CategoricalIndex):
+            df = df.set_axis(df.columns.astype(str), axis=1)     # Категоріальні назви колонок Arrow не відновлює
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            table = pa.Table.from_pandas(df)
+            table = table.replace_schema_metadata(table.schema.metadata | {META_KEY: json.dumps(info).encode()})
+            os.makedirs(self.directory, exist_ok=True)
+            with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)
+        except (OSError, pa.ArrowException, TypeError, ValueError):
+            # Каталог лише для читання або тип, що не має подання в Arrow — працюємо без диска
+            _remove(tmp)
+            return
+        self._prune()
+
+    def _files(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        files = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue                                     # Іншу репліку вже видалила його
+            if name.endswith('.tmp'):
+                if time.time() - stat.st_mtime > TMP_MAX_AGE_S:
+                    _remove(path)
+            elif name.endswith('.arrow'):
+                files.append((path, stat.st_mtime, stat.st_size))
+        return files
+
+    def _prune(self):
+        """Видаляє найдавніше використані файли, доки каталог не вкладеться в ліміт."""
+        total = 0
+        for path, _, size in sorted(self._files(), key=lambda f: f[1], reverse=True):
+            total += size
+            if total > self.max_bytes:
+                _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Один об'єкт кешу на процес (каталог — спільний для процесів і реплік)."""
+    return ResultCache()
@@ -0,0 +1,242 @@
+"""Вбудований SQL-рушій (DuckDB) над Parquet-файлами — необов'язковий бекенд запитів.
+
+Вмикання: змінна середовища AGRO_BACKEND=duckdb (за замовчуванням — pandas). Тоді фільтри
+сайдбару, середнє по днях з колонками Avg_, теплові карти опадів і фільтрація зведення по
+полях виконуються як SQL прямо над партиціями year=YYYY/part-*.parquet і FIELD_SUMMARY_FILE:
+рушій читає лише потрібні партиції, колонки та row groups, рахує у кількох потоках, а за
+нестачі пам'яті скидає проміжні дані на диск (SQL_SPILL_DIR). У пам'ять Python потрапляє
+лише результат — таблиця графіка чи сторінка зведення, а не весь датасет.
+
+Без пакета duckdb, без партиціонованого датасету або при помилці запиту відповідає
+pandas-реалізація (run), тож результат на сторінках той самий.
+
+    AGRO_BACKEND=duckdb AGRO_SQL_MEMORY=4GB streamlit run app.py
+"""
+import importlib.util
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import utils
+import analytics
+from aggregation import GROUP_COLS
+
+# 1. КОНСТАНТИ ТА ВИБІР БЕКЕНДУ
+BACKEND_ENV = 'AGRO_BACKEND'          # pandas | duckdb
+MEMORY_ENV = 'AGRO_SQL_MEMORY'        # Ліміт пам'яті рушія (напр. 4GB); без нього — типовий DuckDB
+SQL_SPILL_DIR = os.path.join(utils.PREPARED_DIR, 'sql_spill')   # Проміжні дані понад ліміт пам'яті
+SQL_THREADS = os.cpu_count() or 1
+
+_log = logging.getLogger('agro.sql')
+
+
+def enabled():
+    """SQL-бекенд вибрано в конфігурації, duckdb встановлено і є партиціонований датасет."""
+    return (os.environ.get(BACKEND_ENV, 'pandas').lower() == 'duckdb'
+            and importlib.util.find_spec('duckdb') is not None
+            and utils.get_watcher().manifest is not None)
+
+
+def run(sql_fn, pandas_fn):
+    """sql_fn(), якщо SQL-бекенд увімкнено, інакше pandas_fn(); помилка запиту — теж pandas_fn()."""
+    if enabled():
+        try:
+            return sql_fn()
+        except Exception:
+            # Будь-яка помилка рушія (SQL, читання файлу, перетворення типів) — відповідь через pandas
+            _log.warning("SQL-запит не вдався, відповідає pandas", exc_info=True)
+    return pandas_fn()
+
+
+@st.cache_resource(show_spinner=False)
+def get_connection():
+    """Одне з'єднання з рушієм на процес (база в пам'яті, каталог для скидання на диск)."""
+    import duckdb
+    os.makedirs(SQL_SPILL_DIR, exist_ok=True)
+    config = {'threads': SQL_THREADS, 'temp_directory': SQL_SPILL_DIR}
+    if os.environ.get(MEMORY_ENV):
+        config['memory_limit'] = os.environ[MEMORY_ENV]
+    return duckdb.connect(config=config)
+
+
+def query(sql, params=None):
+    """Результат запиту як DataFrame; окремий курсор на запит — сесії не блокують одна одну."""
+    cursor = get_connection().cursor()
+    try:
+        return cursor.execute(sql, params or []).df()
+    finally:
+        cursor.close()
+
+# 2. ДЖЕРЕЛА ТА УМОВИ
+def _ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _store(years=None):
+    """read_parquet над партиціями вибраних років (відсікання зайвих років — ще до запиту)."""
+    manifest = utils.get_watcher().manifest
+    years = sorted(manifest['years'] if years is None else {str(y) for y in years} & set(manifest['years']))
+    if not years:
+        raise ValueError("немає партицій для вибраних років")
+    paths = ", ".join(_literal(utils.partition_path(int(y), manifest['years'][y])) for y in years)
+    return f"read_parquet([{paths}])"
+
+
+def _where(selection):
+    """WHERE з вибору {вимір: [значення]} і параметри запиту (значення — лише через ?)."""
+    clauses, params = [], []
+    for dim, values in selection.items():
+        values = list(values)
+        clauses.append(f"{_ident(dim)} IN ({', '.join('?' * len(values))})"
+                       if values else "FALSE")
+        params += values
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _typed(df, skip=()):
+    """Типи колонок як у pandas-шляху (utils.schema_types), крім skip (середні — float64)."""
+    types = {c: t for c, t in utils.schema_types().items() if c in df.columns and c not in skip}
+    if 'plot_date' in df.columns:
+        types['plot_date'] = 'datetime64[us]'
+    return df.astype(types)
+
+# 3. ВИМІРИ САЙДБАРУ
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_dims(version, columns):
+    """Унікальні комбінації вимірів замість усіх рядків — основа FilterIndex і кольорів років.
+
+    Каскад фільтрів потребує лише факту спільної появи значень, тож DISTINCT над
+    партиціями дає той самий сайдбар за розміром у тисячі, а не мільйони рядків.
+    """
+    cols = ", ".join(_ident(c) for c in columns)
+    return _typed(query(f"SELECT DISTINCT {cols} FROM {_store()} ORDER BY {cols}"))
+
+# 4. СЕРЕДНЄ ПО ДНЯХ, НОРМА (Avg_) ТА МАСШТАБ
+def _daily_sql(selection, metrics, weighted=False):
+    """Підзапит «рік × день»: середні метрик по рядках вибору (як aggregation.build_chart)."""
+    where, params = _where({d: v for d, v in selection.items() if d != 'year'})
+    if weighted:
+        means = [f"sum({_ident(m)}::DOUBLE * field_count) / nullif(sum(field_count) FILTER (WHERE {_ident(m)} IS NOT NULL), 0)"
+                 for m in metrics]
+    else:
+        means = [f"avg({_ident(m)}::DOUBLE)" for m in metrics]
+    cols = ", ".join(GROUP_COLS)
+    sql = (f"SELECT {cols}, " + ", ".join(f"{e} AS {_ident(m)}" for e, m in zip(means, metrics))
+           + f", sum(field_count) / count(*) AS field_count FROM {_store(selection.get('year'))} {where} "
+           f"GROUP BY {cols}")
+    return sql, params
+
+
+def build_chart(selection, metrics, weighted=False):
+    """SQL-версія aggregation.build_chart: той самий df_chart (середнє по днях + Avg_) і масштаб."""
+    daily, params = _daily_sql(selection, metrics, weighted)
+    avg = ", ".join(f"avg({_ident(m)}) OVER (PARTITION BY plot_date) AS {_ident('Avg_' + m)}" for m in metrics)
+    df_chart = query(f"SELECT *, {avg} FROM ({daily}) ORDER BY plot_date, year_str", params)
+    df_chart = _typed(df_chart, skip=list(metrics) + [f"Avg_{m}" for m in metrics] + ['field_count'])
+
+    # Масштаб (Поле-Рік): максимум полів за день у кожному році. year::INTEGER — групування за
+    # int16-колонкою однієї партиції DuckDB (perfect hash за статистикою Parquet) рахує хибно
+    where, params = _where({d: v for d, v in selection.items() if d != 'year'})
+    scale = query(f"SELECT sum(peak) AS total, avg(peak) AS avg_fields FROM ("
+                  f"SELECT year, max(n) AS peak FROM (SELECT year::INTEGER AS year, plot_date, sum(field_count) AS n "
+                  f"FROM {_store(selection.get('year'))} {where} GROUP BY year, plot_date) GROUP BY year)", params)
+    total, avg_fields = (0 if pd.isna(v) else v for v in scale.iloc[0])
+    return df_chart, {"total": int(total), "avg_fields": int(avg_fields)}
+
+# 5. ДОЩОВІ ПЕРІОДИ (ЯК analytics.rain_matrices)
+@st.cache_data(show_spinner=False, max_entries=64)
+def rain_matrices(version, selection, heavy_mm=analytics.RAIN_HEAVY_MM, any_mm=analytics.RAIN_ANY_MM):
+    """Чотири матриці рік × декада з денних середніх опадів вибору — одним запитом над партиціями.
+
+    Серії дощових днів — «gaps and islands»: нова серія починається з дощового дня після
+    сухого в тій самій декаді, номер серії — наростаюча сума початків.
+    """
+    daily, params = _daily_sql(selection, ['precipitation'])
+    cell = "PARTITION BY year_str, month, decade ORDER BY plot_date"
+    sql = f"""
+        WITH days AS (
+            SELECT year_str, month, decade, plot_date, precipitation AS rain,
+                   coalesce(precipitation > ?, FALSE) AS rainy
+            FROM ({daily})),
+        flagged AS (
+            SELECT *, rainy AND NOT coalesce(lag(rainy) OVER ({cell}), FALSE) AS starts FROM days),
+        runs AS (
+            SELECT *, sum(starts::INT) OVER ({cell}) AS run FROM flagged),
+        streaks AS (
+            SELECT year_str, month, decade, max(days) AS streak FROM (
+                SELECT year_str, month, decade, run, count(*) AS days FROM runs WHERE rainy
+                GROUP BY year_str, month, decade, run)
+            GROUP BY year_str, month, decade)
+        SELECT year_str, month, decade,
+               sum(coalesce(rain, 0)) AS sum,
+               count(*) FILTER (WHERE rain > ?) AS heavy,
+               count(*) FILTER (WHERE rainy) AS rainy,
+               coalesce(any_value(streak), 0) AS streak
+        FROM days LEFT JOIN streaks USING (year_str, month, decade)
+        GROUP BY year_str, month, decade"""
+    # Параметри — у порядку появи «?»: поріг дощового дня, фільтри вибору, поріг сильного дощу
+    df = query(sql, [any_mm] + params + [heavy_mm])
+
+    years = sorted(df['year_str'].unique())
+    period = (df['month'].to_numpy() - 1) * 3 + df['decade'].to_numpy() - 1
+    row = np.searchsorted(years, df['year_str'].to_numpy())
+    present = np.unique(period)
+    labels = np.array(analytics.period_labels())[present]
+
+    def to_frame(col):
+        values = np.zeros((len(years), analytics.N_PERIODS))
+        values[row, period] = df[col].to_numpy(dtype=float)
+        return pd.DataFrame(values[:, present], index=pd.Index(years, name='year_str'),
+                            columns=pd.Index(labels, name='Період'))
+
+    return {name: to_frame(name) for name in ['sum', 'heavy', 'rainy', 'streak']}
+
+# 6. ЗВЕДЕННЯ ПО ПОЛЯХ: ФІЛЬТР, ПОШУК, СОРТУВАННЯ, СТОРІНКА
+class SummaryQuery:
+    """Вибір сайдбару у зведенні по полях як SQL над FIELD_SUMMARY_FILE.
+
+    Той самий інтерфейс, що й зведення в пам'яті на сторінці таблиць: columns, total,
+    count(query) і page(...). Порядок — як у pandas: стабільне сортування за колонкою
+    (порожні — в кінці), при рівності — за SUMMARY_KEYS, як відсортований файл.
+    Конструктор виконує перший запит, тож недоступний рушій видно одразу (run -> pandas).
+    """
+
+    def __init__(self, version, selection):
+        self.version = version
+        self.source = f"read_parquet({_literal(utils.FIELD_SUMMARY_FILE)})"
+        names = query(f"DESCRIBE SELECT * FROM {self.source}")['column_name'].tolist()
+        self.columns = utils.summary_columns(names)
+        self.keys = [c for c in utils.SUMMARY_KEYS if c in names]
+        self.where, self.params = _where(selection)
+        self.total = self.count('')
+
+    def _filter(self, search):
+        if not search:
+            return self.where, self.params
+        clause = "contains(lower(\"Поле\"), lower(?))"
+        return (f"{self.where} AND {clause}" if self.where else f"WHERE {clause}"), self.params + [search]
+
+    def count(self, search):
+        where, params = self._filter(search)
+        return int(query(f"SELECT count(*) AS n FROM {self.source} {where}", params)['n'].iloc[0])
+
+    def page(self, search, sort_col=None, descending=False, start=0, stop=None):
+        where, params = self._filter(search)
+        order = [_ident(k) for k in self.keys]
+        if sort_col is not None:
+            expr = _ident(sort_col)
+            if 'мороз' in sort_col.lower():
+                expr = f"try_strptime({expr}, '%d.%m.%Y')"          # Дати морозів зберігаються текстом
+            order.insert(0, f"{expr} {'DESC' if descending else 'ASC'} NULLS LAST")
+        limit = f" LIMIT {int(stop) - int(start)} OFFSET {int(start)}" if stop is not None else \
+            (f" OFFSET {int(start)}" if start else "")
+        cols = ", ".join(_ident(c) for c in self.columns)
+        df = query(f"SELECT {cols} FROM {self.source} {where} ORDER BY {', '.join(order)}{limit}", params)
+        return df.astype({c: ('int16' if c == 'Рік' else 'category') for c in self.keys})
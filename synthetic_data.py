@@ -0,0 +1,108 @@
+"""Синтетичні дані у форматі WEB_AGG_DATA / WEB_FIELD_SUMMARY для бенчмарків і перевірки масштабу.
+
+Генерує сирі щоденні ряди по полях (поля × роки, розкладені по кластерах, блоках і
+культурах із сівозміною) і проганяє їх через ті самі функції, що й precompute_summary.py,
+тож вихідні файли мають реальну схему і типи.
+
+    python synthetic_data.py out_dir --fields 500 --years 10 --clusters 6 --cultures 5
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import utils
+import field_store
+import precompute_summary as pre
+
+# 1. КОНСТАНТИ
+CULTURES = ['Пшениця озима', 'Кукурудза', 'Соняшник', 'Соя', 'Ріпак озимий', 'Ячмінь ярий',
+            'Горох', 'Буряк цукровий']
+RAIN_PROB = 0.3             # Ймовірність дощового дня в кластері
+
+# 2. ГЕНЕРАЦІЯ СИРИХ ЩОДЕННИХ ДАНИХ
+def generate_raw(fields=100, years=5, clusters=4, blocks=3, cultures=4, seed=0):
+    """Сирі щоденні дані (колонки precompute_summary.RAW_COLS) для fields × years.
+
+    Поле i належить кластеру i % clusters і одному з його блоків; культура
+    змінюється щороку (сівозміна). Погода спільна для кластера (сезонний хід +
+    шум), кожне поле має невеликий власний зсув температури та опадів.
+    """
+    rng = np.random.default_rng(seed)
+    last = int(utils.ETALON_YEAR)
+    field_ids = np.arange(fields)
+    cluster = field_ids % clusters
+    block = (field_ids // clusters) % blocks
+    names = np.array([f"F{c + 1:02d}{b + 1:02d}_{i:05d}" for i, c, b in zip(field_ids, cluster, block)])
+    t_shift = rng.normal(0, 0.7, fields)
+    rain_k = rng.uniform(0.8, 1.2, fields)
+
+    parts = []
+    for year in range(last - years + 1, last + 1):
+        dates = pd.date_range(f"{year}-01-01", f"{year}-12-31")
+        doy = dates.dayofyear.to_numpy()
+        season = 9 - 13 * np.cos(2 * np.pi * (doy - 15) / 365.25)
+        # Погода кластера: кластер × день
+        t_cl = season + rng.normal(0, 1.5, clusters)[:, None] + rng.normal(0, 3, (clusters, len(doy)))
+        rain_cl = np.where(rng.random((clusters, len(doy))) < RAIN_PROB,
+                           rng.gamma(1.2, 4.5, (clusters, len(doy))), 0)
+
+        # Поле × день
+        mean = t_cl[cluster] + t_shift[:, None] + rng.normal(0, 0.5, (fields, len(doy)))
+        amp = rng.uniform(4, 7, (fields, len(doy)))
+        rain = np.round(rain_cl[cluster] * rain_k[:, None], 1)
+        parts.append(pd.DataFrame({
+            'Поле': np.repeat(names, len(doy)),
+            'Cluster': np.repeat([f"Кластер {c + 1}" for c in cluster], len(doy)),
+            'Block': np.repeat([f"Блок {c + 1}.{b + 1}" for c, b in zip(cluster, block)], len(doy)),
+            'Culture': np.repeat(np.array(CULTURES)[(field_ids + year) % cultures % len(CULTURES)], len(doy)),
+            'date': np.tile(dates.to_numpy(), fields),
+            'min': np.round(mean - amp, 1).ravel(),
+            'max': np.round(mean + amp, 1).ravel(),
+            'mean': np.round(mean, 1).ravel(),
+            'precipitation': rain.ravel(),
+        }))
+    raw = pd.concat(parts, ignore_index=True)
+    return raw.astype({c: 'category' for c in ['Поле', 'Cluster', 'Block', 'Culture']})
+
+# 3. ЗАПИС ДАТАСЕТУ
+def write_dataset(out_dir, fields=100, years=5, clusters=4, blocks=3, cultures=4, seed=0, raw_out=False):
+    """WEB_AGG_DATA, WEB_FIELD_SUMMARY, WEB_FIELD_DAILY та WEB_FIELD_STORE (і за бажанням сирі дані) у out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    raw = generate_raw(fields, years, clusters, blocks, cultures, seed)
+    if raw_out:
+        raw.to_parquet(os.path.join(out_dir, 'raw_daily.parquet'), index=False)
+
+    raw['Рік'] = raw['date'].dt.year
+    daily = pre.compute_cumulative(raw)
+    pre._write_summary(pre.summarize_fields(daily), os.path.join(out_dir, utils.FIELD_SUMMARY_FILE))
+    pq.write_table(pre.field_daily_table(daily), os.path.join(out_dir, utils.FIELD_DAILY_FILE))
+    field_store.build([daily.drop(columns='Рік')], os.path.join(out_dir, utils.FIELD_STORE_FILE))
+
+    agg = pre.aggregate_days(daily).sort_values(['date'] + pre.AGG_DIMS[:-1], ignore_index=True)
+    # Виміри — рядками, як у робочому WEB_AGG_DATA.parquet
+    agg[pre.AGG_DIMS[:-1]] = agg[pre.AGG_DIMS[:-1]].astype(str)
+    agg.to_parquet(os.path.join(out_dir, utils.FILE_TO_LOAD), index=False)
+    return {'raw_rows': len(raw), 'agg_rows': len(agg), 'field_years': fields * years}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетичні WEB_AGG_DATA та WEB_FIELD_SUMMARY.")
+    parser.add_argument('out_dir', help="Тека для файлів")
+    parser.add_argument('--fields', type=int, default=100)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--clusters', type=int, default=4)
+    parser.add_argument('--blocks', type=int, default=3, help="Блоків у кожному кластері")
+    parser.add_argument('--cultures', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--raw', action='store_true', help="Зберегти також сирі дані (raw_daily.parquet)")
+    args = parser.parse_args()
+    info = write_dataset(args.out_dir, args.fields, args.years, args.clusters, args.blocks,
+                         args.cultures, args.seed, args.raw)
+    print(f"Готово: {args.out_dir} — {info['agg_rows']} рядків агрегатів, {info['field_years']} полів-років")
+
+
+if __name__ == '__main__':
+    main()
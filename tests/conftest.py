@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+import streamlit as st
+
+# Модулі застосунку лежать у корені репозиторію (без пакета)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import precompute_summary as pre  # noqa: E402
+import synthetic_data  # noqa: E402
+import utils  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Партиціонований датасет із синтетичних даних у тимчасовій теці (шляхи utils — відносні)."""
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()                                      # Куби років кешуються за хешем партиції
+    st.cache_data.clear()
+    raw = synthetic_data.generate_raw(fields=12, years=3, clusters=3, blocks=2, cultures=2, seed=3)
+    raw['Рік'] = raw['date'].dt.year
+    agg = pre.aggregate_days(pre.compute_cumulative(raw))
+    agg.to_parquet(utils.FILE_TO_LOAD, index=False)
+    utils.sync_store()
+    return utils.read_manifest()
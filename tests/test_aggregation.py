@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregation
+import utils
+
+METRICS = ['min', 'max']
+
+
+def _selections(manifest):
+    years = sorted(int(y) for y in manifest['years'])
+    clusters = sorted(utils.read_store(columns=['Cluster'])['Cluster'].unique().tolist())
+    return [
+        {'year': years},
+        {'year': years[-1:]},
+        {'year': years, 'Cluster': clusters[:1]},
+        {'year': years[:2], 'Cluster': clusters[1:], 'Culture': ['Кукурудза']},
+    ]
+
+
+def _plain(chart):
+    categories = [c for c in chart.columns if isinstance(chart[c].dtype, pd.CategoricalDtype)]
+    return chart.astype({c: str for c in categories}).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('with_sidecars', [False, True])
+def test_selection_cube_matches_full_cube(store, with_sidecars):
+    full = aggregation.Cube(aggregation.build_cube(utils.read_store(), METRICS))
+    if with_sidecars:
+        aggregation.load_cube(store['version'], tuple(METRICS))      # Пише sidecar-куби років
+        assert utils.read_sidecar(utils.partition_path(*min(store['years'].items())), 'cube') is not None
+    for selection in _selections(store):
+        cube = aggregation.selection_cube(store['version'], selection, tuple(METRICS))
+        expected, scale = aggregation.build_chart(full, selection, METRICS)
+        chart, got_scale = aggregation.build_chart(cube, selection, METRICS)
+        # Словники категорій — лише прочитаних років, значення ті самі
+        pd.testing.assert_frame_equal(_plain(chart), _plain(expected))
+        assert got_scale == scale
+
+
+def _baseline(df, selection, metrics, weighted=False):
+    """Розрахунок до куба: groupby по відфільтрованих рядках (зважене — на field_count)."""
+    mask = np.ones(len(df), dtype=bool)
+    for dim, vals in selection.items():
+        mask &= df[dim].isin(vals).to_numpy()
+    df_f = df[mask]
+    if weighted:
+        w = df_f['field_count'].astype('float64')
+        parts = {m: (df_f[m] * w) for m in metrics} | {f"{m}__w": w.where(df_f[m].notna()) for m in metrics}
+        sums = pd.DataFrame(parts).join(df_f[aggregation.GROUP_COLS]).groupby(aggregation.GROUP_COLS, observed=True).sum()
+        chart = pd.DataFrame({m: sums[m] / sums[f"{m}__w"] for m in metrics})
+        chart['field_count'] = df_f.groupby(aggregation.GROUP_COLS, observed=True)['field_count'].mean()
+    else:
+        chart = df_f.groupby(aggregation.GROUP_COLS, observed=True)[metrics + ['field_count']].mean()
+    chart = chart.reset_index().sort_values('plot_date')
+    for m in metrics:
+        chart[f"Avg_{m}"] = chart.groupby('plot_date')[m].transform('mean')
+    yearly_max = df_f.groupby(['year', 'plot_date'])['field_count'].sum().groupby('year').max()
+    return chart, {"total": int(yearly_max.sum()), "avg_fields": int(yearly_max.mean())}
+
+
+def _assert_chart(cube, df, selection, weighted=False):
+    chart, scale = aggregation.build_chart(cube, selection, METRICS, weighted=weighted)
+    expected, expected_scale = _baseline(df, selection, METRICS, weighted=weighted)
+    keys = ['plot_date', 'year_str']
+    got = _plain(chart).sort_values(keys, ignore_index=True)
+    pd.testing.assert_frame_equal(got, _plain(expected)[got.columns].sort_values(keys, ignore_index=True),
+                                  check_dtype=False, atol=1e-4, rtol=1e-5)
+    assert scale == expected_scale
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+def test_build_chart_matches_groupby_mean(store, weighted):
+    df = utils.read_store()
+    cube = aggregation.load_cube(store['version'], tuple(METRICS))
+    for selection in _selections(store):
+        _assert_chart(cube, df, selection, weighted)
+
+
+def test_cube_sidecars_rebuilt_only_for_changed_year(store, monkeypatch):
+    aggregation.load_cube(store['version'], tuple(METRICS))
+    built = []
+    build_cube = aggregation.build_cube
+    monkeypatch.setattr(aggregation, 'build_cube', lambda df, m: built.append(sorted(df['year'].unique())) or build_cube(df, m))
+
+    year = max(map(int, store['years']))
+    df = utils.read_store(years=[year])
+    day = df[df['plot_date'] == df['plot_date'].max()].drop(columns=['plot_date', 'year_str'])
+    day['min'] = day['min'] + 3.0
+    utils.append_days(day)
+    manifest = utils.read_manifest()
+    assert manifest['version'] != store['version']
+
+    cube = aggregation.load_cube(manifest['version'], tuple(METRICS))
+    assert built == [[year]]                                       # Незмінені роки — з sidecar-файлів
+    for selection in _selections(manifest):
+        _assert_chart(cube, utils.read_store(), selection)
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+
+
+def _chart(values, start='2024-01-01'):
+    """df_chart з кривими {рік: [значення по днях]} на осі PLOT_YEAR_START."""
+    rows = []
+    for year, series in values.items():
+        dates = pd.date_range(start, periods=len(series))
+        for date, value in zip(dates, series):
+            rows.append({'year_str': year, 'plot_date': date, 'month': date.month,
+                         'decade': min((date.day - 1) // 10 + 1, 3), 'precipitation': value, 'min': value})
+    df = pd.DataFrame(rows)
+    df['year_str'] = df['year_str'].astype('category')
+    return df
+
+
+def _rain_reference(df, heavy_mm, any_mm):
+    """Наївний розрахунок: groupby по року й декаді, серії — циклом у межах декади."""
+    df = df.sort_values(['year_str', 'plot_date']).assign(
+        Період=lambda d: [f"{m:02d}-{k}" for m, k in zip(d['month'], d['decade'])])
+    out = {k: {} for k in ['sum', 'heavy', 'rainy', 'streak']}
+    for (year, period), g in df.groupby(['year_str', 'Період'], observed=True):
+        rain = g['precipitation'].to_numpy(dtype=float)
+        best = run = 0
+        for r in rain:
+            run = run + 1 if r > any_mm else 0
+            best = max(best, run)
+        for kind, value in [('sum', np.nansum(rain)), ('heavy', (rain > heavy_mm).sum()),
+                            ('rainy', (rain > any_mm).sum()), ('streak', best)]:
+            out[kind][(year, period)] = float(value)
+    return {k: pd.Series(v).unstack() for k, v in out.items()}
+
+
+def test_rain_matrices_match_groupby():
+    rng = np.random.default_rng(1)
+    rain = rng.choice([0.0, 0.5, 2.0, 6.0], size=(3, 200), p=[0.5, 0.2, 0.2, 0.1])
+    rain[1, 17:19] = np.nan
+    df = _chart({'2022': rain[0], '2023': rain[1], '2024': rain[2]})
+    got = analytics.rain_matrices(df)
+    expected = _rain_reference(df, analytics.RAIN_HEAVY_MM, analytics.RAIN_ANY_MM)
+    for kind, frame in expected.items():
+        np.testing.assert_allclose(got[kind].to_numpy(), frame.loc[got[kind].index, got[kind].columns].to_numpy())
+
+
+def test_rain_streak_split_at_decade_boundary_and_all_nan_year():
+    # 8–13 січня дощові: серія перетинає межу декад 1 і 2 — рахується окремо в кожній
+    wet = [0.0] * 7 + [1.0] * 6 + [0.0] * 7
+    df = _chart({'2023': wet, '2024': [np.nan] * 20})
+    got = analytics.rain_matrices(df)
+    assert got['streak'].loc['2023', ['01-1', '01-2']].tolist() == [3, 3]
+    assert got['rainy'].loc['2023', ['01-1', '01-2']].tolist() == [3, 3]
+    for kind in ['sum', 'heavy', 'rainy', 'streak']:
+        assert (got[kind].loc['2024'] == 0).all()
+
+
+def _standardized(df, metric='min'):
+    X = df.pivot(index='year_str', columns='plot_date', values=metric).to_numpy(dtype=float)
+    return (X - np.nanmean(X)) / np.nanstd(X)
+
+
+def test_similarity_endpoint_hand_computed():
+    df = _chart({'2023': [1.0, 4.0], '2024': [2.0, 5.0], '2025': [np.nan, np.nan]})
+    sim = analytics.similarity_matrix(df, ['min'], 'endpoint')
+    # Максимуми 4 і 5: |4 - 5| / 5 = 0.2 і |5 - 4| / 4 = 0.25
+    assert sim.loc['2023', '2024'] == pytest.approx(80.0)
+    assert sim.loc['2024', '2023'] == pytest.approx(75.0)
+    assert sim.loc['2023', '2023'] == pytest.approx(100.0)
+    assert (sim.loc['2025'] == 0).all()
+
+
+@pytest.mark.parametrize('method', ['euclidean', 'correlation'])
+def test_similarity_curves_match_pairwise_loop(method):
+    rng = np.random.default_rng(2)
+    curves = {str(y): rng.normal(size=60).cumsum() for y in range(2020, 2025)}
+    curves['2024'][40:] = np.nan                                  # Поточний рік — до "сьогодні"
+    curves['2019'] = np.full(60, np.nan)                          # Рік без даних
+    df = _chart(curves)
+    sim = analytics.similarity_matrix(df, ['min'], method)
+    Z, years = _standardized(df), sorted(curves)
+    for i, a in enumerate(years):
+        for j, b in enumerate(years):
+            common = ~np.isnan(Z[i]) & ~np.isnan(Z[j])
+            if common.sum() < 2:
+                expected = 0.0
+            elif method == 'euclidean':
+                expected = 100 / (1 + np.sqrt(np.mean((Z[i, common] - Z[j, common]) ** 2)))
+            else:
+                expected = 50 * (1 + np.corrcoef(Z[i, common], Z[j, common])[0, 1])
+            assert sim.loc[a, b] == pytest.approx(expected, abs=1e-6), (a, b)
+
+
+def _dtw_reference(a, b, window):
+    T = len(a)
+    D = np.full((T + 1, T + 1), np.inf)
+    D[0, 0] = 0
+    for t in range(1, T + 1):
+        for u in range(max(1, t - window), min(T, t + window) + 1):
+            D[t, u] = abs(a[t - 1] - b[u - 1]) + min(D[t - 1, u - 1], D[t - 1, u], D[t, u - 1])
+    return D[T, T] / T
+
+
+def test_dtw_band_one_and_full_matrix():
+    rng = np.random.default_rng(3)
+    curves = rng.normal(size=(4, 30)).cumsum(axis=1)
+    curves[3] = np.roll(curves[0], 3)                             # Той самий рік, зсунутий на 3 дні
+    df = _chart({str(2021 + i): c for i, c in enumerate(curves)})
+    years, Z, mask = analytics._trajectories(df, ['min'])
+    band = analytics._dtw_distances(Z, mask, 1)[..., 0]
+    full = analytics._dtw_distances(Z, mask, Z.shape[1])[..., 0]
+    for i in range(4):
+        for j in range(4):
+            a, b = Z[i, :, 0], Z[j, :, 0]
+            assert band[i, j] == pytest.approx(0.0 if i == j else _dtw_reference(a, b, 1))
+            assert full[i, j] == pytest.approx(0.0 if i == j else _dtw_reference(a, b, len(a)))
+            assert full[i, j] <= band[i, j] + 1e-12
+    # Повна матриця вирівнює зсув, смуга ± 1 день — ні
+    assert full[0, 3] < band[0, 3]
@@ -0,0 +1,38 @@
+import pandas as pd
+
+import aggregation
+import batch_reports
+import climatology
+import precompute_summary as pre
+import synthetic_data
+import utils
+
+
+def _worker_state(years, out_dir):
+    """Стан виконавця batch_reports (_init_worker) на кубі з невеликих синтетичних даних."""
+    raw = synthetic_data.generate_raw(fields=8, years=3, clusters=2, blocks=1, cultures=2)
+    raw['Рік'] = raw['date'].dt.year
+    df = utils.prepare_data(pre.aggregate_days(pre.compute_cumulative(raw)))
+    df = df.astype({c: 'category' for c in ['year_str', 'Cluster', 'Block', 'Culture']})
+    metrics = list(utils.get_metrics_dict().values())
+    cube = aggregation.Cube(aggregation.build_cube(df, metrics))
+    options = {'out_dir': str(out_dir), 'plotlyjs': 'cdn', 'full_res': False, 'point_budget': utils.POINT_BUDGET}
+    return {'cube': cube, 'climate': climatology.Climatology(climatology.build_climatology(cube.frame, metrics)),
+            'metrics': metrics, 'options': options, 'colors': utils.get_colors(cube.frame), 'years': years}
+
+
+def test_report_without_etalon_year(tmp_path, monkeypatch):
+    years = [y for y in _worker_state([], tmp_path)['cube'].index.values('year') if str(y) != utils.ETALON_YEAR]
+    monkeypatch.setattr(batch_reports, '_worker', _worker_state(years, tmp_path))
+    row = batch_reports.render_report('cluster_1', "Кластер 1", {'Cluster': ["Кластер 1"]})
+    assert row['path'] == 'cluster_1/report.html'
+    similarity = pd.read_parquet(tmp_path / 'cluster_1' / 'similarity.parquet')
+    assert len(similarity)
+
+
+def test_failed_report_goes_to_index(tmp_path):
+    rows = [{'slug': 'all', 'title': "Усі", 'rows': 1, 'fields_years': 5, 'path': 'all/report.html'},
+            batch_reports._failed_row('bad', "Поганий", TypeError("boom"))]
+    index = batch_reports._write_index(str(tmp_path), rows)
+    assert index.set_index('slug').loc['bad', 'error'] == "TypeError: boom"
+    assert "Поганий — помилка: TypeError: boom" in (tmp_path / 'index.html').read_text(encoding='utf-8')
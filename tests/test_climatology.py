@@ -0,0 +1,29 @@
+import pandas as pd
+
+import climatology
+import utils
+
+
+def _chart(years, metric='min'):
+    dates = pd.date_range(utils.PLOT_YEAR_START, periods=3)
+    df = pd.DataFrame([(y, d, d.strftime('%d-%b'), float(i)) for y in years for i, d in enumerate(dates)],
+                      columns=['year_str', 'plot_date', 'hover_date', metric])
+    df['year_str'] = df['year_str'].astype('category')           # Як у df_chart: невпорядкована категорія
+    return df
+
+
+def _climate(metric='min'):
+    dates = pd.date_range(utils.PLOT_YEAR_START, periods=3)
+    stats = {s: 1.0 for s in climatology.STATS}
+    return pd.DataFrame([{'Cluster': climatology.ALL, 'Culture': climatology.ALL, 'metric': metric,
+                          'plot_date': d} | stats for d in dates])
+
+
+def test_anomaly_text_without_etalon_year():
+    text = climatology.anomaly_text(_chart(['2023', '2022']), _climate(), 'min')
+    assert text.startswith("Аномалія 2023 на ")
+
+
+def test_anomaly_text_prefers_etalon_year():
+    text = climatology.anomaly_text(_chart(['2023', utils.ETALON_YEAR]), _climate(), 'min')
+    assert text.startswith(f"Аномалія {utils.ETALON_YEAR} на ")
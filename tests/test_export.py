@@ -0,0 +1,48 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+import utils
+
+FORMATS = ["CSV", "CSV (gzip)", "Parquet"]
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'Поле': ['F1', 'F2', None], 'значення': [1.5, None, 3.0]})
+
+
+def _bytes(handle):
+    with handle:
+        return handle.read()
+
+
+def _read(data, fmt):
+    if fmt == "Parquet":
+        return pd.read_parquet(io.BytesIO(data))
+    return pd.read_csv(io.BytesIO(gzip.decompress(data) if fmt == "CSV (gzip)" else data))
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_export_cached_on_disk(tmp_path, monkeypatch, df, fmt):
+    monkeypatch.setattr(utils, 'EXPORT_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setattr(utils, 'get_data_version', lambda: 'v1')
+    handle = utils.export_file(df, ('t',), fmt)
+    files = list((tmp_path / 'exports').iterdir())
+    assert len(files) == 1
+    assert isinstance(handle, io.BufferedReader) and handle.name == str(files[0])   # Файл, а не байти в пам'яті
+    data = _bytes(handle)
+    assert _bytes(utils.export_file(df, ('t',), fmt)) == data
+    pd.testing.assert_frame_equal(_read(data, fmt), df, check_dtype=False)
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_export_without_writable_disk(tmp_path, monkeypatch, df, fmt):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')                               # Тека кешу всередині файлу — makedirs падає з OSError
+    monkeypatch.setattr(utils, 'EXPORT_DIR', str(blocker / 'exports'))
+    monkeypatch.setattr(utils, 'get_data_version', lambda: 'v1')
+    data = _bytes(utils.export_file(df, ('t',), fmt))
+    pd.testing.assert_frame_equal(_read(data, fmt), df, check_dtype=False)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import filters
+
+ALL = "Всі"
+
+
+def _frame(rng, n=2000):
+    df = pd.DataFrame({
+        'year': rng.choice([2021, 2022, 2023, 2024], n).astype('int16'),
+        'Cluster': rng.choice(['К1', 'К2', 'К3'], n),
+        'Block': rng.choice(['Б1', 'Б2', 'Б3', 'Б4'], n),
+        'Culture': rng.choice(['Пшениця', 'Соняшник', 'Кукурудза'], n),
+    })
+    # Частина комбінацій відсутня — перетини бувають порожніми
+    df = df[~((df['Cluster'] == 'К3') & (df['Culture'] == 'Соняшник'))]
+    return df.astype({c: 'category' for c in filters.FILTER_DIMS[1:]}).reset_index(drop=True)
+
+
+def _pick(rng, values):
+    """Випадковий вибір мультиселекту: "Всі", порожній список або підмножина значень."""
+    kind = rng.integers(5)
+    if kind == 0:
+        return [ALL]
+    if kind == 1:
+        return []
+    return rng.choice(values, rng.integers(1, len(values) + 1), replace=False).tolist()
+
+
+def _mask(df, selection):
+    mask = np.ones(len(df), dtype=bool)
+    for dim, vals in selection.items():
+        mask &= df[dim].isin(vals).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lookup_matches_boolean_mask(seed):
+    rng = np.random.default_rng(seed)
+    df = _frame(rng)
+    index = filters.FilterIndex(df)
+    for _ in range(50):
+        years = rng.choice(index.values('year'), rng.integers(1, 5), replace=False).tolist()
+        picks = [_pick(rng, index.values(dim)) for dim in filters.FILTER_DIMS[1:]]
+        selection = filters.as_selection(years, *picks)
+        np.testing.assert_array_equal(index.lookup(selection), np.flatnonzero(_mask(df, selection)))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_options_match_boolean_mask(seed):
+    rng = np.random.default_rng(seed)
+    df = _frame(rng)
+    index = filters.FilterIndex(df)
+    for _ in range(50):
+        selection = {}
+        for dim in filters.FILTER_DIMS:
+            expected = sorted(df.loc[_mask(df, selection), dim].unique().tolist())
+            assert index.options(dim, selection) == expected
+            pick = _pick(rng, index.values(dim))
+            if ALL not in pick:
+                selection[dim] = pick
+
+
+def test_all_and_empty_selections():
+    df = _frame(np.random.default_rng(0))
+    index = filters.FilterIndex(df)
+    years = index.values('year')
+    np.testing.assert_array_equal(index.lookup(filters.as_selection(years, [ALL], [ALL], [ALL])), np.arange(len(df)))
+    assert index.lookup(filters.as_selection(years, ['К3'], [ALL], ['Соняшник'])).size == 0
+    assert index.lookup(filters.as_selection(years, [], [ALL], [ALL])).size == 0
+    assert index.lookup({'Cluster': ['немає']}).size == 0
+    assert index.options('Culture', {'Cluster': ['К3']}) == ['Кукурудза', 'Пшениця']
+    assert index.options('Block', {'Cluster': []}) == []
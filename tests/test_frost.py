@@ -0,0 +1,32 @@
+import json
+
+import pandas as pd
+
+import frost
+from pages import analytics_page
+
+
+def _events():
+    return pd.DataFrame({
+        'Рік': [2025, 2025, 2024],
+        'Останній весняний мороз': pd.to_datetime(['2025-04-10', '2025-04-10', '2024-04-10']),
+        'Перший осінній мороз': pd.to_datetime(['2025-10-01', None, '2024-10-01']),
+        'Безморозний період, днів': [174, None, 174],
+        'Днів з морозом': [3, 2, 3],
+        'Подій морозу': [1, 1, 1],
+        'Найдовша серія, днів': [2, 2, 2],
+        'Градусо-години нижче порогу': [5.0, 4.0, 5.0],
+    })
+
+
+def test_yearly_summary_labels_non_leap_dates():
+    summary = frost.yearly_summary(_events())
+    assert summary.loc[2025, 'Ост. весняний (медіана)'] == '10.04'
+    assert summary.loc[2025, 'Перший осінній (медіана)'] == '01.10'
+    assert summary.loc[2024, 'Ост. весняний (медіана)'] == '10.04'
+
+
+def test_frost_dates_figure_non_leap_axis():
+    fig = analytics_page.frost_dates_figure(_events())
+    dates = {pd.Timestamp(d).strftime('%m-%d') for trace in json.loads(fig.to_json())['data'] for d in trace['y']}
+    assert dates == {'04-10', '10-01'}
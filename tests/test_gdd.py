@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+import gdd
+
+
+def test_grouped_cumsum_resets_per_group():
+    values = np.array([1.0, 2.0, 3.0, 10.0, 20.0, 5.0, 0.0, 7.0])
+    group_start = np.array([True, False, False, True, False, True, True, False])
+    np.testing.assert_allclose(gdd.grouped_cumsum(values, group_start), [1, 3, 6, 10, 30, 5, 0, 7])
+
+
+def test_grouped_cumsum_matches_groupby_cumsum():
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(1, 40, size=200)                         # Серед груп є й однорядкові
+    group = np.repeat(np.arange(len(sizes)), sizes)
+    values = rng.uniform(0, 15, size=len(group))
+    group_start = np.r_[True, group[1:] != group[:-1]]
+    expected = pd.Series(values).groupby(group).cumsum().to_numpy()
+    np.testing.assert_allclose(gdd.grouped_cumsum(values, group_start), expected, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+import field_store
+import utils
+
+
+def test_plot_date_non_leap_march_first():
+    dates = pd.Series(pd.to_datetime(['2025-02-28', '2025-03-01', '2024-02-29', '2024-03-01', '2025-12-31']))
+    expected = pd.to_datetime(['2024-02-28', '2024-03-01', '2024-02-29', '2024-03-01', '2024-12-31'])
+    assert (utils.to_plot_date(dates) == expected).all()
+
+
+def test_plot_doy_keeps_missing_dates():
+    assert np.isnan(utils.plot_doy(pd.Series(pd.to_datetime(['2025-03-01', None])))[1])
+
+
+def test_field_store_series_matches_prepare_data(tmp_path):
+    dates = pd.date_range('2024-02-27', '2025-03-03')
+    daily = pd.DataFrame({'Поле': 'F1', 'Cluster': 'C1', 'Block': 'B1', 'Culture': 'Соя',
+                          'date': dates, 'min': np.arange(len(dates), dtype=float)})
+    path = str(tmp_path / 'store.arrow')
+    field_store.build([daily], path)
+    series = field_store.FieldStore(path).series('F1')
+    march_first = series[series['date'] == '2025-03-01']
+    assert march_first['plot_date'].iloc[0] == pd.Timestamp('2024-03-01')
+    prepared = utils.prepare_data(pd.DataFrame({'date': dates, 'year': dates.year}))
+    assert (series['plot_date'].to_numpy() == prepared['plot_date'].to_numpy()).all()
@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+import pytest
+
+import field_store
+import precompute_summary as pre
+import synthetic_data
+
+OUTPUTS = {'agg': ['date', 'Cluster', 'Block', 'Culture'], 'summary': pre.KEY_COLS, 'daily': ['Поле', 'date']}
+
+
+def _raw(years=2):
+    raw = synthetic_data.generate_raw(fields=6, years=years, clusters=2, blocks=1, cultures=2)
+    return raw.astype({c: str for c in ['Поле', 'Cluster', 'Block', 'Culture']})
+
+
+def _run(raw, root, name, full=False):
+    """Запуск пайплайна з окремою текою стану name; повертає шляхи виходів."""
+    raw_path = os.path.join(root, 'raw.parquet')
+    raw.to_parquet(raw_path, index=False)
+    paths = {k: os.path.join(root, f"{name}_{k}.parquet") for k in OUTPUTS} | {'store': os.path.join(root, f"{name}.arrow")}
+    pre.run(raw_path, paths['agg'], paths['summary'], os.path.join(root, f"state_{name}"), workers=1,
+            n_buckets=3, full=full, field_daily_out=paths['daily'], field_store_out=paths['store'])
+    return paths
+
+
+def _frame(path, keys):
+    df = pd.read_parquet(path)
+    df = df.astype({c: str for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return df.sort_values(keys, ignore_index=True)
+
+
+def _assert_same(paths, expected):
+    for kind, keys in OUTPUTS.items():
+        pd.testing.assert_frame_equal(_frame(paths[kind], keys), _frame(expected[kind], keys), check_dtype=False)
+    store, full = field_store.FieldStore(paths['store']), field_store.FieldStore(expected['store'])
+    assert store.fields() == full.fields()
+    for field in full.fields():
+        pd.testing.assert_frame_equal(store.series(field), full.series(field))
+
+
+def _rebuild(raw, root):
+    return _run(raw, root, 'full', full=True)
+
+
+def test_first_run_matches_in_memory(tmp_path):
+    raw = _raw()
+    paths = _run(raw, str(tmp_path), 'inc')
+    daily = pre.compute_cumulative(raw.assign(Рік=raw['date'].dt.year))
+    summary = pre.summarize_fields(daily).astype({'Рік': 'int32'})
+    pd.testing.assert_frame_equal(_frame(paths['summary'], pre.KEY_COLS),
+                                  summary.sort_values(pre.KEY_COLS, ignore_index=True),
+                                  check_dtype=False, atol=1e-4, rtol=1e-5)
+    agg = pre.aggregate_days(daily)
+    pd.testing.assert_frame_equal(_frame(paths['agg'], OUTPUTS['agg']),
+                                  agg.sort_values(OUTPUTS['agg'], ignore_index=True), check_dtype=False)
+
+
+def test_noop_rerun(tmp_path, capsys):
+    raw = _raw()
+    paths = _run(raw, str(tmp_path), 'inc')
+    stamps = {k: os.stat(p).st_mtime_ns for k, p in paths.items()}
+    _run(raw, str(tmp_path), 'inc')
+    assert "Нічого перераховувати" in capsys.readouterr().out
+    assert stamps == {k: os.stat(p).st_mtime_ns for k, p in paths.items()}
+
+
+def test_changed_field_year(tmp_path):
+    raw = _raw()
+    _run(raw, str(tmp_path), 'inc')
+    field, year = raw['Поле'].iloc[0], raw['date'].dt.year.min()
+    mask = (raw['Поле'] == field) & (raw['date'].dt.year == year)
+    raw.loc[mask, 'min'] -= 5
+    _assert_same(_run(raw, str(tmp_path), 'inc'), _rebuild(raw, str(tmp_path)))
+
+
+def test_added_year(tmp_path):
+    raw = _raw(years=3)
+    first = raw['date'].dt.year.min()
+    _run(raw[raw['date'].dt.year > first], str(tmp_path), 'inc')
+    _assert_same(_run(raw, str(tmp_path), 'inc'), _rebuild(raw, str(tmp_path)))
+
+
+@pytest.mark.parametrize('scope', ['field', 'field_year'])
+def test_removed_only(tmp_path, scope):
+    raw = _raw()
+    _run(raw, str(tmp_path), 'inc')
+    drop = raw['Поле'] == raw['Поле'].iloc[0]
+    if scope == 'field_year':
+        drop &= raw['date'].dt.year == raw['date'].dt.year.max()
+    raw = raw[~drop].reset_index(drop=True)
+    _assert_same(_run(raw, str(tmp_path), 'inc'), _rebuild(raw, str(tmp_path)))
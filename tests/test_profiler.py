@@ -0,0 +1,37 @@
+import tracemalloc
+
+import profiler
+
+
+NBYTES = 8 * 2 ** 20
+
+
+def _bare_peak():
+    """Пік того самого виділення, виміряний tracemalloc напряму (без profiler)."""
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    block = bytearray(NBYTES)
+    del block
+    return tracemalloc.get_traced_memory()[1] - base
+
+
+def test_overlapping_stages_share_peak():
+    tracemalloc.start()
+    try:
+        bare = _bare_peak()
+        outer = profiler._memory_begin()
+        block = bytearray(NBYTES)
+        del block
+        inner = profiler._memory_begin()              # Паралельний етап не скидає пік першого
+        assert profiler._memory_end(inner) >= 0
+        peak = profiler._memory_end(outer)
+        assert peak >= 0.9 * NBYTES
+        assert abs(peak - bare) <= 0.01 * NBYTES
+        assert profiler._memory_active == 0
+    finally:
+        tracemalloc.stop()
+
+
+def test_no_memory_without_tracing():
+    assert not tracemalloc.is_tracing()
+    assert profiler._memory_begin() is None
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+
+import result_cache
+import utils
+
+
+def _frame(n=100, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'plot_date': pd.date_range('2024-01-01', periods=n), 'min': rng.normal(size=n),
+                         'year_str': pd.Categorical(rng.choice(['2024', '2025'], n))})
+
+
+def _compute(value, calls):
+    def compute():
+        calls.append(1)
+        return value
+    return compute
+
+
+@pytest.mark.parametrize('kind', ['frame', 'tuple', 'parts'])
+def test_round_trip(tmp_path, kind):
+    cache = result_cache.ResultCache(str(tmp_path))
+    value = {'frame': _frame(), 'tuple': (_frame(), {'total': 12, 'avg_fields': 4}),
+             'parts': {'sum': _frame(seed=1), 'streak': _frame(seed=2)}}[kind]
+    calls, key = [], ('chart', ('min',), 'v1', ('year', ('2024',)))
+    cache.get_or_compute(key, _compute(value, calls))
+    got = result_cache.ResultCache(str(tmp_path)).get_or_compute(key, _compute(value, calls))
+    assert len(calls) == 1
+    if kind == 'frame':
+        pd.testing.assert_frame_equal(got, value)
+    elif kind == 'tuple':
+        pd.testing.assert_frame_equal(got[0], value[0])
+        assert got[1] == value[1]
+    else:
+        assert list(got) == list(value)
+        for part, frame in value.items():
+            pd.testing.assert_frame_equal(got[part], frame)
+
+
+def test_key_is_stable_across_processes(tmp_path):
+    selection = {'Cluster': ['К2', 'К1'], 'year': [2025, 2024]}
+    key = ('chart', ('min', 'max'), 'a825f6e68f4d0af4') + result_cache.selection_token(selection)
+    code = ("import result_cache; "
+            "s = {'year': [2024, 2025], 'Cluster': ['К1', 'К2']}; "
+            f"print(result_cache.ResultCache({str(tmp_path)!r}).path(('chart', ('min', 'max'), 'a825f6e68f4d0af4')"
+            " + result_cache.selection_token(s)))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True,
+                         env=os.environ | {'PYTHONHASHSEED': '123'})
+    # Інший процес, інший порядок кліків, інший hash seed — той самий файл
+    assert out.stdout.strip().splitlines()[-1] == result_cache.ResultCache(str(tmp_path)).path(key)
+
+
+def test_prune_keeps_recently_used_within_limit(tmp_path):
+    frame = _frame(20_000)
+    cache = result_cache.ResultCache(str(tmp_path), max_mb=1)
+    keys = [('chart', str(i)) for i in range(6)]
+    for i, key in enumerate(keys[:3]):
+        cache.get_or_compute(key, lambda: frame)
+        os.utime(cache.path(key), (1_000 + i, 1_000 + i))
+    size = os.path.getsize(cache.path(keys[0]))
+    cache.get_or_compute(keys[0], lambda: frame)                 # Хіт оновлює час доступу
+    for key in keys[3:]:
+        cache.get_or_compute(key, lambda: frame)
+
+    stats = cache.stats()
+    assert stats['files'] * size <= cache.max_bytes
+    assert os.path.exists(cache.path(keys[0]))
+    assert not os.path.exists(cache.path(keys[1]))
+    assert os.path.exists(cache.path(keys[-1]))
+
+
+def test_stale_tmp_and_broken_files_are_removed(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path))
+    key = ('chart', 'broken')
+    with open(cache.path(key), 'wb') as f:
+        f.write(b'not arrow')
+    tmp = os.path.join(str(tmp_path), 'chart-x.arrow.1234.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(b'partial')
+    os.utime(tmp, (1_000, 1_000))
+    calls = []
+    cache.get_or_compute(key, _compute(_frame(), calls))
+    assert calls == [1]
+    assert cache.stats()['files'] == 1
+    assert not os.path.exists(tmp)
+
+
+def test_dataset_key_without_manifest_uses_content(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, 'sync_store', lambda: None)       # Датасет не створюється (диск лише для читання)
+    st.cache_resource.clear()
+    _frame().to_parquet(utils.FILE_TO_LOAD)
+    selection = {'year': [2024]}
+    key = result_cache.dataset_key(selection)
+
+    os.utime(utils.FILE_TO_LOAD, (1_000, 1_000))                 # Інша репліка: той самий файл, інший mtime
+    st.cache_resource.clear()
+    assert result_cache.dataset_key(selection) == key
+
+    _frame(seed=1).to_parquet(utils.FILE_TO_LOAD)
+    st.cache_resource.clear()
+    assert result_cache.dataset_key(selection) != key
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+import aggregation
+import analytics
+import sql_backend
+import utils
+
+pytest.importorskip('duckdb')
+
+METRICS = ['min', 'max', 'precipitation']
+
+
+@pytest.fixture
+def sql_store(store, monkeypatch):
+    monkeypatch.setenv(sql_backend.BACKEND_ENV, 'duckdb')
+    assert sql_backend.enabled()
+    return store
+
+
+def _selections(manifest):
+    years = sorted(int(y) for y in manifest['years'])
+    return [
+        {'year': years},
+        {'year': years[-1:], 'Cluster': ['Кластер 2']},
+        {'year': years[:2], 'Cluster': ['Кластер 1', 'Кластер 3'], 'Culture': ['Кукурудза']},
+        {'year': years, 'Block': ['Блок 1.1', 'Блок 2.2']},
+    ]
+
+
+def _plain(df):
+    categories = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    df = df.astype({c: str for c in categories})
+    return df.sort_values(['plot_date', 'year_str'], ignore_index=True) if 'plot_date' in df else df
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+def test_build_chart_matches_pandas(sql_store, weighted):
+    cube = aggregation.load_cube(sql_store['version'], tuple(METRICS))
+    for selection in _selections(sql_store):
+        expected, expected_scale = aggregation.build_chart(cube, selection, METRICS, weighted=weighted)
+        chart, scale = sql_backend.build_chart(selection, METRICS, weighted=weighted)
+        assert scale == expected_scale
+        got = _plain(chart)
+        pd.testing.assert_frame_equal(got, _plain(expected)[got.columns], check_dtype=False, atol=1e-4, rtol=1e-5)
+
+
+def test_rain_matrices_match_pandas(sql_store):
+    cube = aggregation.load_cube(sql_store['version'], tuple(METRICS))
+    for selection in _selections(sql_store):
+        df_chart, _ = aggregation.build_chart(cube, selection, METRICS)
+        expected = analytics.rain_matrices(df_chart)
+        got = sql_backend.rain_matrices(sql_store['version'], selection)
+        for kind, frame in expected.items():
+            frame.index = frame.index.astype(str)
+            pd.testing.assert_frame_equal(got[kind], frame, check_dtype=False, check_index_type=False,
+                                          atol=1e-4, rtol=1e-5)
@@ -0,0 +1,76 @@
+import glob
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import precompute_summary as pre
+import synthetic_data
+import utils
+
+
+@pytest.fixture
+def agg(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = synthetic_data.generate_raw(fields=6, years=2, clusters=2, blocks=1, cultures=2, seed=5)
+    raw['Рік'] = raw['date'].dt.year
+    agg = pre.aggregate_days(pre.compute_cumulative(raw))
+    agg.to_parquet(utils.FILE_TO_LOAD, index=False)
+    return agg
+
+
+def _files():
+    return sorted(glob.glob(os.path.join(utils.AGG_STORE_DIR, 'year=*', '*')))
+
+
+def _paths(manifest):
+    return sorted(utils.partition_path(y, d) for y, d in manifest['years'].items())
+
+
+def _new_days(agg, year):
+    """Копія останнього дня року зі зміненим значенням — перезапис рядків однієї партиції."""
+    day = agg[agg['date'] == agg.loc[agg['date'].dt.year == year, 'date'].max()].copy()
+    day['min'] += 1.0
+    return day
+
+
+def test_sync_store_writes_versioned_partitions(agg):
+    manifest = utils.sync_store()
+    assert _files() == _paths(manifest)
+    assert all(os.path.basename(p).startswith('part-') for p in _files())
+    assert len(utils.read_store()) == len(agg)
+
+
+def test_append_days_switches_manifest_then_prunes(agg):
+    first = utils.sync_store()
+    year = max(map(int, first['years']))
+    utils.append_days(_new_days(agg, year))
+    second = utils.read_manifest()
+    assert second['years'][str(year)] != first['years'][str(year)]
+    assert second['years'][str(year - 1)] == first['years'][str(year - 1)]
+    # Файл попереднього маніфесту ще живе (для читачів старої версії)
+    assert _files() == sorted(set(_paths(first) + _paths(second)))
+
+    stale = utils.partition_path(year, first['years'][str(year)])
+    utils.write_sidecar(pd.DataFrame({'x': [1]}), stale, 'cube')
+    utils.append_days(_new_days(agg, year - 1))
+    third = utils.read_manifest()
+    assert _files() == sorted(set(_paths(second) + _paths(third)))
+    assert not os.path.exists(utils._sidecar_path(stale, 'cube'))
+
+    last = _new_days(agg, year)
+    store = utils.read_store(years=[year])
+    assert store.loc[store['date'] == last['date'].iloc[0], 'min'].sort_values().tolist() == \
+        pytest.approx(last['min'].sort_values().tolist())
+
+
+def test_sync_store_rebuilds_legacy_layout(agg):
+    manifest = utils.sync_store()
+    # Датасет старого формату: той самий маніфест, але файли year=YYYY/data.parquet
+    for path in _paths(manifest):
+        os.replace(path, os.path.join(os.path.dirname(path), 'data.parquet'))
+    assert utils.sync_store()['years'] == manifest['years']
+    assert _files() == _paths(manifest)
+    with open(os.path.join(utils.AGG_STORE_DIR, '_manifest.json'), encoding='utf-8') as f:
+        assert json.load(f)['years'] == manifest['years']
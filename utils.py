@@ -1,52 +1,566 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import plotly.graph_objects as go                 # Лінивий модуль plotly: класи вантажаться при першому графіку
+from plotly.colors import qualitative              # Без plotly.express — його імпорт мають лише сторінки
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import numpy as np
+import hashlib
+import importlib.util
+import glob
+import gzip
+import io
+import json
+import threading
+import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # 1. КОНСТАНТИ ТА ШЛЯХИ
-FILE_TO_LOAD = 'WEB_AGG_DATA.parquet'             # Агреговані дані для швидких графіків
+FILE_TO_LOAD = 'WEB_AGG_DATA.parquet'             # Агреговані дані для швидких графіків (плоский файл)
+AGG_STORE_DIR = 'WEB_AGG_DATA'                    # Ті самі дані, партиціоновані за роками: year=YYYY/part-<версія>.parquet
 FIELD_SUMMARY_FILE = 'WEB_FIELD_SUMMARY.parquet'  # Готові зведені дані по полях
+FIELD_DAILY_FILE = 'WEB_FIELD_DAILY.parquet'      # Щоденні min/max по полях (для аналізу заморозків)
+FIELD_STORE_FILE = 'WEB_FIELD_STORE.arrow'        # Щоденні ряди, згруповані по полях (деталізація поля, field_store.py)
+SUMMARY_KEYS = ['Рік', 'Cluster', 'Block', 'Culture', 'Поле']  # Ключі (і порядок сортування) зведення
+SUMMARY_PAGE_SIZES = [50, 100, 250, 500]
 ETALON_YEAR = '2025'
+PREPARED_DIR = '.cache'                           # Підготовлені дані (sidecar), прив'язані до версії джерела
+PLOT_YEAR_START = pd.Timestamp('2024-01-01')      # Високосний рік для накладання графіків
+FROST_THRESHOLD = -1.0                            # Поріг заморозку (колонка "Перший мороз" зведення, frost.py)
+FROST_FROM_MONTH = 7                              # З 1 липня — осінні заморозки, до того — весняні
+STORE_SORT = ['Cluster', 'Block', 'Culture', 'plot_date']  # Порядок рядків у партиції (вузькі row groups)
+STORE_ROW_GROUP = 50_000
+_STORE_LOCK = threading.RLock()                   # Одна синхронізація датасету на процес
+_CONTENT_VERSIONS = {}                            # Шлях -> ((mtime, розмір), ключ вмісту) для content_version
+LOADER_THREADS = 4                                # Пул паралельного завантаження файлів після входу
+WATCH_INTERVAL_S = 10                             # Як часто (не частіше) перевіряти зміну файлів даних
+POINT_BUDGET = 200                                # Точок на лінію у швидкому режимі графіків
+WEBGL_THRESHOLD = 1500                            # Понад стільки точок на графік — Scattergl (WebGL)
+CLIMATE_BANDS = {"P10–P90": ('p10', 'p90'), "Мін–макс": ('min', 'max')}  # Коридори норми (climatology.py)
+SCHEMA_CATEGORIES = ['Cluster', 'Block', 'Culture', 'year_str', 'hover_date']  # Виміри — коди замість рядків
+SCHEMA_INTS = {'year': 'int16', 'month': 'int8', 'day': 'int8', 'decade': 'int8', 'field_count': 'int32'}
+EXPORT_DIR = os.path.join(PREPARED_DIR, 'exports')  # Готові файли експорту (кеш на диску за вибором)
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_CACHE_FILES = 32
+EXPORT_FORMATS = {                                # Назва: (розширення, MIME)
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
 
 # 2. ЗАВАНТАЖЕННЯ АГРЕГОВАНИХ ДАНИХ (Для основних графіків)
-@st.cache_data
-def load_data():
-    if not os.path.exists(FILE_TO_LOAD):
+def load_data(years=None, clusters=None, columns=None):
+    """Завантажує агреговані дані; роки, кластери та колонки передаються у Parquet-читач.
+
+    Сам датафрейм один на процес (load_shared), сесія отримує поверхневу копію: буфери
+    колонок спільні, а copy-on-write pandas копіює лише ту колонку, яку сесія змінить.
+    """
+    version = get_data_version()
+    if version is None:
         st.error(f"Файл {FILE_TO_LOAD} не знайдено!")
         return pd.DataFrame()
-        
-    df = pd.read_parquet(FILE_TO_LOAD)
-    
+    return load_shared(version, years, clusters, columns).copy(deep=False)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def load_shared(version, years=None, clusters=None, columns=None):
+    """Спільний для всіх сесій датафрейм на версію даних — без серіалізації на кожен rerun."""
+    return read_store(years, clusters, columns)
+
+def load_dims(columns):
+    """Унікальні комбінації вимірів для сайдбару (поверхнева копія спільного датафрейму)."""
+    version = get_data_version()
+    if version is None:
+        st.error(f"Файл {FILE_TO_LOAD} не знайдено!")
+        return pd.DataFrame(columns=columns)
+    return load_shared_dims(version, tuple(columns)).copy(deep=False)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_shared_dims(version, columns):
+    """Комбінації вимірів: партиції читаються по одному року, у пам'яті лишаються лише комбінації,
+    тож пам'ять росте з кількістю локацій-днів року, а не з усією історією рядків."""
+    manifest = read_manifest()
+    years = [None] if manifest is None else [[int(y)] for y in sorted(manifest['years'])]
+    parts = [read_store(years=y, columns=list(columns)).drop_duplicates() for y in years]
+    return concat_compact(parts).drop_duplicates(ignore_index=True)
+
+def read_store(years=None, clusters=None, columns=None):
+    """Читає лише потрібні партиції років, row groups кластерів та колонки (без кешу Streamlit).
+
+    Датасет не синхронізується тут — нову версію з FILE_TO_LOAD готує DataWatcher у фоні.
+    """
+    manifest = read_manifest()
+    if manifest is None:
+        # Датасет не вдалося створити (файлова система лише для читання) — фільтруємо плоский файл
+        return _filter_frame(_load_flat(), years, clusters, columns)
+
+    years = sorted(int(y) for y in manifest['years']) if years is None else years
+    paths = [partition_path(y, manifest['years'][str(y)]) for y in years if str(y) in manifest['years']]
+    if not paths:
+        return pd.DataFrame(columns=columns)
+
+    dataset = ds.dataset(paths, format='parquet')
+    expr = ds.field('Cluster').isin(list(clusters)) if clusters else None
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=expr)
+    # Без консолідації блоків і зі звільненням буферів Arrow по ходу — пік пам'яті ≈ один датафрейм
+    return compact_schema(table.to_pandas(split_blocks=True, self_destruct=True))
+
+def _load_flat():
+    # Підготовлені колонки беремо з sidecar-файлу, якщо джерело не змінилось
+    df = read_sidecar(FILE_TO_LOAD, 'prepared')
+    if df is None:
+        df = compact_schema(prepare_data(pd.read_parquet(FILE_TO_LOAD)))
+        write_sidecar(df, FILE_TO_LOAD, 'prepared')
+    return df
+
+def _filter_frame(df, years, clusters, columns):
+    if years is not None:
+        df = df[df['year'].isin(years)]
+    if clusters:
+        df = df[df['Cluster'].isin(clusters)]
+    return df[list(columns)] if columns else df
+
+def prepare_data(df):
+    """Векторно розраховує похідні колонки: plot_date, hover_date, year_str, decade."""
     # Визначаємо колонку з датою
     date_col = 'date' if 'date' in df.columns else 'plot_date'
-    df[date_col] = pd.to_datetime(df[date_col])
-    
+    dates = pd.to_datetime(df[date_col])
+    df[date_col] = dates
+
     df['year_str'] = df['year'].astype(str)
-    
-    # Синхронізація дат на 2024 рік для накладання графіків
-    df['plot_date'] = df[date_col].map(lambda d: d.replace(year=2024))
-    df['hover_date'] = df['plot_date'].dt.strftime('%d-%b')
-    
+    df['plot_date'] = to_plot_date(dates)
+
+    # Підписи дат: форматуємо лише унікальні дні (≤ 366), а не кожен рядок
+    codes, uniques = pd.factorize(df['plot_date'])
+    df['hover_date'] = uniques.strftime('%d-%b').to_numpy()[codes]
+
     # Розрахунок декад (якщо є колонка дня)
     if 'day' in df.columns:
-        df['decade'] = df['day'].apply(lambda x: 1 if x <= 10 else (2 if x <= 20 else 3))
-    
+        df['decade'] = np.minimum((df['day'] - 1) // 10 + 1, 3)
+
+    return df
+
+def plot_doy(dates):
+    """Номер дня (0 = 1 січня) на високосній осі PLOT_YEAR_START для Series дат (NaT -> NaN).
+
+    У невисокосні роки дні після лютого зсуваються на +1, щоб 1 березня завжди лягало
+    на 01-Mar, а 29.02 залишалось лише для високосних років.
+    """
+    shift = (~dates.dt.is_leap_year & (dates.dt.month > 2)).to_numpy()
+    return dates.dt.dayofyear.to_numpy(dtype=float) - 1 + shift
+
+def to_plot_date(dates):
+    """Дати на осі PLOT_YEAR_START (спільна вісь для накладання років)."""
+    return PLOT_YEAR_START + pd.to_timedelta(plot_doy(dates), unit='D')
+
+# 2.1 ПАРТИЦІОНОВАНИЙ ДАТАСЕТ (year=YYYY/part-<версія>.parquet + _manifest.json)
+# Файл партиції ніколи не перезаписується: нова версія року — новий файл (версія = sha256 вмісту),
+# маніфест перемикається атомарно (os.replace), і лише потім прибираються застарілі файли.
+def partition_path(year, digest):
+    """Файл версії digest (sha256 з маніфесту) партиції року."""
+    return os.path.join(AGG_STORE_DIR, f"year={year}", f"part-{digest[:16]}.parquet")
+
+def _manifest_path():
+    return os.path.join(AGG_STORE_DIR, "_manifest.json")
+
+def store_source():
+    """Файл, за яким версіонуються похідні дані всіх років: маніфест датасету або FILE_TO_LOAD."""
+    return _manifest_path() if os.path.exists(_manifest_path()) else FILE_TO_LOAD
+
+def read_manifest():
+    if not os.path.exists(_manifest_path()):
+        return None
+    with open(_manifest_path(), encoding='utf-8') as f:
+        return json.load(f)
+
+def store_years():
+    manifest = read_manifest()
+    return sorted(int(y) for y in manifest['years']) if manifest else []
+
+def sync_store():
+    """Перебудовує датасет з плоского FILE_TO_LOAD, якщо той змінився. Повертає маніфест або None."""
+    with _STORE_LOCK:
+        manifest = read_manifest()
+        if not os.path.exists(FILE_TO_LOAD):
+            return manifest
+
+        source = (manifest or {}).get('source') or {}
+        same, digest = _same_source(source, FILE_TO_LOAD)
+        # Датасет старого формату (year=YYYY/data.parquet) або з втраченими файлами — перебудовуємо
+        same = same and all(os.path.exists(partition_path(y, d)) for y, d in manifest['years'].items())
+        try:
+            if not same:
+                manifest = write_store(prepare_data(pd.read_parquet(FILE_TO_LOAD)), _source_key(FILE_TO_LOAD, digest))
+            elif source['source_mtime'] != str(os.stat(FILE_TO_LOAD).st_mtime_ns):
+                # Вміст той самий, змінився лише mtime — оновлюємо ключ, щоб не хешувати файл щоразу
+                manifest = _write_manifest(manifest['years'], _source_key(FILE_TO_LOAD, digest))
+        except OSError:
+            return manifest if same else None
+        return manifest
+
+def write_store(df, source=None):
+    """Записує підготовлені дані як датасет, партиціонований за роками."""
+    os.makedirs(AGG_STORE_DIR, exist_ok=True)
+    previous = read_manifest()
+    years = {str(year): _write_partition(part, year) for year, part in df.groupby('year', sort=True)}
+    manifest = _write_manifest(years, source)
+    _prune_store(manifest, previous)
+    return manifest
+
+def append_days(df_new):
+    """Дописує нові дні: перезаписуються лише партиції років, у які потрапили нові рядки.
+
+    Повторні рядки (та сама дата й локація) замінюються новими. Якщо поруч лежить
+    плоский FILE_TO_LOAD, при його наступній зміні датасет буде перебудовано з нього.
+    """
+    df_new = prepare_data(df_new.copy())
+    date_col = 'date' if 'date' in df_new.columns else 'plot_date'
+    keys = [date_col] + [c for c in ['Поле', 'Cluster', 'Block', 'Culture'] if c in df_new.columns]
+
+    with _STORE_LOCK:
+        manifest = sync_store() or {'years': {}, 'source': None}
+        os.makedirs(AGG_STORE_DIR, exist_ok=True)
+        years = dict(manifest['years'])
+        for year, rows in df_new.groupby('year', sort=True):
+            if str(year) in years:
+                old = pd.read_parquet(partition_path(year, years[str(year)]))
+                rows = pd.concat([old, rows], ignore_index=True).drop_duplicates(keys, keep='last')
+            years[str(year)] = _write_partition(rows, year)
+        _prune_store(_write_manifest(years, manifest['source']), manifest)
+    return sorted(df_new['year'].unique().tolist())
+
+def _write_partition(part, year):
+    """Пише нову версію партиції року (відсортовану за Cluster/Block, щоб фільтр кластерів відкидав
+    зайві row groups) і повертає її sha256. Файл, на який посилається маніфест, не змінюється.
+    """
+    part = part.sort_values([c for c in STORE_SORT if c in part.columns], kind='stable')
+    # Числа — компактними типами; рядки лишаються рядками, щоб схеми партицій не розходились
+    # через різні словники категорій (категорії робить read_store після читання)
+    part = compact_schema(part, categorical=False)
+    tmp = os.path.join(AGG_STORE_DIR, f"year={year}", f"part-{threading.get_ident()}.tmp")
+    os.makedirs(os.path.dirname(tmp), exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp, row_group_size=STORE_ROW_GROUP)
+    digest = _file_sha256(tmp)
+    if os.path.exists(partition_path(year, digest)):
+        os.remove(tmp)                                # Рік не змінився — лишаємо файл (і його mtime)
+    else:
+        os.replace(tmp, partition_path(year, digest))
+    return digest
+
+def _write_manifest(years, source):
+    manifest = {
+        'source': source,
+        'years': years,
+        'version': hashlib.sha256(json.dumps(years, sort_keys=True).encode()).hexdigest()[:16],
+    }
+    with open(_manifest_path() + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(_manifest_path() + '.tmp', _manifest_path())
+    return manifest
+
+def _prune_store(manifest, previous=None):
+    """Видаляє файли партицій (і їхні sidecar-файли), яких немає ні в новому, ні в попередньому маніфесті.
+
+    Файли попереднього маніфесту живуть ще одне покоління — читачі, що встигли його прочитати,
+    дочитують свої партиції; відкритий файл (Windows) лишається до наступного прибирання.
+    """
+    keep = {partition_path(y, d) for m in (manifest, previous) if m for y, d in m['years'].items()}
+    for file in glob.glob(os.path.join(AGG_STORE_DIR, 'year=*', '*')):
+        if file in keep:
+            continue
+        try:
+            os.remove(file)
+            for side in glob.glob(_sidecar_path(file, '*')):
+                os.remove(side)
+        except OSError:
+            pass
+    for name in os.listdir(AGG_STORE_DIR):
+        path = os.path.join(AGG_STORE_DIR, name)
+        if name.startswith('year=') and os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
+
+# 2.2 ВЕРСІЇ ДЖЕРЕЛ ТА SIDECAR-ФАЙЛИ
+def _sidecar_path(path, kind):
+    name = os.path.splitext(os.path.normpath(path).replace(os.sep, '_'))[0]
+    return os.path.join(PREPARED_DIR, f"{name}.{kind}.parquet")
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _source_key(path, digest=None):
+    stat = os.stat(path)
+    return {
+        'source_mtime': str(stat.st_mtime_ns),
+        'source_size': str(stat.st_size),
+        'source_sha256': digest or _file_sha256(path),
+    }
+
+def _same_source(saved, path):
+    """Порівнює збережений ключ із файлом: спершу mtime + розмір, а при розбіжності — sha256."""
+    stat = os.stat(path)
+    if saved.get('source_mtime') == str(stat.st_mtime_ns) and saved.get('source_size') == str(stat.st_size):
+        return True, saved.get('source_sha256')
+    # mtime змінився (копіювання, деплой) — звіряємо вміст за хешем
+    digest = _file_sha256(path)
+    return saved.get('source_sha256') == digest, digest
+
+def read_sidecar(path, kind, filters=None):
+    """Повертає похідний датафрейм (kind) з sidecar-файлу або None, якщо він застарів.
+
+    filters — фільтри рядків Parquet-читача (напр. [('Cluster', 'in', [...])]): читаються лише
+    потрібні row groups, а часткова таблиця не записується назад.
+    """
+    side = _sidecar_path(path, kind)
+    if not os.path.exists(side):
+        return None
+    meta = {k.decode(): v.decode() for k, v in (pq.read_schema(side).metadata or {}).items()}
+    same, digest = _same_source(meta, path)
+    if not same:
+        return None
+    df = pd.read_parquet(side, memory_map=True, filters=filters)
+    if filters is None and meta.get('source_mtime') != _source_key(path, digest)['source_mtime']:
+        write_sidecar(df, path, kind, digest)
     return df
 
+def write_sidecar(df, path, kind, digest=None):
+    """Зберігає похідні дані поруч із ключем версії джерела (mtime + sha256)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    source = {k.encode(): v.encode() for k, v in _source_key(path, digest).items()}
+    table = table.replace_schema_metadata((table.schema.metadata or {}) | source)
+    side = _sidecar_path(path, kind)
+    try:
+        os.makedirs(PREPARED_DIR, exist_ok=True)
+        # Вузькі row groups (рядки відсортовані за вимірами) — фільтр read_sidecar відкидає зайві
+        pq.write_table(table, side + '.tmp', row_group_size=STORE_ROW_GROUP)
+        os.replace(side + '.tmp', side)
+    except OSError:
+        # Файлова система лише для читання — просто працюємо без sidecar
+        pass
+
+def get_data_version():
+    """Ключ активної версії даних для кешів похідних структур (None, якщо даних немає).
+
+    Заодно (не частіше ніж раз на WATCH_INTERVAL_S) перевіряє, чи не змінились файли.
+    """
+    watcher = get_watcher()
+    watcher.poll()
+    return watcher.version
+
+def get_years_version(years):
+    """Ключ версії лише вибраних років: кеші вибору переживають оновлення інших років."""
+    manifest = get_watcher().manifest
+    if manifest is None:
+        return get_data_version()
+    parts = [f"{y}:{manifest['years'].get(y)}" for y in sorted(map(str, years))]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16]
+
+def content_version(path):
+    """Ключ вмісту файлу (розмір + sha256) — однаковий у реплік, хоч би який у них mtime (None, якщо файлу немає).
+
+    sha256 рахується заново лише після зміни mtime чи розміру, як у sidecar-файлів.
+    """
+    stamp = _file_stamp(path)
+    if stamp is None:
+        return None
+    saved = _CONTENT_VERSIONS.get(path)
+    if saved is None or saved[0] != stamp:
+        saved = _CONTENT_VERSIONS[path] = (stamp, f"{stamp[1]}-{_file_sha256(path)[:16]}")
+    return saved[1]
+
+def _file_version(path):
+    stamp = _file_stamp(path)
+    return f"{stamp[0]}-{stamp[1]}" if stamp else None
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+# 2.3 ГАРЯЧЕ ОНОВЛЕННЯ ДАНИХ (НОВА ВЕРСІЯ ГОТУЄТЬСЯ У ФОНІ)
+class DataWatcher:
+    """Стежить за FILE_TO_LOAD, маніфестом датасету та FIELD_SUMMARY_FILE (mtime + розмір).
+
+    Зміну помічає poll() під час звичайного rerun і запускає фоновий потік: той
+    синхронізує датасет (sync_store звіряє sha256 і перезаписує партиції), прогріває
+    кеші нової версії зареєстрованими функціями і лише потім підміняє активну версію.
+    Похідні кеші ключуються хешами партицій років, тож перераховуються лише змінені роки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._prewarm = {}
+        self._checked = time.monotonic()
+        self._stamp = self._stamps()
+        self.manifest = sync_store()
+        self.version = manifest_version(self.manifest)
+        self.summary_version = _file_version(FIELD_SUMMARY_FILE)
+        self.error = None
+
+    @staticmethod
+    def _stamps():
+        return tuple(_file_stamp(p) for p in (FILE_TO_LOAD, _manifest_path(), FIELD_SUMMARY_FILE))
+
+    def register_prewarm(self, name, fn):
+        """fn(version) — прогрів кешу нової версії до підміни (повторна реєстрація замінює)."""
+        self._prewarm[name] = fn
+
+    def poll(self):
+        with self._lock:
+            now = time.monotonic()
+            busy = self._thread is not None and self._thread.is_alive()
+            if busy or now - self._checked < WATCH_INTERVAL_S:
+                return
+            self._checked = now
+            if self._stamps() == self._stamp:
+                return
+            self._thread = threading.Thread(target=self._reload, name='data-reload', daemon=True)
+            self._thread.start()
+
+    def _reload(self):
+        stamp = self._stamps()
+        try:
+            manifest = sync_store()
+            version = manifest_version(manifest)
+            summary_version = _file_version(FIELD_SUMMARY_FILE)
+            if version is not None and version != self.version:
+                for fn in list(self._prewarm.values()):
+                    fn(version)
+            if summary_version is not None and summary_version != self.summary_version:
+                load_field_summary(summary_version)
+        except Exception as e:
+            # Нову версію підготувати не вдалося — продовжуємо обслуговувати стару
+            self.error = repr(e)
+            return
+        with self._lock:
+            self.manifest, self.version, self.summary_version = manifest, version, summary_version
+            # Маніфест щойно переписав сам sync_store — беремо його новий відбиток
+            self._stamp, self.error = (stamp[0], _file_stamp(_manifest_path()), stamp[2]), None
+
+
+@st.cache_resource(show_spinner=False)
+def get_watcher():
+    """Один спостерігач на процес."""
+    return DataWatcher()
+
+def manifest_version(manifest):
+    return manifest['version'] if manifest is not None else _file_version(FILE_TO_LOAD)
+
+@st.cache_resource(show_spinner=False)
+def get_loader_pool():
+    """Пул потоків для паралельного читання файлів (Arrow відпускає GIL під час читання Parquet).
+
+    Завдання лише прогрівають кеші (cache_resource): сторінка, якій дані потрібні раніше,
+    чекає на те саме обчислення під блокуванням ключа кешу, а не рахує його вдруге.
+    """
+    return ThreadPoolExecutor(max_workers=LOADER_THREADS, thread_name_prefix='agro-load')
+
+# 2.4 КОМПАКТНА СХЕМА ЗАВАНТАЖЕНИХ ДАНИХ
+def schema_types():
+    """Цільові типи колонок: виміри — category, частини дат — int8/int16, метрики — float32.
+
+    Метрики беруться з get_metrics_dict, тож нова метрика одразу отримує компактний тип.
+    """
+    types = {c: 'category' for c in SCHEMA_CATEGORIES} | SCHEMA_INTS
+    return types | {m: 'float32' for m in get_metrics_dict().values()}
+
+def compact_schema(df, categorical=True):
+    """Приводить наявні колонки до schema_types() (categorical=False — без категорій)."""
+    types = {c: t for c, t in schema_types().items()
+             if c in df.columns and (categorical or t != 'category') and df[c].dtype != t}
+    return df.astype(types) if types else df
+
+def concat_compact(parts):
+    """pd.concat зі збереженням категорій: словники частин об'єднуються (інакше concat дає object)."""
+    parts = [p for p in parts if len(p)] or parts[:1]
+    if not parts:
+        return pd.DataFrame()
+    for c in [c for c in parts[0].columns if isinstance(parts[0][c].dtype, pd.CategoricalDtype)]:
+        dtype = pd.CategoricalDtype(sorted(set().union(*(p[c].cat.categories for p in parts))))
+        parts = [p.astype({c: dtype}) for p in parts]
+    return pd.concat(parts, ignore_index=True)
+
+def memory_report(df):
+    """Пам'ять по колонках проти «широкої» схеми (рядки як object, int64, float64).
+
+    Колонки поза schema_types() позначаються — так видно, що нову колонку забули описати.
+    """
+    types = schema_types()
+    rows = []
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            wide = s
+        elif isinstance(s.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(s):
+            wide = s.astype(object)
+        elif pd.api.types.is_integer_dtype(s):
+            wide = s.astype('int64')
+        else:
+            wide = s.astype('float64')
+        rows.append({
+            'колонка': c,
+            'тип': str(s.dtype),
+            'МБ': s.memory_usage(deep=True, index=False) / 2 ** 20,
+            'МБ (широка схема)': wide.memory_usage(deep=True, index=False) / 2 ** 20,
+            'у схемі': c in types or pd.api.types.is_datetime64_any_dtype(s),
+        })
+    report = pd.DataFrame(rows)
+    total = report[['МБ', 'МБ (широка схема)']].sum()
+    report.loc[len(report)] = {'колонка': 'РАЗОМ', 'тип': '', 'МБ': total.iloc[0],
+                               'МБ (широка схема)': total.iloc[1], 'у схемі': bool(report['у схемі'].all())}
+    return report.round(3)
+
 # 3. ШВИДКЕ ЗАВАНТАЖЕННЯ ГОТОВОЇ ТАБЛИЦІ ПО ПОЛЯХ (Для таблиць)
-@st.cache_data
-def load_field_summary():
-    """Миттєво завантажує вже прораховану агрегацію."""
+def get_summary_version():
+    """Активна версія файлу зведення по полях (None, якщо файлу немає)."""
+    return get_watcher().summary_version
+
+def get_field_daily_version():
+    """Версія щоденних даних по полях; без FIELD_DAILY_FILE — версія агрегатів (заміна в frost.py)."""
+    version = _file_version(FIELD_DAILY_FILE)
+    return f"fields-{version}" if version else get_data_version()
+
+def get_field_store_version():
+    """Версія сховища рядів по полях (None, якщо FIELD_STORE_FILE немає)."""
+    return _file_version(FIELD_STORE_FILE)
+
+@st.cache_resource(show_spinner=False)
+def load_field_summary(version=None):
+    """Миттєво завантажує вже прораховану агрегацію.
+
+    Один спільний (лише для читання) екземпляр на версію файлу: ключі типізовані
+    (Рік — int16, решта — category), рядки відсортовані за SUMMARY_KEYS,
+    колонки — у порядку відображення (ключі, показники, дати морозів).
+    """
     if not os.path.exists(FIELD_SUMMARY_FILE):
         st.error(f"Файл {FIELD_SUMMARY_FILE} не знайдено! Запусти скрипт precompute_summary.py")
         return pd.DataFrame()
-    return pd.read_parquet(FIELD_SUMMARY_FILE)
+    df = pd.read_parquet(FIELD_SUMMARY_FILE)
+
+    keys = [c for c in SUMMARY_KEYS if c in df.columns]
+    df = df.astype({c: ('int16' if c == 'Рік' else 'category') for c in keys})
+    # Категорії в алфавітному порядку — тоді сортування за кодами збігається з сортуванням за назвами
+    df = df.assign(**{c: df[c].cat.reorder_categories(sorted(df[c].cat.categories)) for c in keys if c != 'Рік'})
+    return df.sort_values(keys, ignore_index=True)[summary_columns(df.columns)]
+
+def summary_columns(columns):
+    """Порядок відображення колонок зведення: ключі, показники, дати морозів."""
+    keys = [c for c in ['Поле', 'Cluster', 'Block', 'Culture', 'Рік'] if c in columns]
+    frost_cols = [c for c in columns if 'мороз' in c.lower()]
+    return keys + [c for c in columns if c not in keys and c not in frost_cols] + frost_cols
 
 # 4. КОЛІРНА СХЕМА
 def get_colors(df):
     all_years = sorted(df['year_str'].unique())
-    palette = px.colors.qualitative.Safe
+    palette = qualitative.Safe
     return {y: ("red" if y == ETALON_YEAR else palette[i % len(palette)]) 
             for i, y in enumerate(all_years)}
 
@@ -69,6 +583,20 @@ def apply_style(fig, etalon=ETALON_YEAR):
     )
     return fig
 
+def add_band(fig, band, kind="P10–P90", name="Норма"):
+    """Заливка коридору норми (band — рядки climatology.band) під лініями років."""
+    if band is None or kind not in CLIMATE_BANDS:
+        return fig
+    lower, upper = CLIMATE_BANDS[kind]
+    fig.add_trace(go.Scatter(x=band['plot_date'], y=band[upper], mode='lines', line=dict(width=0),
+                             showlegend=False, hoverinfo='skip', name=f"{name} {upper.upper()}"))
+    fig.add_trace(go.Scatter(x=band['plot_date'], y=band[lower], mode='lines', line=dict(width=0),
+                             fill='tonexty', fillcolor='rgba(120, 120, 120, 0.18)',
+                             name=f"{name} {kind}", hoverinfo='skip'))
+    # Коридор — першим шаром, щоб не перекривав лінії років
+    fig.data = fig.data[-2:] + fig.data[:-2]
+    return fig
+
 # 6. СЛОВНИК МЕТРИК
 def get_metrics_dict():
     return {
@@ -81,3 +609,149 @@ def get_metrics_dict():
         "Макс. температура": "max",
         "Сер. температура": "mean"
     }
+
+# 7. ШВИДКИЙ РЕЖИМ ГРАФІКІВ (ПРОРІДЖУВАННЯ НА СЕРВЕРІ + WEBGL)
+def get_render_settings():
+    """(увімкнено, бюджет точок на лінію) — з віджетів сайдбару filters.render_chart_settings."""
+    return st.session_state.get('fast_render', False), st.session_state.get('point_budget', POINT_BUDGET)
+
+def get_band_setting():
+    """Вибраний коридор норми (ключ CLIMATE_BANDS або "Немає") — з filters.render_chart_settings."""
+    return st.session_state.get('climate_band', next(iter(CLIMATE_BANDS)))
+
+def downsample_method(col):
+    """Накопичувальні криві — LTTB (зберігає форму), щоденні — мін/макс у кошику (зберігає піки)."""
+    return 'lttb' if col.startswith('Sum_') else 'minmax'
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: індекси n_out точок, що найкраще зберігають форму кривої."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def minmax_indices(y, n_out):
+    """Мінімум і максимум у кожному з n_out / 2 кошиків (плюс крайні точки)."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    bucket = (np.arange(n) * (n_out // 2)) // n
+    order = np.lexsort((y, bucket))
+    bounds = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[bounds[1:], n] - 1
+    return np.unique(np.r_[0, order[bounds], order[ends], n - 1])
+
+def downsample(df, x, y, budget, method='lttb'):
+    """Рядки df, що лишаються після проріджування колонки y до ~budget точок."""
+    df = df[df[y].notna()]
+    xs = df[x].to_numpy().astype('int64').astype(float) if np.issubdtype(df[x].dtype, np.datetime64) \
+        else df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+    idx = lttb_indices(xs, ys, budget) if method == 'lttb' else minmax_indices(ys, budget)
+    return df.iloc[idx]
+
+def line_figure(df, x, y, color_map, years_ordered, budget=POINT_BUDGET, method='lttb', title=None, y_title=None):
+    """Лінії по роках за один прохід groupby, з проріджуванням; Scattergl, якщо точок забагато."""
+    parts = {year: downsample(g, x, y, budget, method) for year, g in df.groupby('year_str', sort=False, observed=True)}
+    Line = go.Scattergl if sum(len(p) for p in parts.values()) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure([
+        Line(x=parts[year][x], y=parts[year][y], name=year, mode='lines', legendgroup=year,
+             line=dict(color=color_map.get(year)), customdata=parts[year][['hover_date']])
+        for year in years_ordered if year in parts
+    ])
+    fig.update_layout(title=title)
+    fig.update_yaxes(title=y_title or y)
+    return fig
+
+# 8. ЕКСПОРТ ТАБЛИЦЬ (ЛИШЕ НА ЗАПИТ, З КЕШЕМ НА ДИСКУ, ЧАСТИНАМИ)
+def export_formats():
+    """Доступні формати (XLSX — лише якщо встановлено openpyxl)."""
+    has_xlsx = importlib.util.find_spec('openpyxl') is not None
+    return [f for f in EXPORT_FORMATS if f != "XLSX" or has_xlsx]
+
+def export_file(df, key, fmt, encoding='utf-8'):
+    """Відкритий для читання файл експорту (бінарний файловий об'єкт для st.download_button).
+    Файл формується частинами лише при першому запиті для ключа (вибір + таблиця + формат +
+    версія даних), далі віддається з кешу на диску — байти читає сама кнопка, без нашої копії.
+    Диск лише для читання чи заповнений — файл формується в пам'яті (BytesIO), без кешу."""
+    ext = EXPORT_FORMATS[fmt][0]
+    digest = hashlib.sha256(repr((get_data_version(), key, fmt, encoding)).encode()).hexdigest()[:24]
+    path = os.path.join(EXPORT_DIR, f"{digest}.{ext}")
+    try:
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            with open(path + '.tmp', 'wb') as sink:
+                _write_export(df, sink, ext, encoding)
+            os.replace(path + '.tmp', path)
+            _prune_exports()
+        return open(path, 'rb')
+    except OSError:
+        _remove_export(path + '.tmp')
+        sink = io.BytesIO()
+        _write_export(df, sink, ext, encoding)
+        sink.seek(0)
+        return sink
+
+def _iter_export_chunks(df):
+    for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+        yield start == 0, df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+def _write_export(df, sink, ext, encoding):
+    """Пише експорт у бінарний файловий об'єкт sink (файл на диску або BytesIO); sink не закривається."""
+    if ext in ('csv', 'csv.gz'):
+        raw = gzip.GzipFile(fileobj=sink, mode='wb') if ext == 'csv.gz' else sink
+        f = io.TextIOWrapper(raw, encoding=encoding, newline='')
+        for first, chunk in _iter_export_chunks(df):
+            chunk.to_csv(f, header=first, index=False)
+        f.flush()
+        f.detach()
+        if raw is not sink:
+            raw.close()                                  # Кінцівка gzip; сам sink лишається відкритим
+    elif ext == 'parquet':
+        writer = None
+        for _, chunk in _iter_export_chunks(df):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+        writer.close()
+    else:
+        # openpyxl у режимі write_only пише рядки потоком, не тримаючи всю книгу в пам'яті
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(list(map(str, df.columns)))
+        for _, chunk in _iter_export_chunks(df):
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+                ws.append(list(row))
+        wb.save(sink)
+
+def _prune_exports():
+    stamps = {}
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if not name.endswith('.tmp'):
+                stamps[path] = os.path.getmtime(path)
+        except OSError:
+            pass                                         # Файл уже видалила інша сесія
+    for path in sorted(stamps, key=stamps.get, reverse=True)[EXPORT_CACHE_FILES:]:
+        _remove_export(path)
+
+def _remove_export(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass